@@ -0,0 +1,231 @@
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+from Modules.Dawg import LETTER_MASK, NO_NODE, TERMINAL_FLAG
+from Modules.Layouts import BoardLayout
+from Modules.Lexicon import Lexicon
+from Modules.Scrabble import BINGO_BONUS, RACK_SIZE, Board
+
+# Word directions, the first axis of every per direction array
+ACROSS = 0
+DOWN = 1
+
+
+class BoardBatch:
+    # A stack of boards sharing one premium square layout, held as arrays so anchors, cross checks and
+    # placement scores are worked out for every board in the same vectorized passes
+    def __init__(self, letters: np.ndarray, values: np.ndarray, layout: BoardLayout) -> None:
+        """
+
+        :param letters: (boards, squares) letter codes as on Board.letters, 0 for an empty square
+        :param values: (boards, squares) face values of the tiles, 0 for blanks and empty squares
+        :param layout: BoardLayout of the boards
+        """
+        self.letters = np.asarray(letters, dtype=np.uint8)
+        self.values = np.asarray(values, dtype=np.int64)
+        self.boards, squares = self.letters.shape
+        if squares != layout.squares:
+            raise ValueError("Boards of {} squares do not fit the {} layout".format(squares, layout.name))
+        self.layout = layout
+        self.side_squares = n = layout.side_squares
+
+        # Multipliers with one extra neutral square used by the padding of placements
+        self.letter_multipliers = layout.letter_multiplier_array
+        self.word_multipliers = layout.word_multiplier_array
+
+        # Position of each square along its row (across) and its column (down)
+        self.line_index = layout.line_index
+        self.steps = np.array([1, n])
+
+        self.filled = self.letters != 0
+        self.runs_before, self.runs_after, self.prefix = self._line_state()
+
+    @classmethod
+    def from_boards(cls, boards: List[Board]) -> "BoardBatch":
+        """
+        Stacks boards with the same layout
+
+        :param boards: list[Board]
+        :return: BoardBatch
+        """
+        layout = boards[0].layout
+        for board in boards:
+            if board.layout is not layout and board.layout.key[1:] != layout.key[1:]:
+                raise ValueError("Boards in a batch must share their layout")
+
+        letters = np.array([np.frombuffer(board.letters, dtype=np.uint8) for board in boards])
+        values = np.array([np.frombuffer(board.values, dtype=np.uint8) for board in boards])
+        return cls(letters, values, layout)
+
+    def _line_state(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Arrays indexed [board, direction, square]: the number of filled squares directly before and
+        after each square along the direction, and the sum of the tile values along the line up to
+        each square
+
+        :return: (np.ndarray, np.ndarray, np.ndarray)
+        """
+        n = self.side_squares
+        boards = self.boards
+        filled = self.filled.reshape(boards, n, n)
+        values = self.values.reshape(boards, n, n)
+
+        runs_before = np.zeros((boards, 2, n, n), dtype=np.int64)
+        runs_after = np.zeros((boards, 2, n, n), dtype=np.int64)
+        prefix = np.zeros((boards, 2, n, n), dtype=np.int64)
+
+        # Work on rows, the down direction is the same computation on the transposed grids
+        for direction, (grid, line_values) in enumerate(((filled, values),
+                                                         (filled.transpose(0, 2, 1), values.transpose(0, 2, 1)))):
+            before = np.zeros((boards, n, n), dtype=np.int64)
+            after = np.zeros((boards, n, n), dtype=np.int64)
+            for i in range(1, n):
+                before[:, :, i] = np.where(grid[:, :, i - 1], before[:, :, i - 1] + 1, 0)
+                after[:, :, n - 1 - i] = np.where(grid[:, :, n - i], after[:, :, n - i] + 1, 0)
+
+            # Exclusive prefix sums of the tile values along each line
+            line_prefix = np.cumsum(line_values, axis=2) - line_values
+
+            if direction == DOWN:
+                before, after, line_prefix = (array.transpose(0, 2, 1) for array in (before, after, line_prefix))
+            runs_before[:, direction] = before
+            runs_after[:, direction] = after
+            prefix[:, direction] = line_prefix
+
+        shape = (boards, 2, n * n)
+        return runs_before.reshape(shape), runs_after.reshape(shape), prefix.reshape(shape)
+
+    def anchors(self) -> np.ndarray:
+        """
+        Empty squares next to a tile, the start square on an empty board
+
+        :return: (boards, squares) bool
+        """
+        n = self.side_squares
+        filled = self.filled.reshape(self.boards, n, n)
+        padded = np.pad(filled, ((0, 0), (1, 1), (1, 1)))
+        touching = padded[:, :-2, 1:-1] | padded[:, 2:, 1:-1] | padded[:, 1:-1, :-2] | padded[:, 1:-1, 2:]
+
+        anchors = (touching & ~filled).reshape(self.boards, n * n)
+        anchors[~self.filled.any(axis=1), self.layout.start] = True
+        return anchors
+
+    def _cross_extent(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Start and end of the perpendicular word through each square, for words in each direction, and
+        whether there is one. Words across are crossed by the tiles above and below a square.
+
+        :return: (start, end, has cross word), each (boards, 2, squares)
+        """
+        # Across words read the down runs and the other way round
+        before = self.runs_before[:, ::-1]
+        after = self.runs_after[:, ::-1]
+        steps = self.steps[::-1][None, :, None]
+        squares = np.arange(self.side_squares ** 2)
+
+        start = squares - before * steps
+        end = squares + after * steps
+        has_cross = ((before + after) > 0) & ~self.filled[:, None, :]
+        return start, end, has_cross
+
+    def cross_scores(self) -> np.ndarray:
+        """
+        Value of the tiles of the perpendicular word through each empty square, as kept in
+        Board.across_cross_scores and Board.down_cross_scores
+
+        :return: (boards, 2, squares) int, -1 where a tile would form no cross word
+        """
+        start, end, has_cross = self._cross_extent()
+        prefix = self.prefix[:, ::-1]
+        board_index = np.arange(self.boards)[:, None, None]
+
+        total = (np.take_along_axis(prefix, end, axis=2) - np.take_along_axis(prefix, start, axis=2) +
+                 self.values[board_index, end])
+        return np.where(has_cross, total, -1)
+
+    def cross_checks(self, lexicon: Lexicon, cache: Union[Dict[Tuple[bytes, bytes], int], None] = None) -> np.ndarray:
+        """
+        Bitmask of the letters that form a word with the perpendicular tiles through each square, as
+        kept in Board.across_checks and Board.down_checks. The run extents come from the vectorized
+        passes and each distinct pair of word fragments is looked up once.
+
+        :param lexicon: Lexicon
+        :param cache: dict of fragments to masks, reused between batches on the same lexicon
+        :return: (boards, 2, squares) uint32 of 26 bit letter masks, 0 on filled squares
+        """
+        cache = {} if cache is None else cache
+        start, end, has_cross = self._cross_extent()
+
+        checks = np.where(self.filled[:, None, :], 0, LETTER_MASK).astype(np.uint32)
+        checks = np.broadcast_to(checks, has_cross.shape).copy()
+
+        dawg = lexicon.dawg
+        for board, direction, square in zip(*np.nonzero(has_cross)):
+            step = self.steps[1 - direction]
+            letters = self.letters[board]
+            fragments = (letters[start[board, direction, square]:square:step].tobytes(),
+                         letters[square + step:end[board, direction, square] + 1:step].tobytes())
+
+            mask = cache.get(fragments)
+            if mask is None:
+                mask = 0
+                node = dawg.walk(fragments[0].decode())
+                if node != NO_NODE:
+                    for letter, child in dawg.children(node):
+                        word_end = dawg.walk(fragments[1].decode(), child)
+                        if word_end != NO_NODE and dawg.nodes[word_end] & TERMINAL_FLAG:
+                            mask |= 1 << letter
+                cache[fragments] = mask
+            checks[board, direction, square] = mask
+
+        return checks
+
+    def score(self, board_index: np.ndarray, positions: np.ndarray, values: np.ndarray,
+              across: np.ndarray) -> np.ndarray:
+        """
+        Scores placements on any of the boards in vectorized passes
+
+        :param board_index: (placements,) board each placement is made on
+        :param positions: (placements, tiles) board positions of the placed tiles, padded with -1
+        :param values: (placements, tiles) face values of the placed tiles, 0 for blanks and padding
+        :param across: (placements,) True if the main word runs along a row
+        :return: np.ndarray of int scores
+        """
+        n = self.side_squares
+        board_index = np.asarray(board_index, dtype=np.int64)
+        positions = np.asarray(positions, dtype=np.int64)
+        values = np.asarray(values, dtype=np.int64)
+        direction = np.where(np.asarray(across, dtype=bool), ACROSS, DOWN)
+
+        padding = positions < 0
+        squares = np.where(padding, n * n, positions)
+        placed = np.where(padding, 0, positions)
+        tile_count = (~padding).sum(axis=1)
+
+        # Placed tiles with their premium squares
+        letter_scores = values * self.letter_multipliers[squares]
+        word_multipliers = self.word_multipliers[squares]
+        main_multiplier = word_multipliers.prod(axis=1)
+
+        # Cross words formed by each placed tile
+        cross_scores = self.cross_scores()
+        square_cross = np.where(padding, -1, cross_scores[board_index[:, None], direction[:, None], placed])
+        cross_total = np.where(square_cross >= 0, (square_cross + letter_scores) * word_multipliers, 0).sum(axis=1)
+
+        # Extent of the main word, extended over the tiles already on the board
+        first = np.where(padding, n * n, positions).min(axis=1)
+        last = np.where(padding, -1, positions).max(axis=1)
+        step = self.steps[direction]
+
+        start = first - self.runs_before[board_index, direction, first] * step
+        end = last + self.runs_after[board_index, direction, last] * step
+        word_length = self.line_index[direction, end] - self.line_index[direction, start] + 1
+
+        # Tile values on the board between start and end, placed squares are empty and add nothing
+        existing = (self.prefix[board_index, direction, end] - self.prefix[board_index, direction, start] +
+                    self.values[board_index, end])
+
+        main_score = np.where(word_length >= 2, (letter_scores.sum(axis=1) + existing) * main_multiplier, 0)
+
+        return main_score + cross_total + np.where(tile_count == RACK_SIZE, BINGO_BONUS, 0)
@@ -0,0 +1,370 @@
+import os
+import pickle
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import List, Tuple, Union
+
+import numpy as np
+
+from Modules.Endgame import EndgameSolver
+from Modules.Game import RACK_SIZE, Game
+from Modules.Inference import RackInference, deal_rack, unseen_tiles
+from Modules.Leaves import LeaveTable
+from Modules.Lexicon import Lexicon
+from Modules.MoveGenerator import Move, MoveGenerator
+from Modules.PreEndgame import MAX_BAG_TILES, PreEndgameSolver
+from Modules.SharedState import SharedGameState, load_state, share_state
+
+# Rollouts a worker plays per task before reporting back to the bot
+ROLLOUT_BATCH = 4
+
+# Opponent racks sampled per turn from the inferred distribution, shared by every rollout of the turn
+SAMPLED_RACKS = 1024
+
+
+def exchange_or_pass(game: Game):
+    """
+    Turn for a player with no move, the whole rack is exchanged while the bag allows it
+
+    :param game: Game
+    :return:
+    """
+    if len(game.tile_bag) >= RACK_SIZE:
+        game.exchange(game.current_player.rack_letters())
+    else:
+        game.pass_turn()
+
+
+def spread(game: Game, seat: int) -> int:
+    """
+    Score of a player minus the best score among the other players
+
+    :param game: Game
+    :param seat: index of the player
+    :return: int
+    """
+    return game.players[seat].score - max(player.score for i, player in enumerate(game.players) if i != seat)
+
+
+def sample_opponent_racks(game: Game, seat: int):
+    """
+    Replaces the racks of the other players with tiles drawn from everything the player cannot see
+
+    :param game: Game, changed in place
+    :param seat: index of the player whose view is sampled
+    :return:
+    """
+    for i, player in enumerate(game.players):
+        if i != seat:
+            codes = player.rack_codes()
+            player.remove_codes(codes)
+            game.tile_bag.return_codes(codes)
+
+    for i, player in enumerate(game.players):
+        if i != seat:
+            player.get_tiles(game.tile_bag)
+
+
+def play_rollouts(state: Union[bytes, str], plies: int, iterations: int, deadline: Union[float, None],
+                  seed: int) -> Tuple[List[float], int]:
+    """
+    Plays each candidate move followed by greedy replies against sampled opponent racks. Every
+    candidate in an iteration sees the same racks and draws so their results can be compared.
+
+    :param state: (Game, (list[Move], racks)) with the game at the players turn, pickled or in a shared block
+        named by the string. racks is an array of opponent racks to draw from in a two player game, None to
+        sample them evenly from the unseen tiles.
+    :param plies: turns played per rollout, the candidate move included
+    :param iterations: rollouts to play per candidate
+    :param deadline: wall clock time to stop by, at least one rollout is always played
+    :param seed: int
+    :return: (list[float], int) spread gained per candidate summed over the rollouts, rollouts played
+    """
+    game, (candidates, racks) = load_state(state)
+    generator = MoveGenerator(game.lexicon)
+    seat = game.turn
+    totals = [0.0] * len(candidates)
+    seeds = random.Random(seed)
+
+    played = 0
+    for played in range(1, iterations + 1):
+        sampled = game.copy()
+        sampled.tile_bag.rng = random.Random(seeds.getrandbits(64))
+        if racks is None:
+            sample_opponent_racks(sampled, seat)
+        else:
+            deal_rack(sampled, 1 - seat, racks[seeds.randrange(len(racks))])
+        before = spread(sampled, seat)
+
+        for i, move in enumerate(candidates):
+            # Each copy takes the random state of the sampled bag, so every candidate gets the same draws
+            rollout = sampled.copy()
+            rollout.apply_move(move)
+
+            for _ in range(plies - 1):
+                if rollout.is_over():
+                    break
+                reply = generator.best_move(rollout.board, rollout.current_player.rack)
+                if reply is None:
+                    exchange_or_pass(rollout)
+                else:
+                    rollout.apply_move(reply)
+
+            totals[i] += spread(rollout, seat) - before
+
+        if deadline is not None and time.time() >= deadline:
+            break
+
+    return totals, played
+
+
+class GreedyBot:
+    # Plays the highest scoring move, or the highest equity move with a leave table, exchanging its
+    # whole rack when it has none
+    def __init__(self, lexicon: Lexicon, leaves: Union[LeaveTable, None] = None,
+                 seed: Union[int, None] = None) -> None:
+        """
+
+        :param lexicon: Lexicon
+        :param leaves: optional leave values
+        :param seed: seed of the bots random choices, greedy play makes none but every bot takes one
+        """
+        self.generator = MoveGenerator(lexicon, leaves)
+        self.rng = random.Random(seed)
+
+    def take_turn(self, game: Game):
+        """
+        Plays one turn for the current player
+
+        :param game: Game
+        :return:
+        """
+        player = game.current_player
+        move = self.generator.best_move(game.board, player.rack)
+
+        if move is not None:
+            game.apply_move(move)
+        else:
+            exchange_or_pass(game)
+
+
+class EndgameBot(GreedyBot):
+    # Plays like GreedyBot while there are tiles in the bag, then searches the endgame once both racks
+    # are known
+    def __init__(self, lexicon: Lexicon, leaves: Union[LeaveTable, None] = None, time_limit: float = 5.0,
+                 seed: Union[int, None] = None) -> None:
+        """
+
+        :param lexicon: Lexicon
+        :param leaves: optional leave values for the moves before the endgame
+        :param time_limit: seconds of endgame search per turn
+        :param seed: seed of the bots random choices
+        """
+        super().__init__(lexicon, leaves, seed)
+        self.solver = EndgameSolver(lexicon)
+        self.time_limit = time_limit
+
+    def take_turn(self, game: Game):
+        """
+        Plays one turn for the current player
+
+        :param game: Game
+        :return:
+        """
+        if len(game.tile_bag) or len(game.players) != 2:
+            super().take_turn(game)
+            return
+
+        solution = self.solver.solve(game, self.time_limit)
+        if solution.moves and solution.moves[0] is not None:
+            game.apply_move(solution.moves[0])
+        else:
+            game.pass_turn()
+
+
+class PreEndgameBot(EndgameBot):
+    # Plays like EndgameBot, and with one to six tiles in the bag plays the candidate with the best
+    # chance of winning over every draw it can lead to
+    def __init__(self, lexicon: Lexicon, leaves: Union[LeaveTable, None] = None, time_limit: float = 5.0,
+                 candidates: int = 8, workers: Union[int, None] = None, seed: Union[int, None] = None) -> None:
+        """
+
+        :param lexicon: Lexicon
+        :param leaves: optional leave values for the moves before the pre-endgame
+        :param time_limit: seconds of search per turn in the pre-endgame and the endgame
+        :param candidates: number of top scoring moves analysed in the pre-endgame
+        :param workers: pre-endgame processes, defaults to one per core, 1 evaluates in this process
+        :param seed: seed of the bots random choices
+        """
+        super().__init__(lexicon, leaves, time_limit, seed)
+        self.pre_endgame = PreEndgameSolver(lexicon, candidates, time_limit, workers=workers)
+
+    def take_turn(self, game: Game):
+        """
+        Plays one turn for the current player
+
+        :param game: Game
+        :return:
+        """
+        if len(game.players) != 2 or not 1 <= len(game.tile_bag) <= MAX_BAG_TILES:
+            super().take_turn(game)
+            return
+
+        results = self.pre_endgame.solve(game)
+        if results:
+            game.apply_move(results[0].move)
+        else:
+            exchange_or_pass(game)
+
+    def close(self):
+        """
+        Shuts down the pre-endgame processes
+
+        :return:
+        """
+        self.pre_endgame.close()
+
+
+class SimBot:
+    # Simulates the highest scoring moves a few turns ahead against sampled opponent racks and plays
+    # the move with the best average spread, rollouts run across a process pool. In two player games
+    # the opponents rack is sampled from what their moves show about it.
+    def __init__(self, lexicon: Lexicon, candidates: int = 10, plies: int = 2,
+                 time_budget: Union[float, None] = 2.0, iterations: Union[int, None] = None,
+                 workers: Union[int, None] = None, infer: bool = True, leaves: Union[LeaveTable, None] = None,
+                 seed: Union[int, None] = None) -> None:
+        """
+
+        :param lexicon: Lexicon
+        :param candidates: number of top scoring moves to simulate
+        :param plies: turns played per rollout, the candidate move included
+        :param time_budget: seconds of simulation per turn, None for no limit
+        :param iterations: rollouts per candidate per turn, None for no limit
+        :param workers: rollout processes, defaults to one per core, 1 runs rollouts in this process
+        :param infer: sample opponent racks from the inferred distribution rather than evenly
+        :param leaves: leave values the opponent is assumed to play by when inferring their rack
+        :param seed: seed of the sampled racks and draws, rollouts are seeded from it whichever worker plays them
+        """
+        if time_budget is None and iterations is None:
+            raise ValueError("SimBot needs a time budget or an iteration limit")
+
+        self.generator = MoveGenerator(lexicon)
+        self.candidates = candidates
+        self.plies = plies
+        self.time_budget = time_budget
+        self.iterations = iterations
+        self.workers = workers or os.cpu_count() or 1
+        self.executor: Union[ProcessPoolExecutor, None] = None
+        self.rng = random.Random(seed)
+
+        self.shared: Union[SharedGameState, None] = None
+
+        self.lexicon = lexicon
+        self.infer = infer
+        self.leaves = leaves
+        self.inference: Union[RackInference, None] = None
+
+    def take_turn(self, game: Game):
+        """
+        Plays one turn for the current player
+
+        :param game: Game
+        :return:
+        """
+        moves = self.generator.generate(game.board, game.current_player.rack)
+        if not moves:
+            exchange_or_pass(game)
+            return
+
+        moves.sort(key=lambda move: move.score, reverse=True)
+        candidates = moves[:self.candidates]
+
+        if len(candidates) == 1:
+            game.apply_move(candidates[0])
+            return
+
+        equities = self.simulate(game, candidates)
+        game.apply_move(candidates[max(range(len(candidates)), key=equities.__getitem__)])
+
+    def simulate(self, game: Game, candidates: List[Move]) -> List[float]:
+        """
+        Average spread gained by each candidate over as many rollouts as the budget allows
+
+        :param game: Game at the current players turn
+        :param candidates: list[Move]
+        :return: list[float] one equity per candidate
+        """
+        # The rack inference runs while the workers are idle, so the budget starts once it is done
+        payload = (candidates, self.opponent_racks(game))
+
+        deadline = None if self.time_budget is None else time.time() + self.time_budget
+        limit = self.iterations if self.iterations is not None else sys.maxsize
+        seeds = random.Random(self.rng.getrandbits(64))
+
+        if self.workers == 1:
+            state = pickle.dumps((game.copy(), payload))
+            totals, played = play_rollouts(state, self.plies, limit, deadline, seeds.getrandbits(64))
+            return [total / played for total in totals]
+
+        # Workers read the position from shared memory, so a task only carries the block name. The block
+        # comes first so the workers share the resource tracker that frees it.
+        self.shared = share_state(self.shared, game, payload)
+        state = self.shared.name
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        totals = [0.0] * len(candidates)
+        played = 0
+        submitted = 0
+        pending = set()
+
+        while True:
+            # Keeps every worker busy until the budget runs out
+            while len(pending) < self.workers and submitted < limit and \
+                    (deadline is None or time.time() < deadline or submitted == 0):
+                batch = min(ROLLOUT_BATCH, limit - submitted)
+                pending.add(self.executor.submit(play_rollouts, state, self.plies, batch, deadline,
+                                                 seeds.getrandbits(64)))
+                submitted += batch
+
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                task_totals, task_played = future.result()
+                totals = [total + task_total for total, task_total in zip(totals, task_totals)]
+                played += task_played
+
+        return [total / played for total in totals]
+
+    def opponent_racks(self, game: Game) -> Union[np.ndarray, None]:
+        """
+        Racks the opponent may hold, sampled from their inferred rack
+
+        :param game: Game at the current players turn
+        :return: (SAMPLED_RACKS, RACK_SLOTS) racks, None to sample evenly or with more than one opponent
+        """
+        if not self.infer or len(game.players) != 2:
+            return None
+
+        seat = game.turn
+        if self.inference is None or self.inference.observer != seat:
+            self.inference = RackInference(1 - seat, seat, self.lexicon, self.leaves, seed=self.rng.getrandbits(64))
+        self.inference.update(game)
+        return self.inference.sample(SAMPLED_RACKS, unseen_tiles(game, seat), game.players[1 - seat].rack_size())
+
+    def close(self):
+        """
+        Shuts down the rollout processes and frees the shared position
+
+        :return:
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        if self.shared is not None:
+            self.shared.close()
+            self.shared = None
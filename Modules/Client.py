@@ -0,0 +1,165 @@
+import json
+import queue
+import socket
+import threading
+from typing import Dict, List, Union
+
+from Modules.Game import EXCHANGE, MOVE, PASS, Game
+from Modules.Lexicon import Lexicon
+from Modules.MoveGenerator import Move
+from Modules.Scrabble import RACK_SLOTS, rack_slot, tile_code
+
+
+class Connection:
+    # Blocking connection to a game server, messages are read on a background thread so a frame loop
+    # can poll for them
+    def __init__(self, host: str, port: int) -> None:
+        """
+
+        :param host: str
+        :param port: int
+        """
+        self.socket = socket.create_connection((host, port))
+        self.messages: queue.Queue = queue.Queue()
+        self.thread = threading.Thread(target=self._read, daemon=True)
+        self.thread.start()
+
+    def _read(self):
+        try:
+            with self.socket.makefile("rb") as lines:
+                for line in lines:
+                    self.messages.put(json.loads(line))
+        except (OSError, ValueError):
+            pass
+        self.messages.put({"type": "closed"})
+
+    def send(self, message: Dict):
+        self.socket.sendall(json.dumps(message).encode() + b"\n")
+
+    def wait_for(self, kind: str, timeout: float = 10.0) -> Dict:
+        """
+        Waits for a message of a type, skipping others
+
+        :param kind: message type
+        :param timeout: seconds to wait for each message
+        :return: dict message
+        """
+        while True:
+            try:
+                message = self.messages.get(timeout=timeout)
+            except queue.Empty:
+                raise TimeoutError("No reply from the server")
+            if message["type"] == "error":
+                raise ValueError(message["message"])
+            if message["type"] == "closed":
+                raise ConnectionError("The server closed the connection")
+            if message["type"] == kind:
+                return message
+
+    def create(self, seats: List[str], seed: Union[int, None] = None) -> int:
+        """
+        Starts a game on the server
+
+        :param seats: "human" or a bot name per seat
+        :param seed: optional game seed
+        :return: int game id
+        """
+        self.send({"type": "create", "seats": seats, "seed": seed})
+        return self.wait_for("created")["game"]
+
+    def close(self):
+        self.socket.close()
+
+
+class RemoteGame(Game):
+    # Game played on a server, shaped like a local Game for the interface. Turns are sent to the server
+    # and the board, racks and scores follow the states it sends back.
+    def __init__(self, lexicon: Lexicon, connection: Connection, game_id: int, seat: Union[int, None]) -> None:
+        """
+
+        :param lexicon: Lexicon
+        :param connection: Connection
+        :param game_id: int
+        :param seat: seat to play, None to watch
+        """
+        connection.send({"type": "join", "game": game_id, "seat": seat})
+        state = connection.wait_for("state")
+
+        super().__init__(lexicon, len(state["seats"]), state["seed"])
+        self.connection = connection
+        self.game_id = game_id
+        self.seat = seat
+        self.seats = state["seats"]
+
+        # Last error the server sent, such as an illegal placement
+        self.error: Union[str, None] = None
+        self.apply_state(state)
+
+    def apply_state(self, state: Dict):
+        """
+        Brings the board, racks and scores in line with a state from the server
+
+        :param state: dict state message
+        :return:
+        """
+        board = self.board
+        taken = set(board.get_tile_positions())
+        placed = [(pos, letter, blank) for pos, letter, blank in state["tiles"] if pos not in taken]
+        if placed:
+            board.place_tiles(placed)
+
+        # Only the rack of our own seat is known
+        for i, player in enumerate(self.players):
+            player.score = state["scores"][i]
+            player.rack = bytearray(RACK_SLOTS)
+            if i == self.seat:
+                for letter in state["rack"]:
+                    player.rack[rack_slot(tile_code(letter))] += 1
+            player.sync_tiles()
+
+        self.turn = state["turn"]
+        self.finished = state["over"]
+        board.invalidate_moves()
+
+    def poll(self) -> bool:
+        """
+        Applies the messages that arrived since the last poll, without waiting
+
+        :return: True if the game changed
+        """
+        changed = False
+        while True:
+            try:
+                message = self.connection.messages.get_nowait()
+            except queue.Empty:
+                return changed
+
+            if message["type"] == "state" and message["game"] == self.game_id:
+                self.apply_state(message)
+                self.error = None
+                changed = True
+            elif message["type"] == "error":
+                self.error = message["message"]
+            elif message["type"] == "bot_error" and message["game"] == self.game_id:
+                self.error = message["message"]
+            elif message["type"] == "closed":
+                self.error = "The server closed the connection"
+
+    def apply_move(self, move: Move) -> int:
+        """
+        Sends a move to the server, the board changes when the server accepts it
+
+        :param move: Move
+        :return: 0, the score arrives with the next state
+        """
+        self.connection.send({"type": MOVE, "game": self.game_id, "tiles": move.tiles})
+        return 0
+
+    def pass_turn(self):
+        self.connection.send({"type": PASS, "game": self.game_id})
+
+    def exchange(self, letters: List[str]):
+        self.connection.send({"type": EXCHANGE, "game": self.game_id, "letters": "".join(letters)})
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,312 @@
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple, Union
+
+# Binary file layout: header followed by the node array as native unsigned 32 bit integers
+DAWG_MAGIC = b"DAWG"
+DAWG_VERSION = 1
+DAWG_HEADER = struct.Struct("=4sIII20sI")  # magic, version, word count, node array length, source digest, reserved
+
+# Each node is a header word followed by one child offset per set bit of the letter mask
+LETTER_MASK = (1 << 26) - 1
+TERMINAL_FLAG = 1 << 26
+
+ROOT = 0
+NO_NODE = -1
+
+ALPHABET = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def letter_index(letter: str) -> int:
+    return ord(letter) - 97
+
+
+def source_digest(path: str) -> bytes:
+    """
+    Digest of the word file, used to tell if a compiled cache is stale
+
+    :param path: str
+    :return: bytes
+    """
+    digest = hashlib.sha1()
+    with open(path, "rb") as source_file:
+        for block in iter(lambda: source_file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+class Dawg:
+    # Minimized directed acyclic word graph stored in a flat integer array
+    def __init__(self, nodes: Sequence[int], word_count: int, mapping: Union[mmap.mmap, None] = None,
+                 path: Union[str, None] = None) -> None:
+        """
+
+        :param nodes: flat node array, an array or a memoryview over a memory mapped file
+        :param word_count: number of words in the graph
+        :param mapping: memory map backing the nodes, kept open for the lifetime of the graph
+        :param path: compiled graph file the mapping was opened from
+        """
+        self.nodes = nodes
+        self.word_count = word_count
+        self.mapping = mapping
+        self.path = path
+
+    def __reduce__(self):
+        # A mapped graph is sent to other processes as its file path and mapped again on arrival
+        if self.mapping is not None:
+            return self.load, (self.path,)
+        return self.__class__, (array("I", self.nodes), self.word_count)
+
+    @classmethod
+    def build(cls, words: Iterable[str]) -> "Dawg":
+        """
+        Builds a minimized graph from the words, using the incremental algorithm for sorted input
+
+        :param words: iterable of lower case words
+        :return: Dawg
+        """
+        terminal: List[bool] = [False]
+        children: List[Dict[int, int]] = [{}]
+        register: Dict[Tuple, int] = {}
+        unchecked: List[Tuple[int, int, int]] = []
+
+        def minimize(down_to: int):
+            # Replaces each unchecked node with an equivalent registered node if one exists
+            while len(unchecked) > down_to:
+                parent, letter, child = unchecked.pop()
+                key = (terminal[child], tuple(children[child].items()))
+                if key in register:
+                    children[parent][letter] = register[key]
+                else:
+                    register[key] = child
+
+        previous = ""
+        word_count = 0
+        for word in sorted(set(words)):
+            common = 0
+            for a, b in zip(word, previous):
+                if a != b:
+                    break
+                common += 1
+
+            minimize(common)
+
+            node = unchecked[-1][2] if unchecked else ROOT
+            for letter in word[common:]:
+                terminal.append(False)
+                children.append({})
+                child = len(terminal) - 1
+                children[node][letter_index(letter)] = child
+                unchecked.append((node, letter_index(letter), child))
+                node = child
+
+            terminal[node] = True
+            previous = word
+            word_count += 1
+
+        minimize(0)
+
+        return cls(cls._flatten(terminal, children), word_count)
+
+    @staticmethod
+    def _flatten(terminal: List[bool], children: List[Dict[int, int]]) -> array:
+        """
+        Lays the reachable nodes out in a flat array with the root at offset zero
+
+        :param terminal: list[bool]
+        :param children: list[dict[int, int]]
+        :return: array
+        """
+        # Collect reachable nodes breadth first
+        order = [ROOT]
+        seen = {ROOT}
+        for node in order:
+            for child in children[node].values():
+                if child not in seen:
+                    seen.add(child)
+                    order.append(child)
+
+        offsets: Dict[int, int] = {}
+        size = 0
+        for node in order:
+            offsets[node] = size
+            size += 1 + len(children[node])
+
+        nodes = array("I", bytes(4 * size))
+        for node in order:
+            offset = offsets[node]
+            header = TERMINAL_FLAG if terminal[node] else 0
+            for i, letter in enumerate(sorted(children[node])):
+                header |= 1 << letter
+                nodes[offset + 1 + i] = offsets[children[node][letter]]
+            nodes[offset] = header
+
+        return nodes
+
+    @classmethod
+    def load(cls, path: str) -> "Dawg":
+        """
+        Memory maps a compiled graph, the mapping is read only and shared between processes
+
+        :param path: str
+        :return: Dawg
+        """
+        with open(path, "rb") as dawg_file:
+            mapping = mmap.mmap(dawg_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        _, _, word_count, length, _, _ = DAWG_HEADER.unpack_from(mapping)
+        nodes = memoryview(mapping)[DAWG_HEADER.size:DAWG_HEADER.size + 4 * length].cast("I")
+
+        return cls(nodes, word_count, mapping, path)
+
+    def save(self, path: str, digest: bytes = bytes(20)):
+        """
+        Writes the graph to a binary file, replacing any existing file atomically
+
+        :param path: str
+        :param digest: digest of the source word file
+        :return:
+        """
+        temp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(temp_path, "wb") as dawg_file:
+            dawg_file.write(DAWG_HEADER.pack(DAWG_MAGIC, DAWG_VERSION, self.word_count, len(self.nodes), digest, 0))
+            dawg_file.write(array("I", self.nodes).tobytes())
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def is_current(path: str, digest: bytes) -> bool:
+        """
+        Checks if a compiled graph exists and was built from a source with the given digest
+
+        :param path: str
+        :param digest: bytes
+        :return: bool
+        """
+        try:
+            with open(path, "rb") as dawg_file:
+                header = dawg_file.read(DAWG_HEADER.size)
+        except OSError:
+            return False
+
+        if len(header) != DAWG_HEADER.size:
+            return False
+
+        # The magic is written in native byte order, so a file from another architecture is rebuilt
+        magic, version, _, _, file_digest, _ = DAWG_HEADER.unpack(header)
+        return magic == DAWG_MAGIC and version == DAWG_VERSION and file_digest == digest
+
+    @classmethod
+    def from_word_file(cls, source_path: str, dawg_path: Union[str, None] = None) -> "Dawg":
+        """
+        Loads the compiled graph for a word file, compiling it first if the source has changed
+
+        :param source_path: word file with one word per line
+        :param dawg_path: compiled graph location, defaults to the source path with a .dawg extension
+        :return: Dawg
+        """
+        if dawg_path is None:
+            dawg_path = os.path.splitext(source_path)[0] + ".dawg"
+
+        digest = source_digest(source_path)
+        if not cls.is_current(dawg_path, digest):
+            with open(source_path, "r") as word_file:
+                dawg = cls.build(line.strip().lower() for line in word_file if line.strip())
+            dawg.save(dawg_path, digest)
+
+        return cls.load(dawg_path)
+
+    def is_terminal(self, node: int) -> bool:
+        return bool(self.nodes[node] & TERMINAL_FLAG)
+
+    def letter_mask(self, node: int) -> int:
+        """
+        Bit mask of the letters leaving the node, bit i is set for letter i
+
+        :param node: int
+        :return: int
+        """
+        return self.nodes[node] & LETTER_MASK
+
+    def child(self, node: int, letter: int) -> int:
+        """
+        Follows the edge for a letter index, returns NO_NODE if there is none
+
+        :param node: int
+        :param letter: int
+        :return: int
+        """
+        header = self.nodes[node]
+        if not (header >> letter) & 1:
+            return NO_NODE
+        return self.nodes[node + 1 + (header & ((1 << letter) - 1)).bit_count()]
+
+    def children(self, node: int) -> Iterator[Tuple[int, int]]:
+        """
+        Yields (letter index, child node) pairs in alphabetical order
+
+        :param node: int
+        :return: iterator of (int, int)
+        """
+        mask = self.nodes[node] & LETTER_MASK
+        position = node + 1
+        while mask:
+            low_bit = mask & -mask
+            yield low_bit.bit_length() - 1, self.nodes[position]
+            position += 1
+            mask ^= low_bit
+
+    def walk(self, word: str, node: int = ROOT) -> int:
+        """
+        Follows the letters of a word from a node, returns NO_NODE if the path leaves the graph
+
+        :param word: str
+        :param node: int
+        :return: int
+        """
+        nodes = self.nodes
+        for letter in word:
+            header = nodes[node]
+            index = ord(letter) - 97
+            if not 0 <= index < 26 or not (header >> index) & 1:
+                return NO_NODE
+            node = nodes[node + 1 + (header & ((1 << index) - 1)).bit_count()]
+        return node
+
+    def __contains__(self, word: str) -> bool:
+        node = self.walk(word)
+        return node != NO_NODE and bool(self.nodes[node] & TERMINAL_FLAG)
+
+    def __len__(self) -> int:
+        return self.word_count
+
+    def words(self, node: int = ROOT, prefix: str = "", max_length: Union[int, None] = None) -> Iterator[str]:
+        """
+        Yields every word below a node in alphabetical order
+
+        :param node: int
+        :param prefix: letters spelling the path to the node
+        :param max_length: optional maximum word length
+        :return: iterator of str
+        """
+        stack = [(node, prefix)]
+        while stack:
+            current, word = stack.pop()
+            if self.nodes[current] & TERMINAL_FLAG:
+                yield word
+            if max_length is not None and len(word) >= max_length:
+                continue
+            # Pushed in reverse so the words come out in order
+            for letter, child in reversed(list(self.children(current))):
+                stack.append((child, word + ALPHABET[letter]))
+
+
+if __name__ == '__main__':
+    # Build step: python -m Modules.Dawg [word file] [output file]
+    source = sys.argv[1] if len(sys.argv) > 1 else "./Resources/ScrabbleWords.txt"
+    output = sys.argv[2] if len(sys.argv) > 2 else None
+    compiled = Dawg.from_word_file(source, output)
+    print("{} words, {} node array entries".format(len(compiled), len(compiled.nodes)))
@@ -0,0 +1,383 @@
+import random
+import time
+from typing import Dict, List, Tuple, Union
+
+from Modules.Game import MAX_SCORELESS_TURNS, Game
+from Modules.Lexicon import Lexicon
+from Modules.MoveGenerator import Move, MoveGenerator
+from Modules.Scrabble import RACK_SIZE, RACK_SLOTS, code_value, rack_slot, tile_code
+
+# Bound flags of transposition table entries
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+INFINITY = 1 << 30
+
+# Passes are stored as this move key
+PASS_KEY = ()
+
+# Zobrist keys, drawn from a fixed seed so hashes are stable between runs. Square keys cover boards
+# up to 21 x 21 and every tile code.
+_zobrist_random = random.Random(0x5C4ABB1E)
+ZOBRIST_SQUARES = [[_zobrist_random.getrandbits(64) for _ in range(64)] for _ in range(21 * 21)]
+ZOBRIST_RACKS = [[[_zobrist_random.getrandbits(64) for _ in range(RACK_SIZE + 1)] for _ in range(RACK_SLOTS)]
+                 for _ in range(2)]
+ZOBRIST_SCORELESS = [_zobrist_random.getrandbits(64) for _ in range(MAX_SCORELESS_TURNS + 1)]
+ZOBRIST_SIDE = _zobrist_random.getrandbits(64)
+
+
+class SearchTimeout(Exception):
+    # Raised inside the search when the time limit runs out
+    pass
+
+
+class TranspositionTable:
+    # Fixed size hash table of searched positions, one entry per slot. A slot is replaced when it was
+    # written by an earlier solve or when the new result was searched at least as deep.
+    def __init__(self, size_bits: int = 18) -> None:
+        """
+
+        :param size_bits: the table holds 2 ** size_bits entries
+        """
+        size = 1 << size_bits
+        self.mask = size - 1
+        self.keys = [0] * size
+        self.depths = [-1] * size
+        self.values = [0] * size
+        self.flags = [EXACT] * size
+        self.moves: List[Union[tuple, None]] = [None] * size
+        self.ages = [0] * size
+        self.age = 0
+
+    def new_search(self):
+        self.age += 1
+
+    def probe(self, key: int) -> Union[int, None]:
+        """
+        Slot holding the position, None if it is not stored
+
+        :param key: Zobrist hash
+        :return: int
+        """
+        slot = key & self.mask
+        return slot if self.keys[slot] == key and self.depths[slot] >= 0 else None
+
+    def store(self, key: int, depth: int, value: int, flag: int, move: Union[tuple, None]):
+        slot = key & self.mask
+        if self.ages[slot] == self.age and self.depths[slot] > depth and self.keys[slot] != key:
+            return
+
+        self.keys[slot] = key
+        self.depths[slot] = depth
+        self.values[slot] = value
+        self.flags[slot] = flag
+        self.moves[slot] = move
+        self.ages[slot] = self.age
+
+
+class Solution:
+    # Result of an endgame search
+    def __init__(self, value: int, moves: List[Union[Move, None]], depth: int, nodes: int, exact: bool) -> None:
+        """
+
+        :param value: final spread change for the player to move, counting end of game rack adjustments
+        :param moves: best line found, None for a pass
+        :param depth: deepest completed search depth in turns
+        :param nodes: number of positions searched
+        :param exact: True if every move was searched to the end of the game
+        """
+        self.value = value
+        self.moves = moves
+        self.depth = depth
+        self.nodes = nodes
+        self.exact = exact
+
+
+def move_key(move: Union[Move, None]) -> tuple:
+    return PASS_KEY if move is None else tuple(move.tiles)
+
+
+class EndgameSolver:
+    # Negascout search with iterative deepening for two player positions with an empty bag, where both
+    # racks are known
+    def __init__(self, lexicon: Lexicon, width: Union[int, None] = 16, table_bits: int = 18,
+                 move_cache_size: int = 2048) -> None:
+        """
+
+        :param lexicon: Lexicon
+        :param width: moves searched per position after ordering, a pass is always searched as well,
+            None searches every move and makes the result exact once the game end is reached
+        :param table_bits: the transposition table holds 2 ** table_bits entries
+        :param move_cache_size: positions whose generated moves are kept between iterations
+        """
+        self.generator = MoveGenerator(lexicon)
+        self.width = width
+        self.table = TranspositionTable(table_bits)
+        self.move_cache: Dict[int, List[Move]] = {}
+        self.move_cache_size = move_cache_size
+
+        # Search state, set up by solve
+        self.board = None
+        self.racks: List[bytearray] = []
+        self.rack_values = [0, 0]
+        self.side = 0
+        self.scoreless = 0
+        self.key = 0
+        self.nodes = 0
+        self.deadline = 0.0
+        self.hit_horizon = False
+        self.pruned = False
+
+    def solve(self, game: Game, time_limit: float = 5.0, max_depth: int = 16) -> Solution:
+        """
+        Searches the position for the player to move, deepening one turn at a time until the game
+        is solved, the depth limit is reached or the time runs out
+
+        :param game: Game with an empty bag and two players
+        :param time_limit: seconds
+        :param max_depth: deepest search in turns
+        :return: Solution with the best line of the deepest completed search
+        """
+        if len(game.players) != 2:
+            raise ValueError("The endgame solver needs a two player game")
+        if len(game.tile_bag):
+            raise ValueError("The endgame solver needs an empty bag")
+
+        self._set_up(game)
+        deadline = time.perf_counter() + time_limit
+        self.table.new_search()
+        self.nodes = 0
+
+        solution = None
+        for depth in range(1, max_depth + 1):
+            # A one turn search always completes so there is a move to play
+            self.deadline = deadline if depth > 1 else float("inf")
+            self.hit_horizon = False
+            self.pruned = False
+            try:
+                value = self._search(depth, -INFINITY, INFINITY)
+            except SearchTimeout:
+                break
+
+            solution = Solution(value, self._principal_variation(depth), depth, self.nodes,
+                                not self.hit_horizon and not self.pruned)
+
+            # Every line ended the game, searching deeper changes nothing
+            if not self.hit_horizon:
+                break
+
+        return solution
+
+    def _set_up(self, game: Game):
+        self.board = game.board.copy()
+        self.racks = [bytearray(player.rack) for player in game.players]
+        self.rack_values = [sum(code_value(code) * count for code, count in enumerate(rack)) for rack in self.racks]
+        self.side = game.turn
+        self.scoreless = game.scoreless_turns
+
+        self.key = ZOBRIST_SCORELESS[self.scoreless]
+        for pos in self.board.get_tile_positions():
+            self.key ^= ZOBRIST_SQUARES[pos][tile_code(chr(self.board.letters[pos]), bool(self.board.blanks[pos]))]
+        for side, rack in enumerate(self.racks):
+            for slot, count in enumerate(rack):
+                self.key ^= ZOBRIST_RACKS[side][slot][count]
+        if self.side:
+            self.key ^= ZOBRIST_SIDE
+
+    def _moves(self) -> List[Union[Move, None]]:
+        """
+        Moves for the player to move, cached by position, with a pass last
+
+        :return: list
+        """
+        moves = self.move_cache.get(self.key)
+        if moves is None:
+            moves = self.generator.generate(self.board, self.racks[self.side])
+
+            # Going out first, then by score
+            rack_tiles = sum(self.racks[self.side])
+            moves.sort(key=lambda move: (len(move.tiles) == rack_tiles, move.score), reverse=True)
+            moves.append(None)
+
+            if len(self.move_cache) >= self.move_cache_size:
+                self.move_cache.clear()
+            self.move_cache[self.key] = moves
+        return moves
+
+    def _search(self, depth: int, alpha: int, beta: int) -> int:
+        """
+        Negascout search, the value is the spread change from here for the player to move
+
+        :param depth: turns left to search
+        :param alpha: int
+        :param beta: int
+        :return: int
+        """
+        self.nodes += 1
+        if time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        original_alpha = alpha
+        table_move = None
+        slot = self.table.probe(self.key)
+        if slot is not None:
+            table_move = self.table.moves[slot]
+            if self.table.depths[slot] >= depth:
+                # Entries from earlier solves may have been cut off at a horizon or pruned
+                if self.table.ages[slot] != self.table.age:
+                    self.pruned = True
+                value = self.table.values[slot]
+                flag = self.table.flags[slot]
+                if flag == EXACT:
+                    return value
+                if flag == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+
+        moves = self._moves()
+        if table_move is not None:
+            for i, move in enumerate(moves):
+                if move_key(move) == table_move:
+                    moves = [move] + moves[:i] + moves[i + 1:]
+                    break
+
+        if self.width is not None and len(moves) > self.width + 1:
+            self.pruned = True
+            moves = moves[:self.width] + [None] if None not in moves[:self.width] else moves[:self.width + 1]
+
+        best = -INFINITY
+        best_move = None
+        for i, move in enumerate(moves):
+            if i == 0:
+                value = self._child_value(move, depth, alpha, beta)
+            else:
+                # Null window first, searched again only if the move turns out better
+                value = self._child_value(move, depth, alpha, alpha + 1)
+                if alpha < value < beta:
+                    value = self._child_value(move, depth, value, beta)
+
+            if value > best:
+                best = value
+                best_move = move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        flag = UPPER if best <= original_alpha else LOWER if best >= beta else EXACT
+        self.table.store(self.key, depth, best, flag, move_key(best_move))
+
+        return best
+
+    def _child_value(self, move: Union[Move, None], depth: int, alpha: int, beta: int) -> int:
+        """
+        Value of a move for the player making it
+
+        :param move: Move, None for a pass
+        :param depth: depth of the position the move is made from
+        :param alpha: int
+        :param beta: int
+        :return: int
+        """
+        side = self.side
+        score = 0 if move is None else move.score
+        tile_count = 0 if move is None else len(move.tiles)
+        played_value = 0 if move is None else sum(0 if blank else code_value(tile_code(letter))
+                                                  for _, letter, blank in move.tiles)
+
+        # Going out ends the game, the other player's rack counts twice
+        if tile_count and tile_count == sum(self.racks[side]):
+            return score + 2 * self.rack_values[1 - side]
+
+        scoreless = 0 if score > 0 else self.scoreless + 1
+        if scoreless >= MAX_SCORELESS_TURNS:
+            return score - (self.rack_values[side] - played_value) + self.rack_values[1 - side]
+
+        # The next position is at the horizon, where tiles left on a rack are likely to cost their value
+        # at the end of the game, so there is no need to place the tiles
+        if depth == 1:
+            self.hit_horizon = True
+            return score - (self.rack_values[side] - played_value) + self.rack_values[1 - side]
+
+        previous = self._play(move, scoreless)
+        try:
+            value = score - self._search(depth - 1, -beta, -alpha)
+        finally:
+            self._unplay(move, previous)
+        return value
+
+    def _play(self, move: Union[Move, None], scoreless: int) -> int:
+        """
+        Makes a move on the search board and racks
+
+        :param move: Move, None for a pass
+        :param scoreless: scoreless turn count after the move
+        :return: int scoreless turn count before the move, to undo it
+        """
+        side = self.side
+        rack = self.racks[side]
+        if move is not None:
+            for pos, letter, blank in move.tiles:
+                code = tile_code(letter, blank)
+                slot = rack_slot(code)
+                self.key ^= ZOBRIST_SQUARES[pos][code]
+                self.key ^= ZOBRIST_RACKS[side][slot][rack[slot]] ^ ZOBRIST_RACKS[side][slot][rack[slot] - 1]
+                rack[slot] -= 1
+                self.rack_values[side] -= code_value(code)
+            self.board.place_tiles(move.tiles)
+
+        previous = self.scoreless
+        self.key ^= ZOBRIST_SCORELESS[previous] ^ ZOBRIST_SCORELESS[scoreless] ^ ZOBRIST_SIDE
+        self.scoreless = scoreless
+        self.side = 1 - side
+        return previous
+
+    def _unplay(self, move: Union[Move, None], previous: int):
+        self.key ^= ZOBRIST_SCORELESS[self.scoreless] ^ ZOBRIST_SCORELESS[previous] ^ ZOBRIST_SIDE
+        self.scoreless = previous
+        self.side = side = 1 - self.side
+
+        if move is not None:
+            rack = self.racks[side]
+            self.board.remove_tiles([pos for pos, _, _ in move.tiles])
+            for pos, letter, blank in move.tiles:
+                code = tile_code(letter, blank)
+                slot = rack_slot(code)
+                self.key ^= ZOBRIST_SQUARES[pos][code]
+                self.key ^= ZOBRIST_RACKS[side][slot][rack[slot]] ^ ZOBRIST_RACKS[side][slot][rack[slot] + 1]
+                rack[slot] += 1
+                self.rack_values[side] += code_value(code)
+
+    def _principal_variation(self, depth: int) -> List[Union[Move, None]]:
+        """
+        Best line found, read back from the transposition table
+
+        :param depth: int
+        :return: list
+        """
+        line: List[Union[Move, None]] = []
+        played: List[Tuple[Union[Move, None], int]] = []
+        for _ in range(depth):
+            slot = self.table.probe(self.key)
+            if slot is None:
+                break
+
+            moves = {move_key(move): move for move in self._moves()}
+            if self.table.moves[slot] not in moves:
+                break
+            move = moves[self.table.moves[slot]]
+            line.append(move)
+
+            tile_count = 0 if move is None else len(move.tiles)
+            scoreless = 0 if move is not None and move.score > 0 else self.scoreless + 1
+            if tile_count == sum(self.racks[self.side]) or scoreless >= MAX_SCORELESS_TURNS:
+                break
+            played.append((move, self._play(move, scoreless)))
+
+        for move, previous in reversed(played):
+            self._unplay(move, previous)
+
+        return line
@@ -0,0 +1,217 @@
+import copy
+import random
+import time
+from typing import List, Union
+
+from Modules.Layouts import BoardLayout
+from Modules.Lexicon import Lexicon
+from Modules.MoveGenerator import Move
+from Modules.Scrabble import RACK_SIZE, Board, Player, Tile, TileBag, code_value, tile_code
+
+# The game ends after this many turns in a row without a score
+MAX_SCORELESS_TURNS = 6
+
+MOVE = "move"
+PASS = "pass"
+EXCHANGE = "exchange"
+
+
+class Turn:
+    # Record of a single turn
+    def __init__(self, player: int, action: str, move: Union[Move, None] = None, letters: str = "",
+                 score: int = 0, rack: str = "") -> None:
+        """
+
+        :param player: index of the player taking the turn
+        :param action: MOVE, PASS or EXCHANGE
+        :param move: the move played, if any
+        :param letters: the letters exchanged, if any
+        :param score: points scored by the turn
+        :param rack: the players rack before the turn, '?' for blanks
+        """
+        self.player = player
+        self.action = action
+        self.move = move
+        self.letters = letters
+        self.score = score
+        self.rack = rack
+
+        # Seconds taken to choose the turn, filled in by whoever timed it
+        self.time = 0.0
+
+
+class Game:
+    # Headless Scrabble game holding the board, the bag and the players, with no rendering
+    def __init__(self, lexicon: Lexicon, player_count: int = 2, seed: Union[int, None] = None,
+                 layout: Union[BoardLayout, None] = None) -> None:
+        """
+
+        :param lexicon: Lexicon
+        :param player_count: int
+        :param seed: seed of the tile draws, the same seed and moves always give the same game
+        :param layout: BoardLayout of the board, the standard board by default
+        """
+        self.lexicon = lexicon
+        self.seed = seed
+        self.board = Board.standard(lexicon) if layout is None else Board(layout, lexicon)
+        self.tile_bag = TileBag(random.Random(seed))
+
+        self.players = [Player() for _ in range(player_count)]
+        for player in self.players:
+            player.get_tiles(self.tile_bag)
+
+        self.turn = 0
+        self.scoreless_turns = 0
+        self.finished = False
+        self.history: List[Turn] = []
+
+    @property
+    def current_player(self) -> Player:
+        return self.players[self.turn]
+
+    def apply_move(self, move: Move) -> int:
+        """
+        Plays a move for the current player, scores it and refills their rack. Human and bot moves
+        are checked the same way and an illegal move raises a ValueError.
+
+        :param move: Move
+        :return: int score of the move
+        """
+        if self.finished:
+            raise ValueError("The game is over")
+
+        player = self.current_player
+        rack = "".join(player.rack_letters())
+
+        placement = self.board.check_placement(move.tiles)
+        if not placement.valid:
+            raise ValueError(placement.error)
+
+        player.remove_codes(tile_code(letter, blank) for _, letter, blank in move.tiles)
+
+        score = placement.score
+        self.board.place_tiles(move.tiles)
+        player.score += score
+        player.get_tiles(self.tile_bag)
+
+        self.history.append(Turn(self.turn, MOVE, move, score=score, rack=rack))
+
+        if not player.rack_size():
+            self._finish(self.turn)
+        else:
+            self._end_turn(score > 0)
+
+        return score
+
+    def pass_turn(self):
+        """
+        Passes the current players turn
+
+        :return:
+        """
+        if self.finished:
+            raise ValueError("The game is over")
+
+        self.history.append(Turn(self.turn, PASS, rack="".join(self.current_player.rack_letters())))
+        self._end_turn(False)
+
+    def exchange(self, letters: List[str]):
+        """
+        Swaps tiles from the current players rack with tiles from the bag
+
+        :param letters: letters of the tiles to exchange, '?' for blanks
+        :return:
+        """
+        if self.finished:
+            raise ValueError("The game is over")
+        if len(self.tile_bag) < RACK_SIZE:
+            raise ValueError("Exchanging needs at least {} tiles in the bag".format(RACK_SIZE))
+
+        player = self.current_player
+        rack = "".join(player.rack_letters())
+        codes = [tile_code(letter) for letter in letters]
+        player.remove_codes(codes)
+
+        # Draw the new tiles before the old ones go back in
+        player.get_tiles(self.tile_bag)
+        self.tile_bag.return_codes(codes)
+
+        self.history.append(Turn(self.turn, EXCHANGE, letters="".join(letters), rack=rack))
+        self._end_turn(False)
+
+    def placement_move(self, tiles: List[Tile]) -> Move:
+        """
+        Builds a move from rack tiles the current player has put on the board
+
+        :param tiles: list[Tile] with board positions set
+        :return: Move
+        """
+        placement = self.board.check_placement([(tile.board_position, tile.type, False) for tile in tiles])
+        if not placement.valid:
+            raise ValueError(placement.error)
+        return Move(placement.tiles, placement.word, placement.score, placement.across)
+
+    def copy(self) -> "Game":
+        """
+        Copy of the game state for searches, the board, bag and racks are array copies and the
+        copy keeps no history or interface tiles
+
+        :return: Game
+        """
+        game = copy.copy(self)
+        game.board = self.board.copy()
+        game.tile_bag = self.tile_bag.copy()
+        game.players = [player.copy() for player in self.players]
+        game.history = []
+        return game
+
+    def is_over(self) -> bool:
+        return self.finished
+
+    def winner(self) -> Union[int, None]:
+        """
+        Index of the player with the highest score, None on a tie
+
+        :return: int
+        """
+        best = max(player.score for player in self.players)
+        leaders = [i for i, player in enumerate(self.players) if player.score == best]
+        return leaders[0] if len(leaders) == 1 else None
+
+    def play(self, bots: List, max_turns: int = 1000):
+        """
+        Plays the game out with one bot per player, each bot takes its turn through take_turn(game)
+
+        :param bots: list of bots
+        :param max_turns: safety limit on the number of turns
+        :return:
+        """
+        for _ in range(max_turns):
+            if self.finished:
+                break
+            start = time.perf_counter()
+            bots[self.turn].take_turn(self)
+            self.history[-1].time = time.perf_counter() - start
+
+    def _end_turn(self, scored: bool):
+        self.scoreless_turns = 0 if scored else self.scoreless_turns + 1
+        if self.scoreless_turns >= MAX_SCORELESS_TURNS:
+            self._finish(None)
+        else:
+            self.turn = (self.turn + 1) % len(self.players)
+
+    def _finish(self, out_player: Union[int, None]):
+        """
+        Ends the game, every player loses the value of their rack and a player who went out gains it
+
+        :param out_player: index of the player who used all their tiles, if any
+        :return:
+        """
+        for i, player in enumerate(self.players):
+            rack_value = sum(code_value(code) for code in player.rack_codes())
+            player.score -= rack_value
+            if out_player is not None and i != out_player:
+                self.players[out_player].score += rack_value
+
+        self.finished = True
+
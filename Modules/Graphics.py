@@ -1,6 +1,12 @@
-from typing import List
+from typing import List, Tuple, Union
 
-from raylibpy import Color
+from raylibpy import *
+from Modules.Profiler import PROFILER, Profiler
+from Modules.Scrabble import RACK_SIZE, Board, Player, Tile
+
+# Tile colours, on the board and on a rack
+BOARD_TILE_COLOR = Color(227, 204, 32, 255)
+RACK_TILE_COLOR = Color(227, 142, 32, 255)
 
 
 class Dimensions:
@@ -12,8 +18,289 @@ class Dimensions:
 
 
 class Render:
-    # Render Class Holding the boards color information
+    # Render Class Holding the boards color information, square colors follow Layouts.PREMIUM_ORDER
     def __init__(self, border_thickness: int, border_color: Color, square_colors: List[Color]) -> None:
         self.border_thickness = border_thickness
         self.border_color = border_color
         self.square_colors = square_colors
+
+
+class BoardView:
+    # Draws a Board and the players racks, holding the screen position of each square
+    def __init__(self, board: Board) -> None:
+        """
+
+        :param board: Board
+        """
+        self.board = board
+        self.board_squares: List[Rectangle] = []
+
+        # Tiles drawn for the committed letters, rebuilt when the board version changes
+        self.board_tiles: List[Tile] = []
+        self.board_tiles_version = -1
+
+        # The board, its tiles and the racks are drawn into a texture that is only redrawn when one of them
+        # changes, each frame then copies the texture to the screen
+        self.layer: Union[RenderTexture2D, None] = None
+        self.layer_key: Union[Tuple, None] = None
+
+    def update_board_squares(self, dimensions: Dimensions):
+        """
+        Board squares containing information about board positions, would
+        be updated on window size change
+
+        :param dimensions: Dimensions
+        :return:
+        """
+
+        # Clears last board squares
+        self.board_squares.clear()
+        self.layer_key = None
+
+        square_side_length = dimensions.side_length / self.board.side_squares
+
+        # Appending each square to list
+        for i in range(self.board.side_squares):
+            for j in range(self.board.side_squares):
+                self.board_squares.append(Rectangle(
+                    dimensions.pos_x + j * square_side_length,
+                    dimensions.pos_y + i * square_side_length,
+                    square_side_length,
+                    square_side_length
+                ))
+
+    @PROFILER.timed("draw_layer")
+    def draw(self, dimensions: Dimensions, render: Render, players: List[Player]):
+        """
+        Draws the board and the player racks from the cached texture, redrawing the texture first when
+        the board, the racks or the square positions have changed
+
+        :param dimensions: Dimensions
+        :param render: Render
+        :param players: list[Player]
+        :return:
+        """
+        if not self.board_squares:
+            self.update_board_squares(dimensions)
+
+        key = (self.board.version, tuple((tile.type, tile.rack_position, tile.board_position)
+                                         for player in players for tile in player.tiles))
+        if key != self.layer_key:
+            self.render_layer(dimensions, render, players)
+            self.layer_key = key
+
+        # Render textures are stored upside down
+        texture = self.layer.texture
+        draw_texture_rec(texture, Rectangle(0, 0, texture.width, -texture.height), Vector2(0, 0), WHITE)
+
+    @PROFILER.timed("render_layer")
+    def render_layer(self, dimensions: Dimensions, render: Render, players: List[Player]):
+        """
+        Redraws the board and the racks into the cached texture, which covers the screen up to the
+        bottom right corner of the lowest rack
+
+        :param dimensions: Dimensions
+        :param render: Render
+        :param players: list[Player]
+        :return:
+        """
+        rack_bottom = max(rec.y + rec.height for player_num in range(len(players))
+                          for rec in self.get_player_tile_rec(dimensions, player_num))
+        width = int(dimensions.pos_x + dimensions.side_length) + 1
+        height = int(max(dimensions.pos_y + dimensions.side_length, rack_bottom)) + 1
+
+        if self.layer is None or self.layer.texture.width != width or self.layer.texture.height != height:
+            self.unload()
+            self.layer = load_render_texture(width, height)
+
+        begin_texture_mode(self.layer)
+        clear_background(BLANK)
+        self.draw_board(dimensions, render)
+        self.draw_player_pieces(dimensions, players)
+        end_texture_mode()
+
+    def unload(self):
+        """
+        Frees the cached texture, needs to run before the window is closed
+
+        :return:
+        """
+        if self.layer is not None:
+            unload_render_texture(self.layer)
+            self.layer = None
+            self.layer_key = None
+
+    def draw_board(self, dimensions: Dimensions, render: Render):
+        """
+        Draws the board and special scrabble squares
+
+        :param dimensions: Dimensions
+        :param render: Render
+        :return:
+        """
+
+        # Checks to see if the class has square locations
+        if not self.board_squares:
+            self.update_board_squares(dimensions)
+
+        # Draws special squares
+        for square, kind in self.board.layout.premiums:
+            draw_rectangle_rec(self.board_squares[square], render.square_colors[kind])
+
+        # Numbers Board
+        for i, square in enumerate(self.board_squares):
+            draw_text(str(i), square.x + 1, square.y + 1, 10, BLACK)
+
+        # Draws Border TODO: Fix this implementation
+        square_side_length = dimensions.side_length / self.board.side_squares
+        for i in range(self.board.side_squares + 1):
+            start_ver = Vector2(i * square_side_length + dimensions.pos_x, 0 + dimensions.pos_y)
+            end_ver = Vector2(i * square_side_length + dimensions.pos_x, dimensions.side_length + dimensions.pos_y)
+            draw_line_v(start_ver, end_ver, render.border_color)
+
+            start_hor = Vector2(0 + dimensions.pos_x, i * square_side_length + dimensions.pos_y)
+            end_hor = Vector2(dimensions.side_length + dimensions.pos_x, i * square_side_length + dimensions.pos_y)
+            draw_line_v(start_hor, end_hor, render.border_color)
+
+        # Draws board tiles
+        if self.board_tiles_version != self.board.version:
+            self.update_board_tiles()
+
+        tile_side_length = dimensions.side_length / self.board.side_squares
+        for tile in self.board_tiles:
+            self.draw_tile(tile, self.board_squares[tile.board_position], tile_side_length)
+
+    def update_board_tiles(self):
+        """
+        Builds a tile for each committed letter, the board itself only holds letter and value arrays
+
+        :return:
+        """
+        self.board_tiles.clear()
+        for pos in self.board.get_tile_positions():
+            tile = Tile(chr(self.board.letters[pos]), self.board.values[pos])
+            tile.board_position = pos
+            self.board_tiles.append(tile)
+
+        self.board_tiles_version = self.board.version
+
+    @PROFILER.timed("draw_circles")
+    def draw_circles(self, circle_pos: List[int], color: Color):
+        """
+
+        :param color:
+        :param circle_pos:
+        :return:
+        """
+        # TODO: why this
+        square_recs = self.board_squares
+
+        # Draws a circle at each legal move
+        for move in circle_pos:
+            draw_circle(square_recs[move].x + square_recs[move].width / 2,
+                        square_recs[move].y + square_recs[move].height / 2,
+                        5,
+                        color)
+
+    def draw_player_pieces(self, dimensions: Dimensions, players: List[Player]):
+        """
+
+        :param dimensions: Dimensions
+        :param players: list[Player]
+        :return:
+        """
+
+        # Draws the players pieces at each side of the board
+        tile_side_length = dimensions.side_length / self.board.side_squares
+        for player_num, player in enumerate(players):
+            tile_positions = self.get_player_tile_rec(dimensions, player_num)
+            for i, tile in enumerate(player.tiles):
+                if tile.rack_position is not None:
+                    self.draw_tile(tile, tile_positions[tile.rack_position], tile_side_length)
+                if tile.board_position is not None:
+                    self.draw_tile(tile, self.board_squares[tile.board_position], tile_side_length)
+
+    def get_player_tile_rec(self, dimensions: Dimensions, player_number) -> List[Rectangle]:
+        """
+        Gets the players tile positions in a convenience method, rack tiles are the size of board squares
+
+        :param dimensions: Dimensions
+        :param player_number: int
+        :return: list[Rectangle]
+        """
+        tile_side_length = dimensions.side_length / self.board.side_squares
+
+        # Top left corner
+        top_left_x = dimensions.pos_x + dimensions.side_length / 2 - tile_side_length * RACK_SIZE / 2
+
+        # Offset TODO: somewhere else?
+        y_offset = 20
+
+        # TODO: Fix this
+        if player_number == 1:
+            top_left_y = dimensions.pos_y - tile_side_length - y_offset
+        else:
+            top_left_y = dimensions.pos_y + dimensions.side_length + y_offset
+
+        # Append tile positions into list
+        tile_positions = []
+        for i in range(RACK_SIZE):
+            rec = Rectangle(top_left_x + i * tile_side_length, top_left_y, tile_side_length, tile_side_length)
+            tile_positions.append(rec)
+
+        return tile_positions
+
+    @staticmethod
+    def draw_tile(tile: Tile, rec: Rectangle, side_length: float):
+        """
+
+        :param tile: Tile
+        :param rec: tile dimension parameters
+        :param side_length: side length of the tile TODO: is this needed?
+        :return:
+        """
+
+        # Set the color of the tile
+        color = BOARD_TILE_COLOR if tile.rack_position is None else RACK_TILE_COLOR
+
+        # Draws rectangle and the tile letter
+        draw_rectangle_rec(rec, color)
+        font_size = int(side_length / 1.5)
+        offset = (side_length - font_size) / 2
+
+        draw_text(tile.type, rec.x + offset, rec.y + offset, font_size, BLACK)
+        draw_text(str(tile.board_position), rec.x + 1, rec.y + 1, int(font_size / 3), BLACK)
+        draw_text(str(tile.rack_position), rec.x + 1, rec.y + side_length - int(font_size / 3) - 1, int(font_size / 3),
+                  BLACK)
+        draw_text(str(tile.value), rec.x + side_length - int(font_size / 3) - 1,
+                  rec.y + side_length - int(font_size / 3) - 1,
+                  int(font_size / 3),
+                  BLACK)
+
+
+class DebugOverlay:
+    # Frame rate and the time each instrumented phase took in the last frame
+    def __init__(self, posx: int, posy: int, font_size: int = 10) -> None:
+        self.pos_x = posx
+        self.pos_y = posy
+        self.font_size = font_size
+
+    def draw(self, profiler: Profiler):
+        """
+        Draws the overlay, slowest phase first
+
+        :param profiler: Profiler
+        :return:
+        """
+        draw_fps(self.pos_x, self.pos_y)
+
+        y = self.pos_y + 22
+        for name, seconds in sorted(profiler.last_frame.items(), key=lambda item: item[1], reverse=True):
+            calls = int(profiler.timers[name][0])
+            draw_text("{} {:.3f} ms ({} calls)".format(name, 1000 * seconds, calls), self.pos_x, y, self.font_size,
+                      DARKGRAY)
+            y += self.font_size + 2
+
+        for name, value in sorted(profiler.counters.items()):
+            draw_text("{} {}".format(name, value), self.pos_x, y, self.font_size, DARKGRAY)
+            y += self.font_size + 2
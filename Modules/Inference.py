@@ -0,0 +1,334 @@
+import random
+from typing import List, Union
+
+import numpy as np
+
+from Modules.Game import EXCHANGE, MOVE, Game
+from Modules.Leaves import LeaveTable
+from Modules.Lexicon import Lexicon
+from Modules.MoveGenerator import Move, MoveGenerator
+from Modules.Profiler import PROFILER
+from Modules.Scrabble import RACK_SIZE, RACK_SLOTS, Board, rack_slot, tile_code
+
+# Leaves kept to describe the distribution over an opponents rack
+PARTICLES = 2048
+
+# Weight of the leave value in the chance a player kept a leave, 0 treats every leave alike
+TEMPERATURE = 0.1
+
+# Weight of the equity a move gives up against the best move of a rack in the chance it was played
+MOVE_TEMPERATURE = 0.25
+
+# Likeliest racks whose moves are generated per observed move, a count rather than a time so seeded games repeat.
+# Each check is a full move generation, and past the first few they barely sharpen the inferred racks.
+RACK_CHECKS = 8
+
+# Natural log of n! for every tile count that can occur
+LOG_FACTORIALS = np.concatenate([[0.0], np.cumsum(np.log(np.arange(1, 128)))])
+
+
+def log_comb(n: np.ndarray, k: np.ndarray) -> np.ndarray:
+    """
+    Natural log of n choose k, element wise
+
+    :param n: np.ndarray of counts
+    :param k: np.ndarray of counts, 0 <= k <= n
+    :return: np.ndarray
+    """
+    return LOG_FACTORIALS[n] - LOG_FACTORIALS[k] - LOG_FACTORIALS[n - k]
+
+
+def fill_racks(rng: np.random.Generator, pools: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Draws tiles without replacement from many pools at once, one tile per pass for every row
+
+    :param rng: np.random.Generator
+    :param pools: (rows, RACK_SLOTS) tiles to draw from, changed in place
+    :param counts: (rows,) tiles to draw per row
+    :return: (rows, RACK_SLOTS) drawn tiles per rack slot
+    """
+    rows = np.arange(len(pools))
+    drawn = np.zeros_like(pools)
+    for step in range(int(counts.max(initial=0))):
+        active = rows[counts > step]
+        running = np.cumsum(pools[active], axis=1)
+        picks = (rng.random(len(active)) * running[:, -1]).astype(np.int64)
+        slots = (running <= picks[:, None]).sum(axis=1)
+        pools[active, slots] -= 1
+        drawn[active, slots] += 1
+    return drawn
+
+
+def unseen_tiles(game: Game, observer: int) -> np.ndarray:
+    """
+    Tiles a player cannot see, the bag and every other rack
+
+    :param game: Game
+    :param observer: index of the player
+    :return: (RACK_SLOTS,) int counts
+    """
+    unseen = np.frombuffer(game.tile_bag.counts, dtype=np.uint8).astype(np.int64)
+    for i, player in enumerate(game.players):
+        if i != observer:
+            unseen = unseen + np.frombuffer(player.rack, dtype=np.uint8)
+    return unseen
+
+
+def tile_counts(tiles: List[tuple]) -> np.ndarray:
+    """
+    Rack slot counts of placed tiles
+
+    :param tiles: list of (board position, letter, is blank)
+    :return: (RACK_SLOTS,) int counts
+    """
+    counts = np.zeros(RACK_SLOTS, dtype=np.int64)
+    for _, letter, blank in tiles:
+        counts[rack_slot(tile_code(letter, blank))] += 1
+    return counts
+
+
+def rack_counts(rack: str) -> np.ndarray:
+    """
+    Rack slot counts of the letters of a rack as written in Turn.rack
+
+    :param rack: letters, BLANK for blanks
+    :return: (RACK_SLOTS,) int counts
+    """
+    counts = np.zeros(RACK_SLOTS, dtype=np.int64)
+    for letter in rack:
+        counts[rack_slot(tile_code(letter))] += 1
+    return counts
+
+
+class RackInference:
+    # Weighted set of the leaves an opponent may be holding, updated from their turns by Bayes rule.
+    # A move shows tiles that were on the rack, and racks whose best move is close to the move played
+    # are more likely. Exchanges favour the leaves a player would rather keep. Racks are sampled in
+    # vectorized passes for simulations.
+    def __init__(self, seat: int, observer: int, lexicon: Union[Lexicon, None] = None,
+                 leaves: Union[LeaveTable, None] = None, particles: int = PARTICLES, temperature: float = TEMPERATURE,
+                 move_temperature: float = MOVE_TEMPERATURE, checks: int = RACK_CHECKS,
+                 seed: Union[int, None] = None) -> None:
+        """
+
+        :param seat: index of the opponent whose rack is inferred
+        :param observer: index of the player watching, whose tiles are known
+        :param lexicon: Lexicon to generate the moves the opponent could have played, None skips the move check
+        :param leaves: leave values the opponent is assumed to play by, None treats every leave alike
+        :param particles: leaves kept after each update
+        :param temperature: weight of the leave value in the chance a leave was kept
+        :param move_temperature: weight of the equity a move gives up in the chance it was played
+        :param checks: likeliest racks whose moves are generated per observed move
+        :param seed: seed of the sampling
+        """
+        self.seat = seat
+        self.observer = observer
+        self.generator = MoveGenerator(lexicon, leaves) if lexicon is not None else None
+        self.leave_table = leaves
+        self.particles = particles
+        self.temperature = temperature
+        self.move_temperature = move_temperature
+        self.checks = checks
+        self.rng = np.random.default_rng(random.Random(seed).getrandbits(64))
+
+        # Possible leaves per rack slot with their weights, and the turns already taken into account
+        self.leaves = np.zeros((1, RACK_SLOTS), dtype=np.int64)
+        self.weights = np.ones(1)
+        self.seen = 0
+        self.game_seed: Union[int, None] = None
+
+    def reset(self):
+        # Back to knowing nothing about the rack
+        self.leaves = np.zeros((1, RACK_SLOTS), dtype=np.int64)
+        self.weights = np.ones(1)
+
+    @PROFILER.timed("infer_racks")
+    def update(self, game: Game):
+        """
+        Takes in the turns played since the last update, starting over on a new game
+
+        :param game: Game as seen by the observer
+        :return:
+        """
+        if game.seed != self.game_seed or len(game.history) < self.seen:
+            self.reset()
+            self.seen = 0
+            self.game_seed = game.seed
+
+        turns = game.history[self.seen:]
+        self.seen = len(game.history)
+
+        # Each turn's pool is what the observer could not see before it, worked back from now: tiles played
+        # since were off the board, and across the observer's own turns its rack goes back to what it held,
+        # returning the tiles it drew afterwards to the pool. The board is taken back the same way.
+        pool = unseen_tiles(game, self.observer)
+        rack = np.frombuffer(game.players[self.observer].rack, dtype=np.uint8).astype(np.int64)
+        board = game.board.copy() if self.generator is not None else None
+        pools = []
+        boards = []
+        for turn in reversed(turns):
+            if turn.player == self.observer:
+                held = rack_counts(turn.rack)
+                pool = pool + rack - held
+                rack = held
+            if turn.action == MOVE:
+                pool = pool + tile_counts(turn.move.tiles)
+                if board is not None:
+                    board = board.copy()
+                    board.remove_tiles([pos for pos, _, _ in turn.move.tiles])
+            pools.append(pool)
+            boards.append(board)
+        pools.reverse()
+        boards.reverse()
+
+        for turn, turn_pool, board in zip(turns, pools, boards):
+            if turn.player == self.seat:
+                self.observe(turn_pool, len(turn.rack), turn.action, turn.move, len(turn.letters), board)
+
+    def observe(self, pool: np.ndarray, rack_size: int, action: str, move: Union[Move, None] = None,
+                exchanged: int = 0, board: Union[Board, None] = None):
+        """
+        Updates the leaves with one turn of the opponent. The rack they held is the previous leave
+        filled from the pool, a move leaves the rack without the played tiles and an exchange keeps a
+        part of it.
+
+        :param pool: (RACK_SLOTS,) tiles unseen by the observer before the turn, the opponents rack included
+        :param rack_size: tiles on the opponents rack before the turn
+        :param action: MOVE, EXCHANGE or PASS
+        :param move: the move played
+        :param exchanged: number of tiles exchanged
+        :param board: the board before the turn, None skips the move check
+        :return:
+        """
+        leaves = self._resample(pool, self.particles)
+        log_weights = np.zeros(len(leaves))
+        draw_counts = rack_size - leaves.sum(axis=1)
+        pools = pool - leaves
+
+        # Leaves too large for the rack or the pool came from a turn the model got wrong
+        possible = (draw_counts >= 0) & (pools.sum(axis=1) >= draw_counts)
+        if not possible.all():
+            if not possible.any():
+                self.reset()
+                return
+            leaves, pools, draw_counts, log_weights = \
+                leaves[possible], pools[possible], draw_counts[possible], log_weights[possible]
+
+        if action == MOVE:
+            played = tile_counts(move.tiles)
+
+            # Draws are made to hold the played tiles, weighted by how likely that is for an even draw
+            needed = np.maximum(played - leaves, 0)
+            needed_counts = needed.sum(axis=1)
+            possible = (needed <= pools).all(axis=1) & (needed_counts <= draw_counts)
+            leaves, pools, needed = leaves[possible], pools[possible], needed[possible]
+            draw_counts, needed_counts = draw_counts[possible], needed_counts[possible]
+            log_weights = log_weights[possible]
+            if not len(leaves):
+                self.reset()
+                return
+
+            rest = pools - needed
+            drawn = needed + fill_racks(self.rng, rest.copy(), draw_counts - needed_counts)
+            log_weights = log_weights + \
+                log_comb(pools, drawn).sum(axis=1) - log_comb(pools.sum(axis=1), draw_counts) - \
+                log_comb(rest, drawn - needed).sum(axis=1) + log_comb(rest.sum(axis=1), draw_counts - needed_counts)
+            kept = leaves + drawn - played
+            if self.generator is not None and board is not None:
+                log_weights = log_weights + self._move_likelihood(board, move, leaves + drawn, log_weights)
+        else:
+            kept = leaves + fill_racks(self.rng, pools, draw_counts)
+            if action == EXCHANGE:
+                kept = fill_racks(self.rng, kept, np.full(len(kept), rack_size - exchanged))
+                if self.leave_table is not None and self.temperature:
+                    log_weights = log_weights + self.temperature * self.leave_table.values_of(kept)
+
+        self._merge(kept, log_weights)
+
+    def _move_likelihood(self, board: Board, move: Move, racks: np.ndarray, log_weights: np.ndarray) -> np.ndarray:
+        """
+        Log chance of playing the move from each rack, from the equity it gives up against the best
+        move of the rack. Only the likeliest racks are checked, the others get the mean of the checked
+        ones.
+
+        :param board: the board before the move
+        :param move: the move played
+        :param racks: (particles, RACK_SLOTS) racks held before the move
+        :param log_weights: (particles,) log weights of the racks
+        :return: (particles,) log likelihoods
+        """
+        unique, inverse = np.unique(racks, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        totals = np.bincount(inverse, weights=np.exp(log_weights - log_weights.max()), minlength=len(unique))
+
+        played = tile_counts(move.tiles)
+        checked = np.full(len(unique), np.nan)
+        for index in np.argsort(-totals, kind="stable")[:self.checks]:
+            rack = bytearray(bytes(unique[index].astype(np.uint8)))
+            best = self.generator.best_move(board, rack)
+            equity = float(move.score)
+            if self.leave_table is not None:
+                equity += float(self.leave_table.values_of((unique[index] - played)[None, :])[0])
+            checked[index] = -self.move_temperature * max(0.0, best.equity - equity) if best is not None else 0.0
+
+        done = ~np.isnan(checked)
+        checked[~done] = checked[done].mean() if done.any() else 0.0
+        return checked[inverse]
+
+    def _resample(self, pool: np.ndarray, count: int) -> np.ndarray:
+        """
+        Draws leaves by weight from those still possible with the pool
+
+        :param pool: (RACK_SLOTS,) tiles the leaves can come from
+        :param count: leaves to draw
+        :return: (count, RACK_SLOTS) leaves
+        """
+        possible = (self.leaves <= pool).all(axis=1)
+        if not possible.any():
+            self.reset()
+            possible = np.ones(1, dtype=bool)
+
+        weights = self.weights * possible
+        picks = self.rng.choice(len(self.leaves), size=count, p=weights / weights.sum())
+        return self.leaves[picks]
+
+    def _merge(self, leaves: np.ndarray, log_weights: np.ndarray):
+        # Identical leaves are kept once with their weights added
+        unique, inverse = np.unique(leaves, axis=0, return_inverse=True)
+        weights = np.exp(log_weights - log_weights.max())
+        self.leaves = unique
+        self.weights = np.bincount(inverse.reshape(-1), weights=weights, minlength=len(unique))
+
+    def sample(self, count: int, unseen: np.ndarray, rack_size: int = RACK_SIZE) -> np.ndarray:
+        """
+        Racks the opponent may be holding now, each a weighted leave filled from the unseen tiles
+
+        :param count: racks to sample
+        :param unseen: (RACK_SLOTS,) tiles unseen by the observer
+        :param rack_size: tiles on the opponents rack
+        :return: (count, RACK_SLOTS) uint8 racks
+        """
+        leaves = self._resample(unseen, count)
+
+        # A leave is never larger than the rack, but the rack can be short once the bag runs out
+        leaves = np.where(leaves.sum(axis=1, keepdims=True) > rack_size, 0, leaves)
+        return (leaves + fill_racks(self.rng, unseen - leaves, rack_size - leaves.sum(axis=1))).astype(np.uint8)
+
+
+def deal_rack(game: Game, seat: int, rack: Union[bytes, bytearray, np.ndarray]):
+    """
+    Puts a players tiles back in the bag and gives them a rack taken from the bag instead
+
+    :param game: Game, changed in place
+    :param seat: index of the player
+    :param rack: (RACK_SLOTS,) tile counts, every tile must be in the bag once the players tiles are back
+    :return:
+    """
+    player = game.players[seat]
+    bag = game.tile_bag
+    rack = bytearray(bytes(np.asarray(rack, dtype=np.uint8)))
+    for slot, count in enumerate(rack):
+        bag.counts[slot] += player.rack[slot] - count
+    bag.size += player.rack_size() - sum(rack)
+    player.rack = rack
+    player.sync_tiles()
@@ -0,0 +1,172 @@
+import json
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+
+# Board layouts by name, each a list of rows of square symbols
+BOARDS_PATH = "./Resources/Boards.json"
+STANDARD_LAYOUT = "standard"
+
+# Square symbols as (letter multiplier, word multiplier)
+SQUARE_KINDS = {
+    ".": (1, 1),
+    "d": (2, 1),
+    "t": (3, 1),
+    "q": (4, 1),
+    "D": (1, 2),
+    "T": (1, 3),
+    "Q": (1, 4),
+}
+
+# Premium symbols in the order of their colours in Render.square_colors
+PREMIUM_ORDER = "TDtdQq"
+
+# Neighbour of a square on the edge of the board
+NO_SQUARE = -1
+
+# Layouts read from each file, by path then name
+_files: Dict[str, Dict[str, "BoardLayout"]] = {}
+
+# Compiled layouts by their squares, so boards and unpickled copies share one set of tables
+_compiled: Dict[Tuple, "BoardLayout"] = {}
+
+
+class BoardLayout:
+    # Premium squares and geometry of a board. A layout is compiled once into flat tables indexed by
+    # board position, neighbour tables that stop at the edges, the squares of every row and column and
+    # the multipliers, shared by every board, scorer and view using it.
+    def __init__(self, name: str, rows: List[str], start: Union[int, None] = None) -> None:
+        """
+
+        :param name: str
+        :param rows: list[str] of square symbols from SQUARE_KINDS, one string per row
+        :param start: square the first word must cover, the centre square by default
+        """
+        side_squares = len(rows)
+        if not side_squares or any(len(row) != side_squares for row in rows):
+            raise ValueError("Board layout {} must be square".format(name))
+        for row in rows:
+            for symbol in row:
+                if symbol not in SQUARE_KINDS:
+                    raise ValueError("Board layout {} has an unknown square {}".format(name, symbol))
+
+        squares = side_squares * side_squares
+        start = (squares - 1) // 2 if start is None else start
+        if not 0 <= start < squares:
+            raise ValueError("Board layout {} starts off the board at {}".format(name, start))
+
+        self.name = name
+        self.rows = list(rows)
+        self.side_squares = side_squares
+        self.squares = squares
+        self.start = start
+
+        symbols = "".join(rows)
+        self.letter_multipliers = bytearray(SQUARE_KINDS[symbol][0] for symbol in symbols)
+        self.word_multipliers = bytearray(SQUARE_KINDS[symbol][1] for symbol in symbols)
+
+        # Premium squares as (position, index into PREMIUM_ORDER) for drawing
+        self.premiums: List[Tuple[int, int]] = [(pos, PREMIUM_ORDER.index(symbol))
+                                                for pos, symbol in enumerate(symbols) if symbol != "."]
+
+        # Row and column of each square, and the squares of each row and column in order
+        n = side_squares
+        self.row_of = [pos // n for pos in range(squares)]
+        self.column_of = [pos % n for pos in range(squares)]
+        self.row_squares = [list(range(row * n, row * n + n)) for row in range(n)]
+        self.column_squares = [list(range(col, squares, n)) for col in range(n)]
+
+        # Next square in each direction, NO_SQUARE past an edge
+        self.left = [pos - 1 if pos % n else NO_SQUARE for pos in range(squares)]
+        self.right = [pos + 1 if pos % n < n - 1 else NO_SQUARE for pos in range(squares)]
+        self.up = [pos - n if pos >= n else NO_SQUARE for pos in range(squares)]
+        self.down = [pos + n if pos < squares - n else NO_SQUARE for pos in range(squares)]
+        self.neighbours = [[square for square in (self.left[pos], self.right[pos], self.up[pos], self.down[pos])
+                            if square != NO_SQUARE] for pos in range(squares)]
+
+        # Position of each square along its row and its column, and the multipliers with one extra
+        # neutral square for padding, as arrays for the batched scorer
+        self.line_index = np.array([self.column_of, self.row_of], dtype=np.int64)
+        self.letter_multiplier_array = np.array(list(self.letter_multipliers) + [1], dtype=np.int64)
+        self.word_multiplier_array = np.array(list(self.word_multipliers) + [1], dtype=np.int64)
+
+    @property
+    def key(self) -> Tuple:
+        return self.name, tuple(self.rows), self.start
+
+    def __reduce__(self):
+        # Pickled as its squares, the tables are rebuilt once per process
+        return compile_layout, self.key
+
+    def __repr__(self) -> str:
+        return "BoardLayout({}, {}x{})".format(self.name, self.side_squares, self.side_squares)
+
+
+def compile_layout(name: str, rows: Tuple[str, ...], start: Union[int, None] = None) -> BoardLayout:
+    """
+    Layout for a set of rows, compiled on first use and shared afterwards
+
+    :param name: str
+    :param rows: tuple of row strings
+    :param start: square the first word must cover, the centre square by default
+    :return: BoardLayout
+    """
+    if start is None:
+        start = (len(rows) * len(rows) - 1) // 2
+    key = (name, tuple(rows), start)
+    layout = _compiled.get(key)
+    if layout is None:
+        layout = BoardLayout(name, list(rows), start)
+        _compiled[key] = layout
+    return layout
+
+
+def load_layouts(path: str = BOARDS_PATH) -> Dict[str, BoardLayout]:
+    """
+    Every layout in a boards file, read and compiled once per path. The file maps each name to an
+    object with its "rows" and optionally a "start" square as [row, column].
+
+    :param path: JSON file
+    :return: dict of name to BoardLayout
+    """
+    layouts = _files.get(path)
+    if layouts is None:
+        with open(path) as file:
+            data = json.load(file)
+
+        layouts = {}
+        for name, spec in data.items():
+            rows = spec["rows"]
+            start = spec.get("start")
+            layouts[name] = compile_layout(name, tuple(rows), None if start is None else
+                                           start[0] * len(rows) + start[1])
+        _files[path] = layouts
+    return layouts
+
+
+def get_layout(name: str = STANDARD_LAYOUT, path: str = BOARDS_PATH) -> BoardLayout:
+    """
+    Layout by name from a boards file
+
+    :param name: str
+    :param path: JSON file
+    :return: BoardLayout
+    """
+    layouts = load_layouts(path)
+    if name not in layouts:
+        raise ValueError("Unknown board layout {}, {} has {}".format(name, path, ", ".join(sorted(layouts))))
+    return layouts[name]
+
+
+def layout_of_size(side_squares: int, path: str = BOARDS_PATH) -> BoardLayout:
+    """
+    First layout in a boards file with a side length, for records that only keep the board size
+
+    :param side_squares: int
+    :param path: JSON file
+    :return: BoardLayout
+    """
+    for layout in load_layouts(path).values():
+        if layout.side_squares == side_squares:
+            return layout
+    raise ValueError("{} has no {}x{} board layout".format(path, side_squares, side_squares))
@@ -0,0 +1,244 @@
+import math
+import mmap
+import os
+import struct
+from itertools import combinations_with_replacement
+from typing import Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from Modules.Scrabble import BLANK, BLANK_INDEX, RACK_SLOTS
+
+# Binary file layout: header followed by one native 32 bit float per leave, indexed by leave key
+LEAVES_MAGIC = b"LEAV"
+LEAVES_VERSION = 1
+LEAVES_HEADER = struct.Struct("=4sIII")  # magic, version, longest leave, entry count
+
+# Leaves are what stays on a full rack after playing at least one tile
+MAX_LEAVE = 6
+
+# Leaves of each size take a contiguous block of keys, ranked inside it with the combinatorial number
+# system. A sorted leave a0 <= a1 <= ... maps to the strictly increasing a0, a1 + 1, a2 + 2, ...
+BINOMIAL = [[math.comb(n, k) for k in range(MAX_LEAVE + 1)] for n in range(RACK_SLOTS + MAX_LEAVE)]
+SIZE_OFFSETS = [sum(math.comb(RACK_SLOTS + j - 1, j) for j in range(size)) for size in range(MAX_LEAVE + 2)]
+TABLE_SIZE = SIZE_OFFSETS[MAX_LEAVE + 1]
+
+# Regression features: a weight per tile, a weight per repeated tile and a weight per leave size
+FEATURE_COUNT = 2 * RACK_SLOTS + MAX_LEAVE + 1
+
+
+def leave_key(slots: Sequence[int]) -> int:
+    """
+    Perfect hash of a leave, every multiset of up to MAX_LEAVE tiles has its own key below TABLE_SIZE
+
+    :param slots: rack slots of the tiles in ascending order, blanks at BLANK_INDEX
+    :return: int
+    """
+    key = SIZE_OFFSETS[len(slots)]
+    for i, slot in enumerate(slots):
+        key += BINOMIAL[slot + i][i + 1]
+    return key
+
+
+def leave_keys(racks: np.ndarray) -> np.ndarray:
+    """
+    Perfect hash of many leaves at once
+
+    :param racks: (leaves, RACK_SLOTS) tile counts per rack slot, at most MAX_LEAVE tiles each
+    :return: np.ndarray of int keys below TABLE_SIZE
+    """
+    racks = np.asarray(racks, dtype=np.int64)
+    sizes = racks.sum(axis=1)
+    if (sizes > MAX_LEAVE).any():
+        raise ValueError("A leave holds at most {} tiles".format(MAX_LEAVE))
+
+    # The i-th smallest tile of a leave is in the first slot whose running count passes i
+    ranks = np.arange(MAX_LEAVE)
+    running = np.cumsum(racks, axis=1)
+    slots = (running[:, :, None] <= ranks[None, None, :]).sum(axis=1)
+
+    binomial = np.array(BINOMIAL, dtype=np.int64)
+    terms = binomial[np.minimum(slots + ranks, len(BINOMIAL) - 1), ranks + 1]
+    return np.array(SIZE_OFFSETS)[sizes] + np.where(ranks < sizes[:, None], terms, 0).sum(axis=1)
+
+
+def leave_slots(letters: str) -> List[int]:
+    """
+    Sorted rack slots of a leave written as letters, '?' for blanks
+
+    :param letters: str
+    :return: list[int]
+    """
+    return sorted(BLANK_INDEX if letter == BLANK else ord(letter) - 97 for letter in letters.lower())
+
+
+def leave_features(slots: Sequence[int]) -> List[int]:
+    """
+    Regression features of a sorted leave
+
+    :param slots: rack slots in ascending order
+    :return: list[int] of length FEATURE_COUNT
+    """
+    features = [0] * FEATURE_COUNT
+    for i, slot in enumerate(slots):
+        features[slot] += 1
+        if i and slots[i - 1] == slot:
+            features[RACK_SLOTS + slot] += 1
+    features[2 * RACK_SLOTS + len(slots)] = 1
+    return features
+
+
+def fit_weights(samples: Iterable[Tuple[Sequence[int], float]], ridge: float = 1.0) -> np.ndarray:
+    """
+    Ridge regression of a value per leave feature
+
+    :param samples: (sorted leave slots, target value) pairs, e.g. the points scored on the next turn
+    :param ridge: regularisation, keeps rarely seen tiles near zero
+    :return: np.ndarray of FEATURE_COUNT weights
+    """
+    features = []
+    targets = []
+    for slots, target in samples:
+        features.append(leave_features(slots))
+        targets.append(target)
+
+    x = np.array(features, dtype=np.float64)
+    y = np.array(targets, dtype=np.float64)
+
+    # Values are relative to the average turn so an unremarkable leave is worth about nothing
+    y -= y.mean()
+    return np.linalg.solve(x.T @ x + ridge * np.eye(FEATURE_COUNT), x.T @ y)
+
+
+class LeaveTable:
+    # Value of every leave stored in a flat float array indexed by leave key
+    def __init__(self, values: Sequence[float], mapping: Union[mmap.mmap, None] = None,
+                 path: Union[str, None] = None) -> None:
+        """
+
+        :param values: TABLE_SIZE floats, a numpy array or a memoryview over a memory mapped file
+        :param mapping: memory map backing the values, kept open for the lifetime of the table
+        :param path: table file the mapping was opened from
+        """
+        if len(values) != TABLE_SIZE:
+            raise ValueError("A leave table needs {} values, got {}".format(TABLE_SIZE, len(values)))
+
+        self.values = values
+        self.mapping = mapping
+        self.path = path
+
+    @classmethod
+    def from_weights(cls, weights: np.ndarray) -> "LeaveTable":
+        """
+        Evaluates regression weights for every possible leave
+
+        :param weights: np.ndarray of FEATURE_COUNT weights
+        :return: LeaveTable
+        """
+        tile_weights = weights[:RACK_SLOTS]
+        repeat_weights = weights[RACK_SLOTS:2 * RACK_SLOTS]
+        size_weights = weights[2 * RACK_SLOTS:]
+        binomial = np.array(BINOMIAL, dtype=np.int64)
+
+        values = np.zeros(TABLE_SIZE, dtype=np.float32)
+        for size in range(MAX_LEAVE + 1):
+            leaves = np.array(list(combinations_with_replacement(range(RACK_SLOTS), size)), dtype=np.int64)
+            leaves = leaves.reshape(SIZE_OFFSETS[size + 1] - SIZE_OFFSETS[size], size)
+            ranks = np.arange(size)
+
+            keys = SIZE_OFFSETS[size] + binomial[leaves + ranks, ranks + 1].sum(axis=1)
+            repeats = leaves[:, 1:] == leaves[:, :-1]
+            values[keys] = (size_weights[size] + tile_weights[leaves].sum(axis=1) +
+                            (repeat_weights[leaves[:, 1:]] * repeats).sum(axis=1))
+
+        return cls(values)
+
+    @classmethod
+    def from_text(cls, path: str) -> "LeaveTable":
+        """
+        Reads leave values from a text file with one leave and its value per line, such as "AEST 12.5"
+        or "?S,20.1". Leaves missing from the file are worth zero.
+
+        :param path: str
+        :return: LeaveTable
+        """
+        values = np.zeros(TABLE_SIZE, dtype=np.float32)
+        with open(path, "r") as leave_file:
+            for line_number, line in enumerate(leave_file, 1):
+                fields = line.replace(",", " ").split()
+                if not fields:
+                    continue
+                if len(fields) != 2 or len(fields[0]) > MAX_LEAVE:
+                    raise ValueError("{}:{}: expected a leave and a value".format(path, line_number))
+                values[leave_key(leave_slots(fields[0]))] = float(fields[1])
+
+        return cls(values)
+
+    @classmethod
+    def load(cls, path: str) -> "LeaveTable":
+        """
+        Memory maps a table file, the mapping is read only and shared between processes
+
+        :param path: str
+        :return: LeaveTable
+        """
+        with open(path, "rb") as table_file:
+            mapping = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, max_leave, count = LEAVES_HEADER.unpack_from(mapping)
+        if magic != LEAVES_MAGIC or version != LEAVES_VERSION or max_leave != MAX_LEAVE:
+            mapping.close()
+            raise ValueError("{} is not a version {} leave table".format(path, LEAVES_VERSION))
+
+        values = memoryview(mapping)[LEAVES_HEADER.size:LEAVES_HEADER.size + 4 * count].cast("f")
+        return cls(values, mapping, path)
+
+    def save(self, path: str):
+        """
+        Writes the table to a binary file, replacing any existing file atomically
+
+        :param path: str
+        :return:
+        """
+        temp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(temp_path, "wb") as table_file:
+            table_file.write(LEAVES_HEADER.pack(LEAVES_MAGIC, LEAVES_VERSION, MAX_LEAVE, TABLE_SIZE))
+            table_file.write(np.asarray(self.values, dtype=np.float32).tobytes())
+        os.replace(temp_path, path)
+
+    def __reduce__(self):
+        # A mapped table is sent to other processes as its file path and mapped again on arrival
+        if self.mapping is not None:
+            return self.load, (self.path,)
+        return self.__class__, (np.asarray(self.values),)
+
+    def value(self, slots: Sequence[int]) -> float:
+        """
+        Value of a leave
+
+        :param slots: rack slots of the leave in ascending order
+        :return: float
+        """
+        return self.values[leave_key(slots)]
+
+    def values_of(self, racks: np.ndarray) -> np.ndarray:
+        """
+        Values of many leaves at once
+
+        :param racks: (leaves, RACK_SLOTS) tile counts per rack slot
+        :return: np.ndarray of float values
+        """
+        return np.asarray(self.values)[leave_keys(racks)]
+
+    def leave_value(self, rack_slots: List[int], tiles: List[Tuple[int, str, bool]]) -> float:
+        """
+        Value of what stays on the rack after playing tiles from it
+
+        :param rack_slots: rack slots of every tile on the rack in ascending order
+        :param tiles: played tiles as (board position, letter, is blank)
+        :return: float
+        """
+        leave = rack_slots[:]
+        for _, letter, blank in tiles:
+            leave.remove(BLANK_INDEX if blank else ord(letter) - 97)
+        return self.values[leave_key(leave)]
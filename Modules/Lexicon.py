@@ -0,0 +1,102 @@
+from typing import Dict, Iterable, List, Union
+
+from Modules.Dawg import Dawg, NO_NODE
+from Modules.Profiler import PROFILER
+
+
+class Lexicon:
+    # Scrabble Lexicon Class holding every valid word in a compiled word graph
+    def __init__(self, dawg: Dawg) -> None:
+        """
+
+        :param dawg: Dawg holding the lower case words
+        """
+        self.dawg = dawg
+
+        # Words bucketed by their length, filled on first request
+        self.length_buckets: Dict[int, List[str]] = {}
+
+    @classmethod
+    def from_words(cls, words: Iterable[str]) -> "Lexicon":
+        """
+        Builds an in memory lexicon from a word iterable
+
+        :param words: iterable of str
+        :return: Lexicon
+        """
+        return cls(Dawg.build(word.lower() for word in words if word))
+
+    @classmethod
+    def from_file(cls, path: str, dawg_path: Union[str, None] = None) -> "Lexicon":
+        """
+        Loads a lexicon from a word file with one word per line, the word file is compiled once
+        into a memory mapped graph next to it and only recompiled when the word file changes
+
+        :param path: str
+        :param dawg_path: optional location of the compiled graph
+        :return: Lexicon
+        """
+        return cls(Dawg.from_word_file(path, dawg_path))
+
+    def __reduce__(self):
+        # The length buckets are a cache and are rebuilt on demand
+        return self.__class__, (self.dawg,)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.dawg
+
+    def __len__(self) -> int:
+        return len(self.dawg)
+
+    def is_word(self, word: str) -> bool:
+        """
+        Checks if a word is in the lexicon
+
+        :param word: str
+        :return: bool
+        """
+        return word.lower() in self.dawg
+
+    def has_prefix(self, prefix: str) -> bool:
+        """
+        Checks if any word in the lexicon starts with the prefix
+
+        :param prefix: str
+        :return: bool
+        """
+        return self.dawg.walk(prefix.lower()) != NO_NODE
+
+    def words_with_prefix(self, prefix: str) -> List[str]:
+        """
+        Returns every word starting with the prefix in alphabetical order
+
+        :param prefix: str
+        :return: list[str]
+        """
+        prefix = prefix.lower()
+        node = self.dawg.walk(prefix)
+        if node == NO_NODE:
+            return []
+        return list(self.dawg.words(node, prefix))
+
+    def words_of_length(self, length: int) -> List[str]:
+        """
+        Returns every word with the given length
+
+        :param length: int
+        :return: list[str]
+        """
+        if length not in self.length_buckets:
+            self.length_buckets[length] = [word for word in self.dawg.words(max_length=length)
+                                           if len(word) == length]
+        return self.length_buckets[length]
+
+    @PROFILER.timed("validate_words")
+    def are_words(self, words: Iterable[str]) -> bool:
+        """
+        Checks if every word is in the lexicon
+
+        :param words: iterable of str
+        :return: bool
+        """
+        return all(word in self.dawg for word in words)
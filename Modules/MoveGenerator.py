@@ -0,0 +1,278 @@
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
+
+from Modules.Dawg import LETTER_MASK, NO_NODE, ROOT, TERMINAL_FLAG
+from Modules.Leaves import LeaveTable
+from Modules.Lexicon import Lexicon
+from Modules.Profiler import PROFILER
+from Modules.Scoring import Scorer
+from Modules.Scrabble import ALPHABET, BLANK, BLANK_INDEX, RACK_SLOTS, Board, Tile
+
+ALL_LETTERS = LETTER_MASK
+
+
+def letter_bits(rack: List[int]) -> int:
+    """
+    Bit mask of the letters with a tile on the rack, blanks excluded
+
+    :param rack: tile counts per letter index
+    :return: int
+    """
+    bits = 0
+    for letter in range(26):
+        if rack[letter]:
+            bits |= 1 << letter
+    return bits
+
+
+class Move:
+    # A complete placement of rack tiles forming a word
+    def __init__(self, tiles: List[Tuple[int, str, bool]], word: str, score: int, across: bool) -> None:
+        """
+
+        :param tiles: placed tiles as (board position, letter, is blank)
+        :param word: the main word formed by the placement
+        :param score: score of the placement including cross words
+        :param across: True if the main word runs along a row
+        """
+        self.tiles = tiles
+        self.word = word
+        self.score = score
+        self.across = across
+
+        # Score plus the value of the tiles left on the rack, the score alone without a leave table
+        self.equity = float(score)
+
+    def __repr__(self) -> str:
+        return "Move({}, {}, {}, {})".format(self.word, self.tiles[0][0], "across" if self.across else "down",
+                                             self.score)
+
+
+class MoveGenerator:
+    # Generates every legal placement for a rack using anchor squares and cross checks (Appel-Jacobson)
+    def __init__(self, lexicon: Lexicon, leaves: Union[LeaveTable, None] = None) -> None:
+        """
+
+        :param lexicon: Lexicon
+        :param leaves: optional leave values used to rank moves by equity
+        """
+        self.lexicon = lexicon
+        self.nodes = lexicon.dawg.nodes
+        self.leaves = leaves
+
+    @PROFILER.timed("generate_moves")
+    def generate(self, board: Board, rack: Union[bytearray, List[Tile]]) -> List[Move]:
+        """
+        Enumerates every legal move for the rack on the board
+
+        :param board: Board
+        :param rack: rack count vector such as Player.rack, or a list of tiles such as Player.tiles
+        :return: list[Move]
+        """
+        letters = [letter - 97 if letter else -1 for letter in board.letters]
+
+        if isinstance(rack, (bytes, bytearray)):
+            rack_counts = list(rack)
+        else:
+            rack_counts = [0] * RACK_SLOTS
+            for tile in rack:
+                rack_counts[BLANK_INDEX if tile.type == BLANK else ord(tile.type) - 97] += 1
+
+        # Anchors and cross checks are kept up to date by the board as tiles are placed
+        if board.lexicon is not self.lexicon:
+            board.set_lexicon(self.lexicon)
+
+        left_parts = self.left_parts(rack_counts)
+
+        moves: List[Move] = []
+        for across in (True, False):
+            cross_masks = board.across_checks if across else board.down_checks
+            cross_scores = board.across_cross_scores if across else board.down_cross_scores
+            # Squares of each line in order come from the layout, so lines never run over an edge
+            for squares in board.layout.row_squares if across else board.layout.column_squares:
+                self._generate_line(squares, letters, board.anchors, cross_masks, cross_scores, rack_counts,
+                                    left_parts, across, moves)
+
+        # Score every move in one batch
+        scores = Scorer(board).score_moves(moves)
+        for move, score in zip(moves, scores.tolist()):
+            move.score = score
+            move.equity = float(score)
+
+        # Leave of every move as a count vector, valued in one batch
+        if self.leaves is not None and moves:
+            rows = []
+            slots = []
+            for i, move in enumerate(moves):
+                for _, letter, blank in move.tiles:
+                    rows.append(i)
+                    slots.append(BLANK_INDEX if blank else ord(letter) - 97)
+            leaves = np.tile(np.array(rack_counts, dtype=np.int64), (len(moves), 1))
+            np.subtract.at(leaves, (rows, slots), 1)
+
+            for move, value in zip(moves, self.leaves.values_of(leaves).tolist()):
+                move.equity += value
+
+        return moves
+
+    def best_move(self, board: Board, rack: Union[bytearray, List[Tile]]) -> Move:
+        """
+        Highest equity move for the rack, the highest scoring one without a leave table, None if
+        there is no legal move
+
+        :param board: Board
+        :param rack: rack count vector or list of tiles
+        :return: Move
+        """
+        moves = self.generate(board, rack)
+        return max(moves, key=lambda move: move.equity) if moves else None
+
+    def left_parts(self, rack: List[int]) -> List[Tuple[int, Tuple[Tuple[int, bool], ...]]]:
+        """
+        Every prefix in the lexicon that can be spelled from the rack with at least one tile to spare,
+        as (node, ((letter, is blank), ...)) ordered by length. These are shared by all anchors.
+
+        :param rack: tile counts per letter index, blanks at BLANK_INDEX
+        :return: list[(int, tuple)]
+        """
+        nodes = self.nodes
+        parts = [(ROOT, ())]
+        frontier = [(ROOT, ())]
+        for _ in range(sum(rack) - 1):
+            next_frontier = []
+            for node, left in frontier:
+                used = [0] * 27
+                for letter, blank in left:
+                    used[BLANK_INDEX if blank else letter] += 1
+
+                header = nodes[node]
+                mask = header & LETTER_MASK
+                while mask:
+                    low_bit = mask & -mask
+                    letter = low_bit.bit_length() - 1
+                    mask ^= low_bit
+
+                    child = nodes[node + 1 + (header & (low_bit - 1)).bit_count()]
+                    if rack[letter] > used[letter]:
+                        next_frontier.append((child, left + ((letter, False),)))
+                    if rack[BLANK_INDEX] > used[BLANK_INDEX]:
+                        next_frontier.append((child, left + ((letter, True),)))
+
+            parts.extend(next_frontier)
+            frontier = next_frontier
+
+        return parts
+
+    def _generate_line(self, squares: List[int], letters: List[int], anchors: Sequence[int], cross_masks: List[int],
+                       cross_scores: List[int], rack: List[int], left_parts: List[Tuple[int, Tuple]], across: bool,
+                       moves: List[Move]):
+        """
+        Generates the moves whose main word lies in one row or column
+
+        :return:
+        """
+        nodes = self.nodes
+        n = len(squares)
+        line_letters = [letters[square] for square in squares]
+        line_masks = [cross_masks[square] for square in squares]
+
+        def record(start: int, end: int, left: Tuple[Tuple[int, bool], ...], placed: List[Tuple[int, int, bool]]):
+            tile_count = len(left) + len(placed)
+
+            # Single tile moves with a word in both directions are produced by the across pass
+            if not across and tile_count == 1 and cross_scores[squares[placed[0][0]]] >= 0:
+                return
+
+            placed_at = {start + i: (letter, blank) for i, (letter, blank) in enumerate(left)}
+            for index, letter, blank in placed:
+                placed_at[index] = (letter, blank)
+
+            word = "".join(ALPHABET[placed_at[index][0] if index in placed_at else line_letters[index]]
+                           for index in range(start, end))
+            tiles = [(squares[index], ALPHABET[letter], blank) for index, (letter, blank) in sorted(placed_at.items())]
+            moves.append(Move(tiles, word, 0, across))
+
+        def extend_right(node: int, index: int, start: int, anchor: int, left: Tuple[Tuple[int, bool], ...],
+                         placed: List[Tuple[int, int, bool]], rack_bits: int):
+            header = nodes[node]
+
+            # Existing tiles must be followed
+            if index < n and line_letters[index] >= 0:
+                letter = line_letters[index]
+                if (header >> letter) & 1:
+                    child = nodes[node + 1 + (header & ((1 << letter) - 1)).bit_count()]
+                    extend_right(child, index + 1, start, anchor, left, placed, rack_bits)
+                return
+
+            # The word may end here once it covers the anchor
+            if header & TERMINAL_FLAG and index > anchor and index - start >= 2:
+                record(start, index, left, placed)
+
+            if index >= n:
+                return
+
+            # Only letters that continue a word, fit the cross word and are on the rack
+            allowed = header & line_masks[index] & (ALL_LETTERS if rack[BLANK_INDEX] else rack_bits)
+            while allowed:
+                low_bit = allowed & -allowed
+                letter = low_bit.bit_length() - 1
+                allowed ^= low_bit
+
+                child = nodes[node + 1 + (header & (low_bit - 1)).bit_count()]
+                if rack[letter]:
+                    rack[letter] -= 1
+                    placed.append((index, letter, False))
+                    extend_right(child, index + 1, start, anchor, left, placed,
+                                 rack_bits if rack[letter] else rack_bits ^ low_bit)
+                    placed.pop()
+                    rack[letter] += 1
+                if rack[BLANK_INDEX]:
+                    rack[BLANK_INDEX] -= 1
+                    placed.append((index, letter, True))
+                    extend_right(child, index + 1, start, anchor, left, placed, rack_bits)
+                    placed.pop()
+                    rack[BLANK_INDEX] += 1
+
+        for anchor in range(n):
+            if not anchors[squares[anchor]]:
+                continue
+
+            if anchor > 0 and line_letters[anchor - 1] >= 0:
+                # The left part is already on the board
+                start = anchor - 1
+                while start > 0 and line_letters[start - 1] >= 0:
+                    start -= 1
+
+                node = ROOT
+                for index in range(start, anchor):
+                    letter = line_letters[index]
+                    header = nodes[node]
+                    if not (header >> letter) & 1:
+                        node = NO_NODE
+                        break
+                    node = nodes[node + 1 + (header & ((1 << letter) - 1)).bit_count()]
+
+                if node != NO_NODE:
+                    extend_right(node, anchor, start, anchor, (), [], letter_bits(rack))
+            else:
+                # Left parts run over empty squares that are not anchors themselves
+                limit = 0
+                index = anchor - 1
+                while index >= 0 and line_letters[index] < 0 and not anchors[squares[index]]:
+                    limit += 1
+                    index -= 1
+
+                anchor_mask = line_masks[anchor]
+                for node, left in left_parts:
+                    if len(left) > limit:
+                        break
+                    # Skip left parts that cannot continue onto the anchor
+                    if not nodes[node] & anchor_mask:
+                        continue
+
+                    for letter, blank in left:
+                        rack[BLANK_INDEX if blank else letter] -= 1
+                    extend_right(node, anchor, anchor - len(left), anchor, left, [], letter_bits(rack))
+                    for letter, blank in left:
+                        rack[BLANK_INDEX if blank else letter] += 1
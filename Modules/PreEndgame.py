@@ -0,0 +1,364 @@
+import math
+import os
+import pickle
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Tuple, Union
+
+from Modules.Endgame import EndgameSolver
+from Modules.Game import Game
+from Modules.Lexicon import Lexicon
+from Modules.MoveGenerator import Move, MoveGenerator
+from Modules.Scrabble import RACK_SLOTS
+from Modules.SharedState import SharedGameState, load_state, share_state
+
+# Most tiles in the bag for a position to count as a pre-endgame
+MAX_BAG_TILES = 6
+
+# Outcomes a worker evaluates per task before reporting back
+OUTCOME_BATCH = 8
+
+# Endgame values kept per process, keyed by board and racks
+CACHE_SIZE = 1 << 16
+
+# Seed of the draws of outcomes where the bag is not emptied by the candidate, fixed so evaluations repeat
+PLAYOUT_SEED = 0x9E37
+
+# An outcome as (candidate index, tiles the player draws, tiles the opponent holds, probability), the
+# tiles as counts per rack slot
+Outcome = Tuple[int, Tuple[int, ...], Tuple[int, ...], float]
+
+# Endgame solvers and values of solved positions of a worker process
+_worker_solvers: Dict[Tuple[int, int], EndgameSolver] = {}
+_worker_cache: Dict[tuple, int] = {}
+
+
+def draws(counts: List[int], size: int) -> Iterator[Tuple[Tuple[int, ...], int]]:
+    """
+    Every distinct set of tiles of a size that can be drawn from counts, with the number of ways
+    to draw it
+
+    :param counts: tiles per rack slot
+    :param size: tiles drawn
+    :return: iterator of (drawn tiles per rack slot, ways)
+    """
+    slots = [slot for slot, count in enumerate(counts) if count]
+    drawn = [0] * len(counts)
+
+    def extend(index: int, left: int, ways: int):
+        if not left:
+            yield tuple(drawn), ways
+            return
+        if index == len(slots):
+            return
+        slot = slots[index]
+        for take in range(min(left, counts[slot]), -1, -1):
+            drawn[slot] = take
+            yield from extend(index + 1, left - take, ways * math.comb(counts[slot], take))
+        drawn[slot] = 0
+
+    yield from extend(0, size, 1)
+
+
+def outcomes(unseen: List[int], opponent_size: int, bag_size: int, candidate: int, move: Move) -> List[Outcome]:
+    """
+    Draws the player can make after a candidate and the racks the opponent can hold, most likely first.
+    From the players view the bag is a random part of the unseen tiles, so the draw is a random set
+    of them and the opponent holds a random set of the rest. When the draw empties the bag the
+    opponent holds all of the rest.
+
+    :param unseen: tiles in the bag and on the opponents rack per rack slot
+    :param opponent_size: tiles on the opponents rack
+    :param bag_size: tiles in the bag
+    :param candidate: index of the candidate
+    :param move: the candidate
+    :return: list[Outcome]
+    """
+    drawn_size = min(len(move.tiles), bag_size)
+    unseen_size = sum(unseen)
+    found = []
+
+    for drawn, ways in draws(unseen, drawn_size):
+        probability = ways / math.comb(unseen_size, drawn_size)
+        rest = [count - taken for count, taken in zip(unseen, drawn)]
+        if drawn_size == bag_size:
+            found.append((candidate, drawn, tuple(rest), probability))
+            continue
+
+        rest_size = unseen_size - drawn_size
+        for held, held_ways in draws(rest, opponent_size):
+            found.append((candidate, drawn, held, probability * held_ways / math.comb(rest_size, opponent_size)))
+
+    found.sort(key=lambda outcome: outcome[3], reverse=True)
+    return found
+
+
+def _solver(width: Union[int, None], table_bits: int, lexicon: Lexicon) -> EndgameSolver:
+    solver = _worker_solvers.get((width, table_bits))
+    if solver is None:
+        solver = _worker_solvers[(width, table_bits)] = EndgameSolver(lexicon, width, table_bits)
+    return solver
+
+
+def endgame_value(game: Game, width: Union[int, None], table_bits: int, time_limit: float, max_depth: int) -> int:
+    """
+    Spread change for the player to move in a position with an empty bag, searched once per process
+    for each board, pair of racks and search setting
+
+    :param game: Game with an empty bag
+    :param width: moves searched per position
+    :param table_bits: transposition table size of the solver
+    :param time_limit: seconds of search
+    :param max_depth: deepest search in turns
+    :return: int
+    """
+    board = game.board
+    key = (bytes(board.letters), bytes(board.blanks), bytes(game.players[0].rack), bytes(game.players[1].rack),
+           game.turn, game.scoreless_turns, width, max_depth)
+    value = _worker_cache.get(key)
+    if value is None:
+        value = _solver(width, table_bits, game.lexicon).solve(game, time_limit, max_depth).value
+        if len(_worker_cache) >= CACHE_SIZE:
+            _worker_cache.clear()
+        _worker_cache[key] = value
+    return value
+
+
+def evaluate_outcomes(state: Union[bytes, str], batch: List[Outcome], deadline: Union[float, None],
+                      width: Union[int, None], table_bits: int, time_limit: float,
+                      max_depth: int) -> List[Tuple[int, float, int]]:
+    """
+    Plays the candidate of each outcome with the outcomes tiles and works out the final spread
+
+    Once the bag is empty the rest of the game is searched by the endgame solver. When the candidate
+    leaves tiles in the bag both players play their highest scoring moves until it is empty.
+
+    :param state: (Game, list[Move]) with the game at the players turn, pickled or in a shared block named by the
+        string
+    :param batch: list[Outcome]
+    :param deadline: wall clock time to stop by, at least one outcome is always evaluated
+    :param width: moves searched per position in the endgame
+    :param table_bits: transposition table size of the endgame solver
+    :param time_limit: seconds of endgame search per outcome
+    :param max_depth: deepest endgame search in turns
+    :return: list of (candidate index, probability, final spread of the player) per evaluated outcome
+    """
+    game, candidates = load_state(state)
+
+    seat = game.turn
+    unseen = _unseen(game, seat)
+    generator = None
+    results = []
+
+    for candidate, drawn, held, probability in batch:
+        if results and deadline is not None and time.time() >= deadline:
+            break
+
+        outcome = game.copy()
+        player = outcome.players[seat]
+        opponent = outcome.players[1 - seat]
+
+        # The bag holds exactly the draw, so playing the candidate draws it
+        outcome.tile_bag.counts = bytearray(drawn)
+        outcome.tile_bag.size = sum(drawn)
+        outcome.tile_bag.rng = random.Random(PLAYOUT_SEED)
+        outcome.apply_move(candidates[candidate])
+
+        opponent.rack = bytearray(held)
+        rest = [count - given - taken for count, given, taken in zip(unseen, held, drawn)]
+        outcome.tile_bag.counts = bytearray(rest)
+        outcome.tile_bag.size = sum(rest)
+
+        while len(outcome.tile_bag) and not outcome.is_over():
+            if generator is None:
+                generator = MoveGenerator(game.lexicon)
+            reply = generator.best_move(outcome.board, outcome.current_player.rack)
+            if reply is None:
+                outcome.pass_turn()
+            else:
+                outcome.apply_move(reply)
+
+        final = player.score - opponent.score
+        if not outcome.is_over():
+            value = endgame_value(outcome, width, table_bits, time_limit, max_depth)
+            final += value if outcome.turn == seat else -value
+        results.append((candidate, probability, final))
+
+    return results
+
+
+def _unseen(game: Game, seat: int) -> List[int]:
+    """
+    Tiles the player cannot see, the bag and the other rack, per rack slot
+
+    :param game: two player Game
+    :param seat: index of the player
+    :return: list[int]
+    """
+    opponent = game.players[1 - seat]
+    return [game.tile_bag.counts[slot] + opponent.rack[slot] for slot in range(RACK_SLOTS)]
+
+
+class CandidateResult:
+    # Win chances of one candidate move over the outcomes evaluated in time
+    def __init__(self, move: Move) -> None:
+        """
+
+        :param move: Move
+        """
+        self.move = move
+        self.outcomes = 0
+        self.outcome_total = 0
+
+        # Probability of the evaluated outcomes, and of those that win, tie counting half
+        self.covered = 0.0
+        self.won = 0.0
+        self.spread = 0.0
+
+    def add(self, probability: float, final: int):
+        self.outcomes += 1
+        self.covered += probability
+        self.won += probability * (1.0 if final > 0 else 0.5 if final == 0 else 0.0)
+        self.spread += probability * final
+
+    @property
+    def win_probability(self) -> float:
+        return self.won / self.covered if self.covered else 0.0
+
+    @property
+    def mean_spread(self) -> float:
+        return self.spread / self.covered if self.covered else 0.0
+
+
+class PreEndgameSolver:
+    # Static pre-endgame analysis for two player positions with one to six tiles in the bag. Every
+    # draw the top candidates can lead to is enumerated with its probability, and each outcome is
+    # played out to the end, the endgame part by the endgame solver. Outcomes run across a process
+    # pool, most likely first, until the time budget runs out.
+    def __init__(self, lexicon: Lexicon, candidates: int = 8, time_budget: Union[float, None] = 5.0,
+                 endgame_width: Union[int, None] = 4, endgame_time: float = 0.1, endgame_depth: int = 4,
+                 table_bits: int = 16, workers: Union[int, None] = None) -> None:
+        """
+
+        :param lexicon: Lexicon
+        :param candidates: number of top scoring moves to analyse
+        :param time_budget: seconds per move, None evaluates every outcome
+        :param endgame_width: moves searched per position in each endgame
+        :param endgame_time: seconds of search per endgame
+        :param endgame_depth: deepest endgame search in turns
+        :param table_bits: transposition table size of the endgame solvers
+        :param workers: outcome processes, defaults to one per core, 1 evaluates in this process
+        """
+        self.generator = MoveGenerator(lexicon)
+        self.candidates = candidates
+        self.time_budget = time_budget
+        self.endgame_width = endgame_width
+        self.endgame_time = endgame_time
+        self.endgame_depth = endgame_depth
+        self.table_bits = table_bits
+        self.workers = workers or os.cpu_count() or 1
+        self.executor: Union[ProcessPoolExecutor, None] = None
+        self.shared: Union[SharedGameState, None] = None
+
+    def solve(self, game: Game) -> List[CandidateResult]:
+        """
+        Win probability of each of the top candidates for the player to move
+
+        :param game: two player Game with one to six tiles in the bag
+        :return: list[CandidateResult], best first
+        """
+        if len(game.players) != 2:
+            raise ValueError("The pre-endgame solver needs a two player game")
+        if not 1 <= len(game.tile_bag) <= MAX_BAG_TILES:
+            raise ValueError("The pre-endgame solver needs 1 to {} tiles in the bag".format(MAX_BAG_TILES))
+
+        deadline = None if self.time_budget is None else time.time() + self.time_budget
+        seat = game.turn
+
+        moves = self.generator.generate(game.board, game.current_player.rack)
+        moves.sort(key=lambda move: move.score, reverse=True)
+        candidates = moves[:self.candidates]
+        results = [CandidateResult(move) for move in candidates]
+        if not candidates:
+            return results
+
+        # Candidates take turns so each is covered as evenly as the budget allows
+        unseen = _unseen(game, seat)
+        opponent_size = game.players[1 - seat].rack_size()
+        per_candidate = [outcomes(unseen, opponent_size, len(game.tile_bag), i, move)
+                         for i, move in enumerate(candidates)]
+        for result, found in zip(results, per_candidate):
+            result.outcome_total = len(found)
+        queue = [outcome for level in _interleave(per_candidate) for outcome in level]
+
+        settings = (self.endgame_width, self.table_bits, self.endgame_time, self.endgame_depth)
+
+        if self.workers == 1:
+            state = pickle.dumps((game.copy(), candidates))
+            for candidate, probability, final in evaluate_outcomes(state, queue, deadline, *settings):
+                results[candidate].add(probability, final)
+        else:
+            # Workers read the position from shared memory, so a task only carries the block name
+            self.shared = share_state(self.shared, game, candidates)
+            self._evaluate_in_pool(self.shared.name, queue, deadline, settings, results)
+
+        results.sort(key=lambda result: (result.win_probability, result.mean_spread), reverse=True)
+        return results
+
+    def _evaluate_in_pool(self, state: str, queue: List[Outcome], deadline: Union[float, None], settings: tuple,
+                          results: List[CandidateResult]):
+        """
+        Keeps every worker busy with batches of outcomes until they are all evaluated or time runs out
+
+        :param state: name of the shared block holding the position
+        :param queue: list[Outcome] in the order to evaluate them
+        :param deadline: wall clock time to stop by
+        :param settings: endgame settings passed to evaluate_outcomes
+        :param results: list[CandidateResult] in candidate order, updated in place
+        :return:
+        """
+        # Started after the shared block so the workers share the resource tracker that frees it
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        submitted = 0
+        pending = set()
+        while True:
+            while len(pending) < self.workers and submitted < len(queue) and \
+                    (deadline is None or time.time() < deadline or submitted == 0):
+                batch = queue[submitted:submitted + OUTCOME_BATCH]
+                pending.add(self.executor.submit(evaluate_outcomes, state, batch, deadline, *settings))
+                submitted += len(batch)
+
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for candidate, probability, final in future.result():
+                    results[candidate].add(probability, final)
+
+    def close(self):
+        """
+        Shuts down the outcome processes and frees the shared position
+
+        :return:
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        if self.shared is not None:
+            self.shared.close()
+            self.shared = None
+
+
+def _interleave(lists: List[List[Outcome]]) -> Iterator[List[Outcome]]:
+    """
+    The first item of every list, then the second of every list and so on
+
+    :param lists: list of lists
+    :return: iterator of lists
+    """
+    for i in range(max(len(items) for items in lists)):
+        yield [items[i] for items in lists if i < len(items)]
@@ -0,0 +1,190 @@
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Tuple, Union
+
+# Trace events kept before new ones are dropped, about 40 MB of events
+MAX_TRACE_EVENTS = 500000
+
+
+class Span:
+    # Context manager timing a block under a name, does nothing while the profiler is disabled
+    __slots__ = ["profiler", "name", "start"]
+
+    def __init__(self, profiler: "Profiler", name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> "Span":
+        if self.profiler.enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profiler.enabled and self.start:
+            self.profiler.record(self.name, self.start, time.perf_counter() - self.start)
+        self.start = 0.0
+
+
+class Profiler:
+    # Timers and counters for the hot phases of a game. Disabled by default, when the only cost of an
+    # instrumented call is one attribute check.
+    def __init__(self) -> None:
+        self.enabled = False
+        self.tracing = False
+        self.origin = time.perf_counter()
+
+        # Name to (calls, total seconds, longest call) since the last reset, and plain counters
+        self.timers: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {}
+
+        # Seconds per name in the frame being drawn and in the last finished frame
+        self.frame_times: Dict[str, float] = {}
+        self.last_frame: Dict[str, float] = {}
+
+        # Complete events as (name, start, duration, thread id) for Chrome traces
+        self.events: List[Tuple[str, float, float, int]] = []
+        self.dropped_events = 0
+
+    def enable(self, tracing: bool = False):
+        """
+        Starts collecting
+
+        :param tracing: also keep every timed call for a Chrome trace
+        :return:
+        """
+        self.enabled = True
+        self.tracing = tracing
+
+    def disable(self):
+        self.enabled = False
+        self.tracing = False
+
+    def reset(self):
+        self.origin = time.perf_counter()
+        self.timers = {}
+        self.counters = {}
+        self.frame_times = {}
+        self.last_frame = {}
+        self.events = []
+        self.dropped_events = 0
+
+    def record(self, name: str, start: float, duration: float):
+        """
+        Adds a timed call
+
+        :param name: str
+        :param start: perf_counter at the start of the call
+        :param duration: seconds
+        :return:
+        """
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, duration, duration]
+        else:
+            timer[0] += 1
+            timer[1] += duration
+            if duration > timer[2]:
+                timer[2] = duration
+        self.frame_times[name] = self.frame_times.get(name, 0.0) + duration
+
+        if self.tracing:
+            if len(self.events) < MAX_TRACE_EVENTS:
+                self.events.append((name, start, duration, threading.get_ident()))
+            else:
+                self.dropped_events += 1
+
+    def count(self, name: str, amount: int = 1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def span(self, name: str) -> Span:
+        return Span(self, name)
+
+    def timed(self, name: str) -> Callable:
+        """
+        Decorator timing every call of a function under a name
+
+        :param name: str
+        :return: decorator
+        """
+        def decorate(function: Callable) -> Callable:
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self.record(name, start, time.perf_counter() - start)
+            return wrapper
+        return decorate
+
+    def end_frame(self):
+        # The overlay shows the last finished frame so it does not flicker with half drawn frames
+        self.last_frame = self.frame_times
+        self.frame_times = {}
+
+    def summary(self) -> Dict:
+        """
+        Timers and counters collected since the last reset
+
+        :return: dict
+        """
+        return {
+            "timers": {name: {"calls": int(calls), "total": total, "mean": total / calls, "max": longest}
+                       for name, (calls, total, longest) in sorted(self.timers.items())},
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+    def write_summary(self, path: str):
+        with open(path, "w") as summary_file:
+            json.dump(self.summary(), summary_file, indent=2)
+
+    def write_trace(self, path: str):
+        """
+        Writes the traced calls in the Chrome trace event format, viewable in chrome://tracing or Perfetto
+
+        :param path: str
+        :return:
+        """
+        pid = os.getpid()
+        trace = [{"name": name, "ph": "X", "ts": 1e6 * (start - self.origin), "dur": 1e6 * duration,
+                  "pid": pid, "tid": tid} for name, start, duration, tid in self.events]
+        trace += [{"name": name, "ph": "C", "ts": 1e6 * (time.perf_counter() - self.origin), "pid": pid,
+                   "args": {name: value}} for name, value in self.counters.items()]
+
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": trace, "otherData": {"dropped_events": self.dropped_events}}, trace_file)
+
+
+# Profiler shared by the whole process
+PROFILER = Profiler()
+
+
+class GameProfile:
+    # Opt in cProfile capture of a block, such as one game, written as a pstats file
+    def __init__(self, path: Union[str, None]) -> None:
+        """
+
+        :param path: pstats file to write, None to capture nothing
+        """
+        self.path = path
+        self.profile: Union[cProfile.Profile, None] = None
+
+    def __enter__(self) -> "GameProfile":
+        if self.path is not None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(self.path)
+            self.profile = None
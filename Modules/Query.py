@@ -0,0 +1,339 @@
+import itertools
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Sequence, Tuple, Union
+
+from Modules.Dawg import ALPHABET, NO_NODE, ROOT
+from Modules.Lexicon import Lexicon
+from Modules.Profiler import PROFILER
+
+# Rack blanks and open squares of a pattern
+BLANK = '?'
+OPEN = '?'
+
+# Any number of open squares in a pattern, none included
+ANY = '*'
+
+# Query kinds answered by LexiconQuery.run
+ANAGRAMS = "anagrams"
+SUBANAGRAMS = "subanagrams"
+PATTERN = "pattern"
+HOOKS = "hooks"
+
+# Batches smaller than this are answered in process, the worker start up costs more than they take
+PARALLEL_BATCH = 2000
+
+# Query service of a worker process
+_worker_query: Union["LexiconQuery", None] = None
+
+
+def anagram_key(letters: str) -> str:
+    return "".join(sorted(letters))
+
+
+def _init_worker(lexicon: Lexicon, cache_size: int):
+    global _worker_query
+    _worker_query = LexiconQuery(lexicon, cache_size, workers=1)
+
+
+def _run_chunk(keys: List[tuple]) -> List[list]:
+    return [_worker_query.run(LexiconQuery.key_query(key)) for key in keys]
+
+
+class LexiconQuery:
+    # Word finding questions asked of a lexicon: anagrams of a rack, words fitting a pattern and hooks.
+    # Anagrams come from an index of the words by their sorted letters, patterns from a walk of the
+    # word graph. Answers are kept in a shared LRU cache, and large batches run across processes.
+    def __init__(self, lexicon: Lexicon, cache_size: int = 4096, workers: Union[int, None] = None) -> None:
+        """
+
+        :param lexicon: Lexicon
+        :param cache_size: answers kept, the least recently used is dropped first
+        :param workers: processes for large batches, defaults to one per core, 1 answers them in process
+        """
+        self.lexicon = lexicon
+        self.dawg = lexicon.dawg
+        self.cache_size = cache_size
+        self.cache: "OrderedDict[tuple, list]" = OrderedDict()
+        self.workers = workers or os.cpu_count() or 1
+        self.executor: Union[ProcessPoolExecutor, None] = None
+
+        # Words by their sorted letters, built on the first anagram query
+        self.index: Union[Dict[str, List[str]], None] = None
+
+    def build_index(self) -> Dict[str, List[str]]:
+        """
+        Buckets every word by its sorted letters
+
+        :return: dict of anagram key to words in alphabetical order
+        """
+        if self.index is None:
+            index: Dict[str, List[str]] = {}
+            for word in self.dawg.words():
+                index.setdefault(anagram_key(word), []).append(word)
+            self.index = index
+        return self.index
+
+    def _cached(self, query: tuple, answer) -> list:
+        """
+        Answer of a query from the cache, worked out and stored on a miss
+
+        :param query: hashable query
+        :param answer: function of no arguments working out the answer
+        :return: list
+        """
+        result = self.cache.get(query)
+        if result is not None:
+            self.cache.move_to_end(query)
+            PROFILER.count("query_hits")
+            return result
+
+        result = answer()
+        self.cache[query] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _split_rack(rack: str) -> Tuple[str, int]:
+        """
+        Letters and number of blanks of a rack
+
+        :param rack: letters, BLANK for blanks
+        :return: (sorted letters, blanks)
+        """
+        rack = rack.lower()
+        letters = "".join(sorted(letter for letter in rack if letter != BLANK))
+        if any(letter not in ALPHABET for letter in letters):
+            raise ValueError("A rack holds letters and {} for blanks, got {}".format(BLANK, rack))
+        return letters, rack.count(BLANK)
+
+    def query_key(self, query: Sequence) -> tuple:
+        """
+        Cache key of a query, the same for every way of writing it such as racks in any order
+
+        :param query: sequence as taken by run
+        :return: tuple
+        """
+        kind, arguments = query[0], list(query[1:])
+        if kind == ANAGRAMS:
+            return (kind,) + self._split_rack(*arguments)
+        if kind == SUBANAGRAMS:
+            min_length = arguments[1] if len(arguments) > 1 else 2
+            return (kind,) + self._split_rack(arguments[0]) + (min_length,)
+        if kind == PATTERN:
+            pattern = arguments[0].lower()
+            if any(square not in ALPHABET and square not in (OPEN, ANY) for square in pattern):
+                raise ValueError("A pattern holds letters, {} and {}, got {}".format(OPEN, ANY, pattern))
+            rack = arguments[1] if len(arguments) > 1 else None
+            return kind, pattern, None if rack is None else self._split_rack(rack)
+        if kind == HOOKS:
+            return kind, arguments[0].lower()
+        raise ValueError("Unknown query kind {}".format(kind))
+
+    @staticmethod
+    def key_query(key: tuple) -> tuple:
+        """
+        A query written from its cache key
+
+        :param key: tuple from query_key
+        :return: tuple as taken by run
+        """
+        kind = key[0]
+        if kind in (ANAGRAMS, SUBANAGRAMS):
+            return (kind, key[1] + BLANK * key[2]) + key[3:]
+        if kind == PATTERN:
+            return kind, key[1], None if key[2] is None else key[2][0] + BLANK * key[2][1]
+        return key
+
+    def _keys(self, letters: str, blanks: int) -> Iterator[str]:
+        # Every anagram key the letters make with each way of filling the blanks
+        for fill in itertools.combinations_with_replacement(ALPHABET, blanks):
+            yield anagram_key(letters + "".join(fill))
+
+    @PROFILER.timed("query_anagrams")
+    def anagrams(self, rack: str) -> List[str]:
+        """
+        Words using every tile of the rack
+
+        :param rack: letters, BLANK for blanks
+        :return: list[str] in alphabetical order
+        """
+        key = self.query_key((ANAGRAMS, rack))
+        _, letters, blanks = key
+
+        def answer():
+            index = self.build_index()
+            found = set()
+            for sorted_letters in self._keys(letters, blanks):
+                found.update(index.get(sorted_letters, ()))
+            return sorted(found)
+
+        return self._cached(key, answer)
+
+    @PROFILER.timed("query_subanagrams")
+    def subanagrams(self, rack: str, min_length: int = 2) -> List[str]:
+        """
+        Words made from some or all of the tiles of the rack
+
+        :param rack: letters, BLANK for blanks
+        :param min_length: shortest word
+        :return: list[str] longest first, then in alphabetical order
+        """
+        key = self.query_key((SUBANAGRAMS, rack, min_length))
+        _, letters, blanks, _ = key
+
+        def answer():
+            index = self.build_index()
+            keys = set()
+            for size in range(len(letters) + 1):
+                for subset in set(itertools.combinations(letters, size)):
+                    for used in range(blanks + 1):
+                        if size + used >= min_length:
+                            keys.update(self._keys("".join(subset), used))
+
+            found = set()
+            for sorted_letters in keys:
+                found.update(index.get(sorted_letters, ()))
+            return sorted(found, key=lambda word: (-len(word), word))
+
+        return self._cached(key, answer)
+
+    @PROFILER.timed("query_pattern")
+    def pattern(self, pattern: str, rack: Union[str, None] = None) -> List[str]:
+        """
+        Words fitting a pattern, such as "?a?e" or "re*". Letters stand for themselves, OPEN for one
+        letter and ANY for any number of letters. With a rack the open squares must be filled from
+        its tiles.
+
+        :param pattern: str
+        :param rack: optional letters, BLANK for blanks
+        :return: list[str] in alphabetical order
+        """
+        key = self.query_key((PATTERN, pattern, rack))
+        _, pattern, tiles = key
+        counts = None if tiles is None else [tiles[0].count(letter) for letter in ALPHABET] + [tiles[1]]
+
+        def answer():
+            found = set()
+            self._match(ROOT, pattern, 0, counts, "", found)
+            return sorted(found)
+
+        return self._cached(key, answer)
+
+    def _match(self, node: int, pattern: str, index: int, counts: Union[List[int], None], word: str, found: set):
+        """
+        Walks the word graph along the pattern, adding the words it spells
+
+        :param node: graph node reached by word
+        :param pattern: str
+        :param index: position in the pattern
+        :param counts: rack tiles left per letter with blanks last, None for any letters
+        :param word: letters so far
+        :param found: set the words are added to
+        :return:
+        """
+        dawg = self.dawg
+        if index == len(pattern):
+            if dawg.is_terminal(node):
+                found.add(word)
+            return
+
+        square = pattern[index]
+        if square not in (OPEN, ANY):
+            child = dawg.child(node, ord(square) - 97)
+            if child != NO_NODE:
+                self._match(child, pattern, index + 1, counts, word + square, found)
+            return
+
+        if square == ANY:
+            self._match(node, pattern, index + 1, counts, word, found)
+
+        # An open square takes a letter from the rack, or a blank standing in for it
+        after = index + 1 if square == OPEN else index
+        for letter, child in dawg.children(node):
+            if counts is None:
+                self._match(child, pattern, after, counts, word + ALPHABET[letter], found)
+                continue
+            slot = letter if counts[letter] else 26 if counts[26] else -1
+            if slot >= 0:
+                counts[slot] -= 1
+                self._match(child, pattern, after, counts, word + ALPHABET[letter], found)
+                counts[slot] += 1
+
+    @PROFILER.timed("query_hooks")
+    def hooks(self, word: str) -> List[str]:
+        """
+        Letters that can go in front of and after a word to make another word
+
+        :param word: str
+        :return: [front hooks, back hooks] as strings of letters
+        """
+        key = self.query_key((HOOKS, word))
+        word = key[1]
+
+        def answer():
+            dawg = self.dawg
+            front = "".join(letter for letter in ALPHABET if letter + word in dawg)
+            node = dawg.walk(word)
+            back = "" if node == NO_NODE else \
+                "".join(ALPHABET[letter] for letter, child in dawg.children(node) if dawg.is_terminal(child))
+            return [front, back]
+
+        return self._cached(key, answer)
+
+    def run(self, query: Sequence) -> list:
+        """
+        Answers a query given as its kind followed by its arguments, such as ("pattern", "?a?e", "rst")
+
+        :param query: sequence starting with ANAGRAMS, SUBANAGRAMS, PATTERN or HOOKS
+        :return: list
+        """
+        kind, arguments = query[0], query[1:]
+        if kind == ANAGRAMS:
+            return self.anagrams(*arguments)
+        if kind == SUBANAGRAMS:
+            return self.subanagrams(*arguments)
+        if kind == PATTERN:
+            return self.pattern(*arguments)
+        if kind == HOOKS:
+            return self.hooks(*arguments)
+        raise ValueError("Unknown query kind {}".format(kind))
+
+    def batch(self, queries: List[Sequence]) -> List[list]:
+        """
+        Answers many queries, large batches are split across the worker processes. Each distinct
+        query is answered once and the answers join the cache.
+
+        :param queries: list of queries as taken by run
+        :return: list of answers in query order
+        """
+        keys = [self.query_key(query) for query in queries]
+        missing = [key for key in dict.fromkeys(keys) if key not in self.cache]
+        if self.workers == 1 or len(missing) < PARALLEL_BATCH:
+            return [self.run(query) for query in queries]
+
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                                initargs=(self.lexicon, self.cache_size))
+
+        # A few chunks per worker so an uneven chunk does not leave the others idle
+        chunk_size = -(-len(missing) // (self.workers * 4))
+        chunks = [missing[start:start + chunk_size] for start in range(0, len(missing), chunk_size)]
+        answers = {key: self.cache[key] for key in keys if key in self.cache}
+        for chunk, chunk_answers in zip(chunks, self.executor.map(_run_chunk, chunks)):
+            for key, answer in zip(chunk, chunk_answers):
+                answers[key] = answer
+                self._cached(key, lambda: answer)
+        return [answers[key] for key in keys]
+
+    def close(self):
+        """
+        Shuts down the worker processes
+
+        :return:
+        """
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
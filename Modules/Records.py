@@ -0,0 +1,397 @@
+import struct
+from typing import Iterable, Iterator, List, Tuple, Union
+
+from Modules.Game import EXCHANGE, MOVE, PASS, Game
+from Modules.Scrabble import BLANK, STANDARD_SIDE_SQUARES, code_value, tile_code
+
+# End of game rack adjustments are stored as turns with this action
+END = "end"
+
+# Binary layout: a file header, then one length prefixed record per game
+RECORD_MAGIC = b"SREC"
+RECORD_VERSION = 2
+FILE_HEADER = struct.Struct("=4sI")  # magic, version
+RECORD_HEADER = struct.Struct("=IBqBBH")  # bytes after this field, has seed, seed, players, side squares, turns
+
+# Record header of version 1 files, where a seed of -1 stood for no seed
+RECORD_HEADER_V1 = struct.Struct("=IqBBH")
+
+# Seeds a record can hold, the signed 64 bit range
+MIN_SEED = -(1 << 63)
+MAX_SEED = (1 << 63) - 1
+PLAYER_ENTRY = struct.Struct("=iB")  # final score, name length, followed by the utf-8 name
+TURN_ENTRY = struct.Struct("=BBiifBBB")  # player, action, score, total, seconds, across, rack length, tile count
+TILE_ENTRY = struct.Struct("=HB")  # board position, tile code
+
+ACTION_CODES = {MOVE: 0, PASS: 1, EXCHANGE: 2, END: 3}
+ACTIONS = {code: action for action, code in ACTION_CODES.items()}
+
+# Position of exchanged tiles in the binary format
+EXCHANGED = 0xFFFF
+
+# GCG column names
+COLUMNS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+class TurnRecord:
+    # A recorded turn, or an end of game rack adjustment
+    def __init__(self, player: int, action: str, rack: str = "", tiles: Union[List[Tuple[int, str, bool]], None] = None,
+                 across: bool = True, score: int = 0, total: int = 0, letters: str = "", time: float = 0.0) -> None:
+        """
+
+        :param player: index of the player
+        :param action: MOVE, PASS, EXCHANGE or END
+        :param rack: rack before the turn, '?' for blanks, for END the tiles the adjustment is counted from
+        :param tiles: placed tiles as (board position, letter, is blank)
+        :param across: True if the main word runs along a row
+        :param score: points scored, negative for a rack penalty
+        :param total: the players score after the turn
+        :param letters: the letters exchanged
+        :param time: seconds taken to choose the turn
+        """
+        self.player = player
+        self.action = action
+        self.rack = rack
+        self.tiles = tiles or []
+        self.across = across
+        self.score = score
+        self.total = total
+        self.letters = letters
+        self.time = time
+
+
+class GameRecord:
+    # A complete game, enough to replay it without the bag
+    def __init__(self, names: List[str], turns: List[TurnRecord], seed: Union[int, None] = None,
+                 side_squares: int = STANDARD_SIDE_SQUARES) -> None:
+        """
+
+        :param names: one name per player
+        :param turns: list[TurnRecord]
+        :param seed: seed the game was played with, if known
+        :param side_squares: number of squares along a side of the board
+        """
+        self.names = names
+        self.turns = turns
+        self.seed = seed
+        self.side_squares = side_squares
+
+    @property
+    def final_scores(self) -> List[int]:
+        scores = [0] * len(self.names)
+        for turn in self.turns:
+            scores[turn.player] = turn.total
+        return scores
+
+    @classmethod
+    def from_game(cls, game: Game, seed: Union[int, None] = None,
+                  names: Union[List[str], None] = None) -> "GameRecord":
+        """
+        Records a game from its history, adding the rack adjustments when it is over
+
+        :param game: Game
+        :param seed: seed the game was played with, defaults to the games own seed
+        :param names: player names, defaults to p1, p2, ...
+        :return: GameRecord
+        """
+        seed = game.seed if seed is None else seed
+        names = names or ["p{}".format(i + 1) for i in range(len(game.players))]
+        totals = [0] * len(game.players)
+        turns = []
+
+        for turn in game.history:
+            totals[turn.player] += turn.score
+            if turn.action == MOVE:
+                turns.append(TurnRecord(turn.player, MOVE, turn.rack, turn.move.tiles, turn.move.across, turn.score,
+                                        totals[turn.player], time=turn.time))
+            else:
+                turns.append(TurnRecord(turn.player, turn.action, turn.rack, score=turn.score,
+                                        total=totals[turn.player], letters=turn.letters, time=turn.time))
+
+        if game.is_over():
+            racks = ["".join(player.rack_letters()) for player in game.players]
+            values = [sum(code_value(tile_code(letter)) for letter in rack) for rack in racks]
+            out_player = next((i for i, rack in enumerate(racks) if not rack), None)
+
+            for i, rack in enumerate(racks):
+                if rack:
+                    totals[i] -= values[i]
+                    turns.append(TurnRecord(i, END, rack, score=-values[i], total=totals[i]))
+
+            if out_player is not None:
+                totals[out_player] += sum(values)
+                turns.append(TurnRecord(out_player, END, "".join(racks), score=sum(values), total=totals[out_player]))
+
+        return cls(names, turns, seed, game.board.side_squares)
+
+
+def main_word(letters: bytearray, tiles: List[Tuple[int, str, bool]], across: bool,
+              side_squares: int) -> Tuple[int, str]:
+    """
+    Start square and GCG spelling of the main word of a placement, capitals for tiles, lower case for
+    blanks and '.' for letters already on the board
+
+    :param letters: board letters before the placement, zero for empty squares
+    :param tiles: placed tiles as (board position, letter, is blank)
+    :param across: True if the word runs along a row
+    :param side_squares: int
+    :return: (int, str)
+    """
+    step = 1 if across else side_squares
+    placed = {pos: letter if blank else letter.upper() for pos, letter, blank in tiles}
+
+    def on_line(pos: int) -> bool:
+        if across:
+            return 0 <= pos < len(letters) and pos // side_squares == min(placed) // side_squares
+        return 0 <= pos < len(letters)
+
+    start = min(placed)
+    while on_line(start - step) and (start - step in placed or letters[start - step]):
+        start -= step
+    end = start
+    while on_line(end + step) and (end + step in placed or letters[end + step]):
+        end += step
+
+    return start, "".join(placed.get(pos, ".") for pos in range(start, end + 1, step))
+
+
+def format_gcg(record: GameRecord) -> Iterator[str]:
+    """
+    Lines of the record in GCG, with #seed and #time pragmas for what GCG has no field for
+
+    :param record: GameRecord
+    :return: iterator of lines without line endings
+    """
+    n = record.side_squares
+
+    # Nicknames are p1, p2, ... so players with the same name stay apart
+    for i, name in enumerate(record.names):
+        yield "#player{} p{} {}".format(i + 1, i + 1, name)
+    if record.seed is not None:
+        yield "#seed {}".format(record.seed)
+    if n != STANDARD_SIDE_SQUARES:
+        yield "#board-size {}".format(n)
+
+    letters = bytearray(n * n)
+    for turn in record.turns:
+        name = "p{}".format(turn.player + 1)
+        rack = turn.rack.upper()
+        if turn.action == MOVE:
+            start, word = main_word(letters, turn.tiles, turn.across, n)
+            row, col = divmod(start, n)
+            position = "{}{}".format(row + 1, COLUMNS[col]) if turn.across else "{}{}".format(COLUMNS[col], row + 1)
+            yield ">{}: {} {} {} +{} {}".format(name, rack, position, word, turn.score, turn.total)
+            for pos, letter, _ in turn.tiles:
+                letters[pos] = ord(letter)
+        elif turn.action == EXCHANGE:
+            yield ">{}: {} -{} +0 {}".format(name, rack, turn.letters.upper(), turn.total)
+        elif turn.action == PASS:
+            yield ">{}: {} - +0 {}".format(name, rack, turn.total)
+        else:
+            yield ">{}: ({}) {:+d} {}".format(name, rack, turn.score, turn.total)
+
+        if turn.time:
+            yield "#time {:.6f}".format(turn.time)
+
+
+def parse_gcg(lines: Iterable[str]) -> GameRecord:
+    """
+    Reads a record from GCG lines, unknown pragmas are skipped
+
+    :param lines: iterable of str
+    :return: GameRecord
+    """
+    names: List[str] = []
+    nicknames: List[str] = []
+    turns: List[TurnRecord] = []
+    seed = None
+    n = STANDARD_SIDE_SQUARES
+    letters = bytearray(n * n)
+
+    for line in lines:
+        line = line.strip()
+        if line.startswith("#player"):
+            _, nickname, name = line.split(maxsplit=2)
+            nicknames.append(nickname)
+            names.append(name)
+        elif line.startswith("#seed"):
+            seed = int(line.split()[1])
+        elif line.startswith("#board-size"):
+            n = int(line.split()[1])
+            letters = bytearray(n * n)
+        elif line.startswith("#time") and turns:
+            turns[-1].time = float(line.split()[1])
+        elif line.startswith(">"):
+            name, fields = line[1:].split(":", 1)
+            fields = fields.split()
+            player = nicknames.index(name)
+            total = int(fields[-1])
+            score = int(fields[-2])
+
+            if fields[0].startswith("("):
+                turns.append(TurnRecord(player, END, fields[0][1:-1].lower(), score=score, total=total))
+            elif fields[1] == "-":
+                turns.append(TurnRecord(player, PASS, fields[0].lower(), total=total))
+            elif fields[1].startswith("-"):
+                turns.append(TurnRecord(player, EXCHANGE, fields[0].lower(), total=total,
+                                        letters=fields[1][1:].lower()))
+            else:
+                position, word = fields[1], fields[2]
+                across = position[0].isdigit()
+                digits = position.rstrip(COLUMNS) if across else position.lstrip(COLUMNS)
+                row = int(digits) - 1
+                col = COLUMNS.index(position[-1] if across else position[0])
+                step = 1 if across else n
+
+                # Letters already on the board are written as '.' or in brackets
+                tiles = []
+                pos = row * n + col
+                through = False
+                for letter in word:
+                    if letter in "()":
+                        through = letter == "("
+                        continue
+                    if letter != "." and not through and not letters[pos]:
+                        tiles.append((pos, letter.lower(), letter.islower()))
+                        letters[pos] = ord(letter.lower())
+                    pos += step
+
+                turns.append(TurnRecord(player, MOVE, fields[0].lower(), tiles, across, score, total))
+
+    return GameRecord(names, turns, seed, n)
+
+
+def pack_record(record: GameRecord) -> bytes:
+    """
+    Binary encoding of a record, including its length prefix
+
+    :param record: GameRecord
+    :return: bytes
+    """
+    body = bytearray()
+    for name, score in zip(record.names, record.final_scores):
+        encoded = name.encode("utf-8")
+        body += PLAYER_ENTRY.pack(score, len(encoded)) + encoded
+
+    for turn in record.turns:
+        tiles = [(pos, tile_code(letter, blank)) for pos, letter, blank in turn.tiles]
+        tiles += [(EXCHANGED, tile_code(letter)) for letter in turn.letters]
+        body += TURN_ENTRY.pack(turn.player, ACTION_CODES[turn.action], turn.score, turn.total, turn.time,
+                                turn.across, len(turn.rack), len(tiles))
+        body += turn.rack.encode("ascii")
+        for tile in tiles:
+            body += TILE_ENTRY.pack(*tile)
+
+    if record.seed is not None and not MIN_SEED <= record.seed <= MAX_SEED:
+        raise ValueError("Seed {} does not fit in a game record, seeds run from {} to {}".format(
+            record.seed, MIN_SEED, MAX_SEED))
+    header = RECORD_HEADER.pack(RECORD_HEADER.size - 4 + len(body), record.seed is not None, record.seed or 0,
+                                len(record.names), record.side_squares, len(record.turns))
+    return header + body
+
+
+def unpack_record(data: bytes, version: int = RECORD_VERSION) -> GameRecord:
+    """
+    Decodes a record packed by pack_record
+
+    :param data: bytes including the length prefix
+    :param version: version of the file the record was read from
+    :return: GameRecord
+    """
+    if version == 1:
+        _, seed, player_count, side_squares, turn_count = RECORD_HEADER_V1.unpack_from(data)
+        has_seed = seed >= 0
+        offset = RECORD_HEADER_V1.size
+    else:
+        _, has_seed, seed, player_count, side_squares, turn_count = RECORD_HEADER.unpack_from(data)
+        offset = RECORD_HEADER.size
+
+    names = []
+    for _ in range(player_count):
+        _, length = PLAYER_ENTRY.unpack_from(data, offset)
+        offset += PLAYER_ENTRY.size
+        names.append(data[offset:offset + length].decode("utf-8"))
+        offset += length
+
+    turns = []
+    for _ in range(turn_count):
+        player, action, score, total, seconds, across, rack_length, tile_count = TURN_ENTRY.unpack_from(data, offset)
+        offset += TURN_ENTRY.size
+        rack = data[offset:offset + rack_length].decode("ascii")
+        offset += rack_length
+
+        tiles = []
+        letters = ""
+        for _ in range(tile_count):
+            pos, code = TILE_ENTRY.unpack_from(data, offset)
+            offset += TILE_ENTRY.size
+            letter = BLANK if code == tile_code(BLANK) else chr(97 + (code & 31))
+            if pos == EXCHANGED:
+                letters += letter
+            else:
+                tiles.append((pos, letter, bool(code & 32)))
+
+        turns.append(TurnRecord(player, ACTIONS[action], rack, tiles, bool(across), score, total, letters, seconds))
+
+    return GameRecord(names, turns, seed if has_seed else None, side_squares)
+
+
+class RecordWriter:
+    # Appends game records to a file as they finish, GCG text for .gcg files and the binary format otherwise
+    def __init__(self, path: str) -> None:
+        """
+
+        :param path: str
+        """
+        self.path = path
+        self.is_text = path.lower().endswith(".gcg")
+        self.file = open(path, "w" if self.is_text else "wb")
+        if not self.is_text:
+            self.file.write(FILE_HEADER.pack(RECORD_MAGIC, RECORD_VERSION))
+
+    def write(self, record: GameRecord):
+        if self.is_text:
+            # Games in a text file are separated by a blank line
+            self.file.write("\n".join(format_gcg(record)) + "\n\n")
+        else:
+            self.file.write(pack_record(record))
+
+    def close(self):
+        self.file.close()
+
+
+def read_records(path: str) -> Iterator[GameRecord]:
+    """
+    Iterates over the games in a record file one at a time, the format is told apart by the file header
+
+    :param path: str
+    :return: iterator of GameRecord
+    """
+    with open(path, "rb") as record_file:
+        is_binary = record_file.read(FILE_HEADER.size)[:4] == RECORD_MAGIC
+
+    if is_binary:
+        with open(path, "rb") as record_file:
+            _, version = FILE_HEADER.unpack(record_file.read(FILE_HEADER.size))
+            if not 1 <= version <= RECORD_VERSION:
+                raise ValueError("{} is a version {} record file, expected up to {}".format(
+                    path, version, RECORD_VERSION))
+
+            while True:
+                prefix = record_file.read(4)
+                if len(prefix) < 4:
+                    break
+                (length,) = struct.unpack("=I", prefix)
+                yield unpack_record(prefix + record_file.read(length), version)
+
+    else:
+        with open(path, "r") as record_file:
+            lines: List[str] = []
+            for line in record_file:
+                if line.strip():
+                    lines.append(line)
+                elif lines:
+                    yield parse_gcg(lines)
+                    lines = []
+            if lines:
+                yield parse_gcg(lines)
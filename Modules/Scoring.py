@@ -0,0 +1,74 @@
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from Modules.Batch import BoardBatch
+from Modules.Scrabble import BLANK, RACK_SIZE, TILE_VALUES, Board
+
+
+class Scorer:
+    # Scores placements on a board, as a batch of one board
+    def __init__(self, board: Board) -> None:
+        """
+
+        :param board: Board, read on every call
+        """
+        self.board = board
+
+    def score_arrays(self, positions: np.ndarray, values: np.ndarray, across: np.ndarray) -> np.ndarray:
+        """
+        Scores a batch of placements in vectorized passes
+
+        :param positions: (moves, tiles) board positions of the placed tiles, padded with -1
+        :param values: (moves, tiles) face values of the placed tiles, 0 for blanks and padding
+        :param across: (moves,) True if the main word runs along a row
+        :return: np.ndarray of int scores
+        """
+        batch = BoardBatch.from_boards([self.board])
+        return batch.score(np.zeros(len(positions), dtype=np.int64), positions, values, across)
+
+    def score_moves(self, moves: Sequence) -> np.ndarray:
+        """
+        Scores a list of moves, anything with tiles as (position, letter, is blank) and an across flag
+
+        :param moves: list[Move]
+        :return: np.ndarray of int scores
+        """
+        positions, values, across = pack_moves(moves)
+        return self.score_arrays(positions, values, across)
+
+    def score_placement(self, tiles: List[Tuple[int, str, bool]], across: bool) -> int:
+        """
+        Scores a single placement including every cross word and the bingo bonus
+
+        :param tiles: list of (position, letter, is blank)
+        :param across: True if the main word runs along a row
+        :return: int
+        """
+        positions, values, directions = pack_placements([tiles], [across])
+        return int(self.score_arrays(positions, values, directions)[0])
+
+
+def tile_value(letter: str, blank: bool) -> int:
+    return 0 if blank or letter == BLANK else TILE_VALUES[ord(letter) - 97]
+
+
+def pack_placements(placements: Sequence[List[Tuple[int, str, bool]]], across: Sequence[bool]):
+    """
+    Packs placements into padded position and value arrays for Scorer.score_arrays
+
+    :param placements: list of tile lists
+    :param across: list[bool]
+    :return: (np.ndarray, np.ndarray, np.ndarray)
+    """
+    positions = np.full((len(placements), RACK_SIZE), -1, dtype=np.int64)
+    values = np.zeros((len(placements), RACK_SIZE), dtype=np.int64)
+    for i, tiles in enumerate(placements):
+        for j, (position, letter, blank) in enumerate(tiles):
+            positions[i, j] = position
+            values[i, j] = tile_value(letter, blank)
+    return positions, values, np.array(across, dtype=bool)
+
+
+def pack_moves(moves: Sequence):
+    return pack_placements([move.tiles for move in moves], [move.across for move in moves])
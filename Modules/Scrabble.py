@@ -1,12 +1,90 @@
+import copy
+import hashlib
 import random
-from typing import Union, List
+from typing import Iterable, List, Tuple, Union
 
-from raylibpy import *
-from Modules.Graphics import Dimensions, Render
+from Modules.Dawg import LETTER_MASK, NO_NODE, TERMINAL_FLAG
+from Modules.Layouts import NO_SQUARE, STANDARD_LAYOUT, BoardLayout, get_layout
+from Modules.Lexicon import Lexicon
+from Modules.Profiler import PROFILER
+
+# Scrabble Standard Setup
+ALPHABET = 'abcdefghijklmnopqrstuvwxyz'
+TILE_VALUES = [1, 3, 3, 2, 1, 4, 2, 4, 1, 8, 5, 1, 3, 1, 1, 3, 10, 1, 1, 1, 1, 4, 4, 8, 4, 10]
+TILE_COUNTS = [9, 2, 2, 4, 12, 2, 3, 2, 9, 1, 1, 4, 2, 6, 8, 2, 1, 6, 4, 6, 4, 2, 2, 1, 2, 1]
+
+# Blank tiles are written as '?' on the rack and score nothing
+BLANK = '?'
+BLANK_INDEX = 26
+BLANK_COUNT = 0
+
+# Tiles are encoded as small integers: the letter index, with BLANK_FLAG set for a blank standing
+# in for that letter, or BLANK_INDEX for a blank on the rack. Racks and the bag are count vectors
+# with one slot per letter and a last slot for blanks.
+BLANK_FLAG = 32
+RACK_SLOTS = 27
+RACK_SIZE = 7
+
+# Points for playing a whole rack in one move
+BINGO_BONUS = 50
+
+
+def tile_code(letter: str, blank: bool = False) -> int:
+    """
+    Integer code of a tile
+
+    :param letter: the letter, or '?' for a blank on the rack
+    :param blank: True if the tile is a blank standing in for the letter
+    :return: int
+    """
+    if letter == BLANK:
+        return BLANK_INDEX
+    return (ord(letter) - 97) | (BLANK_FLAG if blank else 0)
+
+
+def code_letter(code: int) -> str:
+    return BLANK if code == BLANK_INDEX else ALPHABET[code & ~BLANK_FLAG]
+
+
+def code_value(code: int) -> int:
+    return 0 if code == BLANK_INDEX or code & BLANK_FLAG else TILE_VALUES[code]
+
+
+def rack_slot(code: int) -> int:
+    """
+    Rack slot a tile comes from, played blanks go back to the blank slot
+
+    :param code: int
+    :return: int
+    """
+    return BLANK_INDEX if code & BLANK_FLAG else code
+
+
+# Derived seeds fit a signed 64 bit field
+SEED_MASK = (1 << 63) - 1
+
+
+def derive_seed(seed: int, *keys: int) -> int:
+    """
+    Seed for one part of a seeded run, such as a game of a tournament or a seat in a game. The result
+    depends only on the arguments, so it is the same whichever process or order it is derived in.
+
+    :param seed: seed of the whole run
+    :param keys: ints naming the part, e.g. the game index
+    :return: int
+    """
+    digest = hashlib.blake2b(",".join(str(key) for key in (seed,) + keys).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") & SEED_MASK
+
+
+# Side of the standard board, records of other sizes say so
+STANDARD_SIDE_SQUARES = 15
 
 
 class Tile:
-    # Scrabble Tile Class
+    # Scrabble Tile Class, used by the interface to track tiles being dragged around
+    __slots__ = ("type", "value", "rack_position", "board_position")
+
     def __init__(self, letter, value) -> None:
         """
 
@@ -20,88 +98,101 @@ class Tile:
         self.rack_position: Union[int, None] = None
         self.board_position: Union[int, None] = None
 
-    def draw_tile(self, rec: Rectangle, side_length: float):
-        """
 
-        :param rec: tile dimension parameters
-        :param side_length: side length of the tile TODO: is this needed?
-        :return:
+class TileBag:
+    # Scrabble Tile Bag Containing all the remaining tiles as a count per rack slot
+    def __init__(self, rng: Union[random.Random, None] = None) -> None:
         """
 
-        # Set the color of the tile
-        color = Color(227, 204, 32, 255)
-        if self.rack_position is not None:
-            color = Color(227, 142, 32, 255)
-
-        # Draws rectangle and the tile letter
-        draw_rectangle_rec(rec, color)
-        font_size = int(side_length / 1.5)
-        offset = (side_length - font_size) / 2
-
-        draw_text(self.type, rec.x + offset, rec.y + offset, font_size, BLACK)
-        draw_text(str(self.board_position), rec.x + 1, rec.y + 1, int(font_size / 3), BLACK)
-        draw_text(str(self.rack_position), rec.x + 1, rec.y + side_length - int(font_size / 3) - 1, int(font_size / 3),
-                  BLACK)
-        draw_text(str(self.value), rec.x + side_length - int(font_size / 3) - 1,
-                  rec.y + side_length - int(font_size / 3) - 1,
-                  int(font_size / 3),
-                  BLACK)
-
-
-class TileBag:
-    # Scrabble Tile Bag Containing all the remaining tiles
-    def __init__(self) -> None:
-        self.tiles = self.fill_bag()
+        :param rng: random.Random the tiles are drawn with, an unseeded one by default
+        """
+        self.rng = rng if rng is not None else random.Random()
+        self.counts = self.fill_bag()
+        self.size = sum(self.counts)
 
     @staticmethod
-    def fill_bag():
+    def fill_bag() -> bytearray:
         """
-        returns a List of tiles
-        :return: List[tile]
+        returns the number of tiles of each letter, blanks last
+        :return: bytearray
         """
-        tiles = []
-
-        # Scrabble Standard Setup
-        alphabet = 'abcdefghijklmnopqrstuvwxyz'
-        tile_value = [1, 3, 3, 2, 1, 4, 2, 4, 1, 8, 5, 1, 3, 1, 1, 3, 10, 1, 1, 1, 1, 4, 4, 8, 4, 10]
-        tile_counts = [9, 2, 2, 4, 12, 2, 3, 2, 9, 1, 1, 4, 2, 6, 8, 2, 1, 6, 4, 6, 4, 2, 2, 1, 2, 1]
-
         # Sanity Check
-        if len(tile_value) != len(alphabet) and len(tile_counts) != len(alphabet):
+        if len(TILE_VALUES) != len(ALPHABET) and len(TILE_COUNTS) != len(ALPHABET):
             exit(-1)
 
-        # Appending tiles in order
-        for i, count in enumerate(tile_counts):
-            for _ in range(count):
-                tiles.append(Tile(alphabet[i], tile_value[i]))
+        return bytearray(TILE_COUNTS + [BLANK_COUNT])
 
-        # Shuffling tiles
-        random.shuffle(tiles)
+    def __len__(self) -> int:
+        return self.size
 
-        return tiles
+    def draw(self) -> int:
+        """
+        Draws a random tile from the bag
+        :return: int tile code
+        """
+        pick = self.rng.randrange(self.size)
+        for code, count in enumerate(self.counts):
+            if pick < count:
+                self.counts[code] -= 1
+                self.size -= 1
+                return code
+            pick -= count
+        raise ValueError("The bag is empty")
 
     def get_tile(self) -> Tile:
         """
-        Gets the last tile from the bag
+        Draws a random tile from the bag
         :return: tile
         """
-        tile: Tile = self.tiles.pop()
-        return tile
+        code = self.draw()
+        return Tile(code_letter(code), code_value(code))
+
+    def return_codes(self, codes: Iterable[int]):
+        """
+        Puts tiles back into the bag
+
+        :param codes: tile codes
+        :return:
+        """
+        for code in codes:
+            self.counts[rack_slot(code)] += 1
+            self.size += 1
+
+    def copy(self) -> "TileBag":
+        """
+        Copy of the bag with its own random state, it draws the tiles the original would have drawn
+
+        :return: TileBag
+        """
+        bag = copy.copy(self)
+        bag.counts = bytearray(self.counts)
+        bag.rng = copy.copy(self.rng)
+        return bag
 
     def print(self):
         """
 
         :return:
         """
-        for tile in self.tiles:
-            print((tile.type, tile.value))
+        for code, count in enumerate(self.counts):
+            print((code_letter(code), code_value(code), count))
 
 
 class Player:
     # Player Class
-    def __init__(self) -> None:
+    def __init__(self, track_tiles: bool = True) -> None:
+        """
+
+        :param track_tiles: keep Tile objects for the interface in step with the rack
+        """
         self.held_piece = -1
         self.score = 0
+
+        # Tile count per rack slot, this is the players rack
+        self.rack = bytearray(RACK_SLOTS)
+
+        # Tile objects mirroring the rack for the interface
+        self.track_tiles = track_tiles
         self.tiles: List[Tile] = []
 
     def get_tiles(self, tile_bag: TileBag):
@@ -111,44 +202,163 @@ class Player:
         :param tile_bag: TileBag
         :return:
         """
-        tile_max = 7
-        if len(self.tiles) == tile_max:
-            print("Tile Bag already full")
+        for _ in range(self.rack_size(), RACK_SIZE):
+            # The rack stays short once the bag is empty
+            if not tile_bag.size:
+                break
+
+            self.rack[tile_bag.draw()] += 1
+
+        self.sync_tiles()
+
+    def rack_size(self) -> int:
+        return sum(self.rack)
+
+    def rack_codes(self) -> List[int]:
+        """
+        Codes of the tiles on the rack
+
+        :return: list[int]
+        """
+        return [code for code, count in enumerate(self.rack) for _ in range(count)]
+
+    def rack_letters(self) -> List[str]:
+        return [code_letter(code) for code in self.rack_codes()]
+
+    def remove_codes(self, codes: Iterable[int]):
+        """
+        Takes tiles off the rack, played blanks are taken from the blank slot
+
+        :param codes: tile codes
+        :return:
+        """
+        codes = list(codes)
+        for i, code in enumerate(codes):
+            slot = rack_slot(code)
+            if not self.rack[slot]:
+                # Put back what was already taken
+                for removed in codes[:i]:
+                    self.rack[rack_slot(removed)] += 1
+                raise ValueError("Tile {} is not on the rack".format(code_letter(slot)))
+            self.rack[slot] -= 1
+
+        self.sync_tiles()
+
+    def sync_tiles(self):
+        """
+        Brings the interface tiles in line with the rack, keeping the tiles that are still on it
+
+        :return:
+        """
+        if not self.track_tiles:
+            return
+
+        remaining = bytearray(self.rack)
+        kept: List[Tile] = []
+        for tile in self.tiles:
+            code = tile_code(tile.type)
+            if tile.board_position is None and remaining[code]:
+                remaining[code] -= 1
+                kept.append(tile)
+
+        for code, count in enumerate(remaining):
+            for _ in range(count):
+                kept.append(Tile(code_letter(code), code_value(code)))
 
-        for idx, tile in enumerate(self.tiles):
+        for idx, tile in enumerate(kept):
             tile.rack_position = idx
             tile.board_position = None
 
-        for i in range(len(self.tiles), tile_max):
-            tile = tile_bag.get_tile()
-            tile.rack_position = i
-            tile.board_position = None
-            self.tiles.append(tile)
+        self.tiles = kept
+
+    def copy(self) -> "Player":
+        """
+        Copy of the player without interface tiles, for searches
+
+        :return: Player
+        """
+        player = Player(False)
+        player.score = self.score
+        player.rack = bytearray(self.rack)
+        return player
 
     def get_filled_rack_pos(self):
         return [tile.rack_position for tile in self.tiles if tile.rack_position is not None]
 
+    def placed_tiles(self) -> List[Tuple[int, str, bool]]:
+        """
+        Tiles the player has put on the board but not yet played
+
+        :return: list of (board position, letter, is blank)
+        """
+        return [(tile.board_position, tile.type, False) for tile in self.tiles if tile.board_position is not None]
+
+
+class Placement:
+    # A placement checked against the board, with the words it forms and its score
+    def __init__(self, tiles: List[Tuple[int, str, bool]], across: bool = True,
+                 words: Union[List[Tuple[str, List[int]]], None] = None, score: int = 0,
+                 error: Union[str, None] = None) -> None:
+        """
+
+        :param tiles: placed tiles as (board position, letter, is blank) in board order
+        :param across: True if the main word runs along a row
+        :param words: (word, board positions) for the main word and then each cross word
+        :param score: score of the placement including cross words and the bingo bonus
+        :param error: why the placement is not a legal move, None if it is
+        """
+        self.tiles = tiles
+        self.across = across
+        self.words = words or []
+        self.score = score
+        self.error = error
+
+    @property
+    def valid(self) -> bool:
+        return self.error is None
+
+    @property
+    def word(self) -> str:
+        return self.words[0][0] if self.words else ""
+
 
 class Board:
     # Scrabble Board Class
-    def __init__(self, side_squares: int, triple_words: List[int], double_words: List[int], triple_letters: List[int],
-                 double_letters: List[int]) -> None:
+    def __init__(self, layout: BoardLayout, lexicon: Union[Lexicon, None] = None) -> None:
         """
 
-        :param side_squares: int
-        :param triple_words: list[int]
-        :param double_words: list[int]
-        :param triple_letters: list[int]
-        :param double_letters: list[int]
+        :param layout: BoardLayout with the premium squares and neighbour tables, shared between boards
+        :param lexicon: optional Lexicon, cross checks are only kept up to date when one is set
         """
-        self.side_squares = side_squares
-        self.triple_words = triple_words
-        self.double_words = double_words
-        self.triple_letters = triple_letters
-        self.double_letters = double_letters
-
-        self.board_squares: List[Rectangle] = []
-        self.tiles: List[Tile] = []
+        self.layout = layout
+        self.side_squares = layout.side_squares
+
+        # Flat square arrays indexed by board position, a letter of 0 is an empty square
+        square_count = layout.squares
+        self.letters = bytearray(square_count)
+        self.values = bytearray(square_count)
+        self.blanks = bytearray(square_count)
+        self.tile_count = 0
+
+        # Incremented on every change so views can tell when to refresh
+        self.version = 0
+        self.letter_multipliers = layout.letter_multipliers
+        self.word_multipliers = layout.word_multipliers
+
+        # Empty squares a new word has to cover, kept up to date as tiles are placed and removed
+        self.anchors = bytearray(square_count)
+        self.anchors[layout.start] = 1
+
+        # Letter masks allowed by the perpendicular word on each square, and the value of its tiles
+        # (-1 without one). Across checks constrain words along a row, down checks words along a column
+        self.lexicon: Union[Lexicon, None] = None
+        self.across_checks: List[int] = [LETTER_MASK] * square_count
+        self.down_checks: List[int] = [LETTER_MASK] * square_count
+        self.across_cross_scores: List[int] = [-1] * square_count
+        self.down_cross_scores: List[int] = [-1] * square_count
+
+        if lexicon is not None:
+            self.set_lexicon(lexicon)
 
         self.has_moves: bool = False
         self.legal_moves: List[int] = []
@@ -158,92 +368,215 @@ class Board:
 
         self.current_words: List[str] = []
 
-    def update_board_squares(self, dimensions: Dimensions):
+    @classmethod
+    def standard(cls, lexicon: Union[Lexicon, None] = None) -> "Board":
         """
-        Board squares containing information about board positions, would
-        be updated on window size change
+        Board with the standard 15x15 premium square layout
 
-        :param dimensions: Dimensions
-        :return:
+        :param lexicon: optional Lexicon
+        :return: Board
         """
+        return cls(get_layout(STANDARD_LAYOUT), lexicon)
 
-        # Clears last board squares
-        self.board_squares.clear()
+    def place_tiles(self, tiles: List[Tuple[int, str, bool]]):
+        """
+        Commits tiles to the board, then updates the anchors and the cross checks of the
+        rows and columns they touch
 
-        square_side_length = dimensions.side_length / self.side_squares
+        :param tiles: list of (board position, letter, is blank)
+        :return:
+        """
+        for position, letter, blank in tiles:
+            self.letters[position] = ord(letter)
+            self.values[position] = 0 if blank else TILE_VALUES[ord(letter) - 97]
+            self.blanks[position] = blank
 
-        # Appending each square to list
-        for i in range(self.side_squares):
-            for j in range(self.side_squares):
-                self.board_squares.append(Rectangle(
-                    dimensions.pos_x + j * square_side_length,
-                    dimensions.pos_y + i * square_side_length,
-                    square_side_length,
-                    square_side_length
-                ))
+        self.tile_count += len(tiles)
+        self.version += 1
+        self.update_squares([position for position, _, _ in tiles])
 
-    def draw_board(self, dimensions: Dimensions, render: Render):
+    def remove_tiles(self, positions: List[int]):
         """
-        Draws the board and special scrabble squares
+        Takes committed tiles off the board, undoing place_tiles
 
-        :param dimensions: Dimensions
-        :param render: Render
+        :param positions: list[int] of board positions
         :return:
         """
+        for position in positions:
+            self.letters[position] = 0
+            self.values[position] = 0
+            self.blanks[position] = 0
 
-        # Checks to see if the class has square locations
-        if not self.board_squares:
-            self.update_board_squares(dimensions)
+        self.tile_count -= len(positions)
+        self.version += 1
+        self.update_squares(positions)
 
-        # Draws special squares
-        for square in self.triple_words:
-            draw_rectangle_rec(self.board_squares[square], render.square_colors[0])
+    def get_tile_positions(self) -> List[int]:
+        return [pos for pos, letter in enumerate(self.letters) if letter]
 
-        for square in self.double_words:
-            draw_rectangle_rec(self.board_squares[square], render.square_colors[1])
+    def copy(self) -> "Board":
+        """
+        Copy of the board state for searches, the premium squares are shared
 
-        for square in self.triple_letters:
-            draw_rectangle_rec(self.board_squares[square], render.square_colors[2])
+        :return: Board
+        """
+        board = copy.copy(self)
+        board.letters = bytearray(self.letters)
+        board.values = bytearray(self.values)
+        board.blanks = bytearray(self.blanks)
+        board.anchors = bytearray(self.anchors)
+        board.across_checks = self.across_checks[:]
+        board.down_checks = self.down_checks[:]
+        board.across_cross_scores = self.across_cross_scores[:]
+        board.down_cross_scores = self.down_cross_scores[:]
+        board.legal_moves = []
+        board.movable_tiles = []
+        board.current_words = []
+        return board
+
+    def set_lexicon(self, lexicon: Lexicon):
+        """
+        Sets the lexicon used for cross checks and computes them for the whole board
+
+        :param lexicon: Lexicon
+        :return:
+        """
+        self.lexicon = lexicon
+        for pos in range(len(self.letters)):
+            self.update_cross_check(pos, True)
+            self.update_cross_check(pos, False)
 
-        for square in self.double_letters:
-            draw_rectangle_rec(self.board_squares[square], render.square_colors[3])
+    def get_neighbours(self, pos: int) -> List[int]:
+        """
+        Positions sharing an edge with a position
 
-        # Numbers Board
-        for i, square in enumerate(self.board_squares):
-            draw_text(str(i), square.x + 1, square.y + 1, 10, BLACK)
+        :param pos: int
+        :return: list[int]
+        """
+        return self.layout.neighbours[pos]
 
-        # Draws Border TODO: Fix this implementation
-        square_side_length = dimensions.side_length / self.side_squares
-        for i in range(self.side_squares + 1):
-            start_ver = Vector2(i * square_side_length + dimensions.pos_x, 0 + dimensions.pos_y)
-            end_ver = Vector2(i * square_side_length + dimensions.pos_x, dimensions.side_length + dimensions.pos_y)
-            draw_line_v(start_ver, end_ver, render.border_color)
+    def update_squares(self, changed: List[int]):
+        """
+        Recomputes the anchors around changed positions, and the cross checks along their rows and columns
 
-            start_hor = Vector2(0 + dimensions.pos_x, i * square_side_length + dimensions.pos_y)
-            end_hor = Vector2(dimensions.side_length + dimensions.pos_x, i * square_side_length + dimensions.pos_y)
-            draw_line_v(start_hor, end_hor, render.border_color)
+        :param changed: list[int] of board positions
+        :return:
+        """
+        layout = self.layout
+        neighbours = layout.neighbours
+        start = layout.start
+
+        for pos in changed:
+            for square in [pos] + neighbours[pos]:
+                self.anchors[square] = not self.letters[square] and any(
+                    self.letters[neighbour] for neighbour in neighbours[square])
+
+        # The start square is the only anchor of an empty board
+        if not self.tile_count:
+            self.anchors[start] = 1
+        elif not self.letters[start]:
+            self.anchors[start] = any(self.letters[neighbour] for neighbour in neighbours[start])
+
+        if self.lexicon is None:
+            return
+
+        rows = set(layout.row_of[pos] for pos in changed)
+        cols = set(layout.column_of[pos] for pos in changed)
+
+        # Row words are crossed by column words and the other way round
+        for col in cols:
+            for square in layout.column_squares[col]:
+                self.update_cross_check(square, True)
+        for row in rows:
+            for square in layout.row_squares[row]:
+                self.update_cross_check(square, False)
+
+    def update_cross_check(self, pos: int, across: bool):
+        """
+        Recomputes the cross check of a square for words in one direction
 
-        # Draws board tiles
-        for tile in self.tiles:
-            tile.draw_tile(self.board_squares[tile.board_position], dimensions.side_length / self.side_squares)
+        :param pos: int
+        :param across: True to constrain words along the row of the square
+        :return:
+        """
+        checks = self.across_checks if across else self.down_checks
+        scores = self.across_cross_scores if across else self.down_cross_scores
+
+        if self.letters[pos]:
+            checks[pos] = 0
+            scores[pos] = -1
+            return
+
+        # Tiles before and after the square in the perpendicular direction
+        step = self.side_squares if across else 1
+        start = self.run_end(pos, self.layout.up if across else self.layout.left)
+        end = self.run_end(pos, self.layout.down if across else self.layout.right)
+
+        if start == end:
+            checks[pos] = LETTER_MASK
+            scores[pos] = -1
+            return
+
+        before = self.letters[start:pos:step].decode()
+        after = self.letters[pos + step:end + 1:step].decode()
+        scores[pos] = sum(self.values[start:end + 1:step])
+
+        dawg = self.lexicon.dawg
+        node = dawg.walk(before)
+        mask = 0
+        if node != NO_NODE:
+            for letter, child in dawg.children(node):
+                word_end = dawg.walk(after, child)
+                if word_end != NO_NODE and dawg.nodes[word_end] & TERMINAL_FLAG:
+                    mask |= 1 << letter
+        checks[pos] = mask
+
+    def run_end(self, pos: int, neighbours: List[int]) -> int:
+        """
+        Last square of the unbroken run of tiles next to a position in one direction, the position itself
+        when the next square is empty or off the board
+
+        :param pos: int
+        :param neighbours: neighbour table of the direction, such as BoardLayout.left
+        :return: int
+        """
+        letters = self.letters
+        while neighbours[pos] != NO_SQUARE and letters[neighbours[pos]]:
+            pos = neighbours[pos]
+        return pos
 
-    def draw_circles(self, circle_pos: List[int], color: Color):
+    def invalidate_moves(self):
         """
+        Marks the legal moves and movable tiles as needing to be recomputed
 
-        :param color:
-        :param circle_pos:
         :return:
         """
-        # TODO: why this
-        square_recs = self.board_squares
+        self.has_moves = False
+        self.has_movable_tiles = False
+
+    def is_occupied(self, pos: int) -> bool:
+        """
+        Checks if a board position holds a committed tile, positions off the board are empty
+
+        :param pos: int
+        :return: bool
+        """
+        return 0 <= pos < len(self.letters) and self.letters[pos] != 0
 
-        # Draws a circle at each legal move
-        for move in circle_pos:
-            draw_circle(square_recs[move].x + square_recs[move].width / 2,
-                        square_recs[move].y + square_recs[move].height / 2,
-                        5,
-                        color)
+    def get_letter_grid(self, player: Player) -> bytearray:
+        """
+        Copy of the board letters with the players uncommitted tiles added
 
+        :param player: Player
+        :return: bytearray
+        """
+        grid = bytearray(self.letters)
+        for tile in player.tiles:
+            if tile.board_position is not None:
+                grid[tile.board_position] = ord(tile.type)
+        return grid
+
+    @PROFILER.timed("get_legal_moves")
     def get_legal_moves(self, player: Player) -> List[int]:
         """
         Appends the legal scrabble moves into a list, does not check if the word is valid
@@ -252,6 +585,8 @@ class Board:
         :return: list[int]
         """
 
+        layout = self.layout
+
         def add_all(moves: List[int], pos: int):
             """
 
@@ -270,8 +605,8 @@ class Board:
             :param pos: int
             :return: list[int]
             """
-            moves.append(pos + self.side_squares)
-            moves.append(pos - self.side_squares)
+            moves.append(layout.down[pos])
+            moves.append(layout.up[pos])
             return moves
 
         def add_left_right(moves: List[int], pos: int):
@@ -281,45 +616,43 @@ class Board:
             :param pos: int
             :return: list[int]
             """
-            moves.append(pos + 1)
-            moves.append(pos - 1)
+            moves.append(layout.right[pos])
+            moves.append(layout.left[pos])
             return moves
 
         def get_touching_pos(pos: int):
+            # Occupied neighbours with the tables stepping away from pos through them and back past pos
             touching = []
 
-            for tile in self.tiles:
-                if tile.board_position == pos + 1:
-                    touching.append(tile.board_position)
-                if tile.board_position == pos - 1:
-                    touching.append(tile.board_position)
-                if tile.board_position == pos - self.side_squares:
-                    touching.append(tile.board_position)
-                if tile.board_position == pos + self.side_squares:
-                    touching.append(tile.board_position)
+            for forward, backward in ((layout.right, layout.left), (layout.left, layout.right),
+                                      (layout.up, layout.down), (layout.down, layout.up)):
+                if self.is_occupied(forward[pos]):
+                    touching.append((forward[pos], forward, backward))
 
             return touching
 
         valid_moves = []
 
         player_tiles_count = len([tile for tile in player.tiles if tile.board_position is not None])
-        board_tiles_count = len(self.tiles)
+        board_tiles_count = self.tile_count
 
         # If there is no tiles on the board
-        if len(self.tiles) + len([tile for tile in player.tiles if tile.board_position is not None]) == 0:
+        if self.tile_count + len([tile for tile in player.tiles if tile.board_position is not None]) == 0:
             self.has_moves = True
-            return [int((self.side_squares * self.side_squares - 1) / 2)]
+            return [layout.start]
 
         # If there is no tiles on the board that the current player has played
         elif len([tile for tile in player.tiles if tile.board_position is not None]) == 0:
-            for tile in self.tiles:
-                valid_moves = add_all(valid_moves, tile.board_position)
+            for tile_position in self.get_tile_positions():
+                valid_moves = add_all(valid_moves, tile_position)
 
         # If there is player tiles on the board
         else:
             player_tiles = [tile for tile in player.tiles if tile.board_position is not None]
-            player_tile_board_pos = [tile.board_position for tile in player.tiles if tile.board_position is not None]
-            board_tiles = [tile.board_position for tile in self.tiles if tile.board_position is not None]
+            grid = self.get_letter_grid(player)
+
+            def is_filled(pos: int) -> bool:
+                return 0 <= pos < len(grid) and grid[pos] != 0
 
             # If there is no other board tiles
             if board_tiles_count == 0 and player_tiles_count == 1:
@@ -330,208 +663,180 @@ class Board:
                     if player_tiles[0].board_position is not None:
                         touching_list = get_touching_pos(player_tiles[0].board_position)
 
-                        for touch in touching_list:
-                            valid_moves.append(touch + (touch - player_tiles[0].board_position))
-                            valid_moves.append(
-                                player_tiles[0].board_position - (touch - player_tiles[0].board_position))
+                        for touch, forward, backward in touching_list:
+                            valid_moves.append(forward[touch])
+                            valid_moves.append(backward[player_tiles[0].board_position])
                 else:
-                    if (player_tiles[0].board_position - player_tiles[1].board_position) % self.side_squares == 0:
-                        current_pos = player_tiles[0].board_position
-                        while current_pos + self.side_squares in player_tile_board_pos or current_pos + self.side_squares in board_tiles:
-                            current_pos += self.side_squares
+                    first, second = player_tiles[0].board_position, player_tiles[1].board_position
+                    if layout.column_of[first] == layout.column_of[second]:
+                        current_pos = first
+                        while is_filled(layout.down[current_pos]):
+                            current_pos = layout.down[current_pos]
                         valid_moves = add_up_down(valid_moves, current_pos)
 
-                        current_pos = player_tiles[0].board_position
-                        while current_pos - self.side_squares in player_tile_board_pos or current_pos - self.side_squares in board_tiles:
-                            current_pos -= self.side_squares
+                        current_pos = first
+                        while is_filled(layout.up[current_pos]):
+                            current_pos = layout.up[current_pos]
                         valid_moves = add_up_down(valid_moves, current_pos)
 
                     else:
-                        current_pos = player_tiles[0].board_position
-                        while current_pos + 1 in player_tile_board_pos or current_pos + 1 in board_tiles:
-                            current_pos += 1
+                        current_pos = first
+                        while is_filled(layout.right[current_pos]):
+                            current_pos = layout.right[current_pos]
                         valid_moves = add_left_right(valid_moves, current_pos)
 
-                        current_pos = player_tiles[0].board_position
-                        while current_pos - 1 in player_tile_board_pos or current_pos - 1 in board_tiles:
-                            current_pos -= 1
+                        current_pos = first
+                        while is_filled(layout.left[current_pos]):
+                            current_pos = layout.left[current_pos]
                         valid_moves = add_left_right(valid_moves, current_pos)
 
         # Removing illegal moves
-        taken_squares = []
-        for tile in player.tiles:
-            if tile.board_position is not None:
-                taken_squares.append(tile.board_position)
-
-        for tile in self.tiles:
-            taken_squares.append(tile.board_position)
+        taken_squares = set(tile.board_position for tile in player.tiles if tile.board_position is not None)
 
-        # Checking if valid move has a tile on it
-        valid_moves = [v for v in valid_moves if v not in taken_squares]
+        # Checking if valid move is off the board or has a tile on it
+        valid_moves = [v for v in valid_moves
+                       if v != NO_SQUARE and v not in taken_squares and not self.is_occupied(v)]
 
         self.has_moves = True
 
         return valid_moves
 
+    @PROFILER.timed("get_movable_tiles")
     def get_movable_tiles(self, player: Player):
         if not self.has_moves:
             self.legal_moves = self.get_legal_moves(player)
 
-        player_tiles = [tile.board_position for tile in player.tiles if tile.board_position is not None]
+        self.has_movable_tiles = True
+
+        player_tiles = set(tile.board_position for tile in player.tiles if tile.board_position is not None)
         touching = []
 
         for legal_move in self.legal_moves:
-            if legal_move + 1 in player_tiles:
-                touching.append(legal_move + 1)
-            if legal_move - 1 in player_tiles:
-                touching.append(legal_move - 1)
-            if legal_move - self.side_squares in player_tiles:
-                touching.append(legal_move - self.side_squares)
-            if legal_move + self.side_squares in player_tiles:
-                touching.append(legal_move + self.side_squares)
+            for neighbour in self.layout.neighbours[legal_move]:
+                if neighbour in player_tiles:
+                    touching.append(neighbour)
 
         return touching
 
-    def get_current_words(self, player: Player):
-        player_tile_pos = [tile.board_position for tile in player.tiles if tile.board_position is not None]
-        player_tile_let = [tile.type for tile in player.tiles if tile.board_position is not None]
-
-        board_tile_pos = [tile.board_position for tile in self.tiles if tile.board_position is not None]
-        board_tile_val = [tile.type for tile in self.tiles if tile.board_position is not None]
-
-        if not board_tile_pos:
-            sort = sorted(zip(player_tile_pos, player_tile_let), key=lambda pair: pair[0])
-            word = "".join([x for _, x in sort])
-
-            return [word]
-        else:
-            tile_pos = player_tile_pos + board_tile_pos
-            tile_val = player_tile_let + board_tile_val
-
-            word_rows = []
-            word_cols = []
-
-            for pos in player_tile_pos:
-                if pos + 1 in board_tile_pos:
-                    word_rows.append(int(pos / self.side_squares))
-                if pos - 1 in board_tile_pos:
-                    word_rows.append(int(pos / self.side_squares))
-                if pos + self.side_squares in board_tile_pos:
-                    word_cols.append(pos % self.side_squares)
-                if pos - self.side_squares in board_tile_pos:
-                    word_cols.append(pos % self.side_squares)
-
-            word_rows = set(word_rows)
-            word_cols = set(word_cols)
-
-            words = []
-
-            for row in word_rows:
-                word = []
-                word_pos = []
-
-                pivot = None
-                for pos in player_tile_pos:
-                    if int(pos / self.side_squares) == row:
-                        pivot = pos
-                        break
-
-                word.append(player_tile_let[player_tile_pos.index(pivot)])
-                word_pos.append(pivot)
-                if pivot is not None:
-                    current = pivot + 1
-                    while current in tile_pos:
-                        word.append(tile_val[tile_pos.index(current)])
-                        word_pos.append(current)
-                        current += 1
-
-                    current = pivot - 1
-                    while current in tile_pos:
-                        word.append(tile_val[tile_pos.index(current)])
-                        word_pos.append(current)
-                        current -= 1
-
-                sort = sorted(zip(word_pos, word), key=lambda pair: pair[0])
-                word = "".join([x for _, x in sort])
-
-                words.append(word)
-
-            for col in word_cols:
-                word = []
-                word_pos = []
-
-                pivot = None
-                for pos in player_tile_pos:
-                    if int(pos % self.side_squares) == col:
-                        pivot = pos
-                        break
-
-                word.append(player_tile_let[player_tile_pos.index(pivot)])
-                word_pos.append(pivot)
-                if pivot is not None:
-                    current = pivot + self.side_squares
-                    while current in tile_pos:
-                        word.append(tile_val[tile_pos.index(current)])
-                        word_pos.append(current)
-                        current += self.side_squares
-
-                    current = pivot - self.side_squares
-                    while current in tile_pos:
-                        word.append(tile_val[tile_pos.index(current)])
-                        word_pos.append(current)
-                        current -= self.side_squares
-
-                sort = sorted(zip(word_pos, word), key=lambda pair: pair[0])
-                word = "".join([x for _, x in sort])
-
-                words.append(word)
-
-            return words
-
-    def draw_player_pieces(self, dimensions: Dimensions, players: List[Player]):
-        """
-
-        :param dimensions: Dimensions
-        :param players: list[Player]
-        :return:
+    @PROFILER.timed("get_current_words")
+    def get_current_words(self, player: Player) -> List[str]:
         """
+        Main word and cross words formed by the tiles the player has put on the board, empty while
+        they are not in one unbroken line
 
-        # Draws the players pieces at each side of the board
-        for player_num, player in enumerate(players):
-            tile_positions = self.get_player_tile_rec(dimensions, player_num)
-            for i, tile in enumerate(player.tiles):
-                if tile.rack_position is not None:
-                    tile.draw_tile(tile_positions[tile.rack_position], dimensions.side_length / self.side_squares)
-                if tile.board_position is not None:
-                    tile.draw_tile(self.board_squares[tile.board_position], dimensions.side_length / self.side_squares)
-
-    @staticmethod
-    def get_player_tile_rec(dimensions: Dimensions, player_number) -> List[Rectangle]:
+        :param player: Player
+        :return: list[str]
         """
-        Gets the players tile positions in a convenience method
+        return [word for word, _ in self.check_placement(player.placed_tiles()).words]
 
-        :param dimensions: Dimensions
-        :param player_number: int
-        :return: list[Rectangle]
+    def check_placement(self, tiles: List[Tuple[int, str, bool]]) -> Placement:
         """
+        Checks a placement in one pass along its line. The tiles must be on empty squares in one unbroken
+        line that touches the board, or covers the start square on the first move. The main word and the
+        cross word of every placed tile are read and scored on the way, and looked up in the lexicon when
+        the board has one.
 
-        # Top left corner
-        top_left_x = dimensions.pos_x + dimensions.side_length / 2 - dimensions.side_length / 15 * 3.5
-
-        # Offset TODO: somewhere else?
-        y_offset = 20
-
-        # TODO: Fix this
-        if player_number == 1:
-            top_left_y = dimensions.pos_y - dimensions.side_length / 15 - y_offset
+        :param tiles: list of (board position, letter, is blank)
+        :return: Placement, with the error set if it is not a legal move
+        """
+        n = self.side_squares
+        layout = self.layout
+        letters = self.letters
+        placement = Placement(sorted(tiles))
+        if not tiles:
+            placement.error = "No tiles were placed"
+            return placement
+
+        placed = {}
+        for position, letter, blank in placement.tiles:
+            if not 0 <= position < len(letters):
+                placement.error = "Square {} is off the board".format(position)
+                return placement
+            if letters[position] or position in placed:
+                placement.error = "Square {} is already taken".format(position)
+                return placement
+            placed[position] = (letter, 0 if blank or letter == BLANK else TILE_VALUES[ord(letter) - 97])
+
+        first = placement.tiles[0][0]
+        last = placement.tiles[-1][0]
+
+        # A single tile runs along the row when it touches a tile in that row
+        if len(tiles) == 1:
+            across = self.is_occupied(layout.left[first]) or self.is_occupied(layout.right[first])
+        elif layout.row_of[last] == layout.row_of[first]:
+            across = True
+        elif layout.column_of[last] == layout.column_of[first]:
+            across = False
         else:
-            top_left_y = dimensions.pos_y + dimensions.side_length + y_offset
-
-        # Append tile positions into list
-        tile_positions = []
-        for i in range(7):
-            rec = Rectangle(top_left_x + i * dimensions.side_length / 15, top_left_y, dimensions.side_length / 15,
-                            dimensions.side_length / 15)
-            tile_positions.append(rec)
-
-        return tile_positions
+            placement.error = "The tiles are not in one line"
+            return placement
+        placement.across = across
+
+        step = 1 if across else n
+        cross_step = n if across else 1
+        cross_previous = layout.up if across else layout.left
+        cross_following = layout.down if across else layout.right
+
+        start = self.run_end(first, layout.left if across else layout.up)
+        end = self.run_end(last, layout.right if across else layout.down)
+
+        word = []
+        touches = False
+        main_score = 0
+        main_multiplier = 1
+        cross_total = 0
+        cross_words = []
+        visited = 0
+        for pos in range(start, end + step, step):
+            if pos in placed:
+                visited += 1
+                letter, value = placed[pos]
+                main_score += value * self.letter_multipliers[pos]
+                main_multiplier *= self.word_multipliers[pos]
+
+                # Cross word through the placed tile, only committed tiles lie across the line
+                cross_start = self.run_end(pos, cross_previous)
+                cross_end = self.run_end(pos, cross_following)
+
+                if cross_start != cross_end:
+                    cross_word = (letters[cross_start:pos:cross_step].decode() + letter +
+                                  letters[pos + cross_step:cross_end + 1:cross_step].decode())
+                    cross_words.append((cross_word, list(range(cross_start, cross_end + 1, cross_step))))
+                    cross_score = sum(self.values[cross_start:cross_end + 1:cross_step])
+                    cross_total += (cross_score + value * self.letter_multipliers[pos]) * self.word_multipliers[pos]
+            elif letters[pos]:
+                letter = chr(letters[pos])
+                main_score += self.values[pos]
+                touches = True
+            else:
+                placement.error = "The tiles are not in one unbroken line"
+                return placement
+            word.append(letter)
+
+        # The first and last tiles set the line, every other tile has to be on it too
+        if visited != len(placed):
+            placement.error = "The tiles are not in one line"
+            return placement
+
+        if len(word) < 2:
+            placement.error = "A word needs at least two letters"
+            return placement
+
+        placement.words = [("".join(word), list(range(start, end + step, step)))] + cross_words
+        placement.score = main_score * main_multiplier + cross_total + (BINGO_BONUS if len(tiles) == RACK_SIZE else 0)
+
+        if not self.tile_count:
+            if layout.start not in placed:
+                placement.error = "The first word must cover the start square"
+                return placement
+        elif not touches and not cross_words:
+            placement.error = "The word must touch the tiles on the board"
+            return placement
+
+        if self.lexicon is not None:
+            for placed_word, _ in placement.words:
+                if placed_word not in self.lexicon:
+                    placement.error = "{} is not a word".format(placed_word.upper())
+                    break
+
+        return placement
@@ -0,0 +1,457 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from typing import Dict, List, Tuple, Union
+
+from Modules.Game import EXCHANGE, MOVE, PASS, Game
+from Modules.Lexicon import Lexicon
+from Modules.MoveGenerator import Move
+from Modules.Scrabble import SEED_MASK, derive_seed
+from Modules.Tournament import BOTS, check_bot_files
+
+# Seat taken by a connected player rather than a bot
+HUMAN = "human"
+
+# Longest message line a client may send
+MAX_MESSAGE = 64 * 1024
+
+# Unsent bytes a connection may fall behind by before it is dropped as too slow
+MAX_BACKLOG = 1024 * 1024
+
+# Lexicon and bots of a worker process, bots are built on first use and reseeded per turn
+_worker_lexicon: Union[Lexicon, None] = None
+_worker_bots: Dict[str, object] = {}
+
+
+def _init_worker(word_path: str):
+    global _worker_lexicon
+    _worker_lexicon = Lexicon.from_file(word_path)
+
+
+def bot_turn(bot_name: str, game: Game, seed: int) -> Tuple[str, Union[Move, None], str]:
+    """
+    Chooses a bots turn in a worker process by playing it on a copy of the game
+
+    :param bot_name: name of a tournament bot
+    :param game: copy of the game at the bots turn, with its history for bots that read the earlier turns
+    :param seed: seed of the bots random choices for this turn
+    :return: (action, move, exchanged letters)
+    """
+    bot = _worker_bots.get(bot_name)
+    if bot is None:
+        bot = _worker_bots[bot_name] = BOTS[bot_name](_worker_lexicon, seed=seed)
+    bot.rng.seed(seed)
+
+    bot.take_turn(game)
+    turn = game.history[-1]
+    return turn.action, turn.move, turn.letters
+
+
+def _serve_calls(connection: Connection, word_path: str):
+    """
+    Main loop of a worker process, runs the calls sent down the pipe one at a time until it closes
+
+    :param connection: worker end of the pipe
+    :param word_path: word file
+    :return:
+    """
+    _init_worker(word_path)
+    while True:
+        try:
+            function, args = connection.recv()
+        except EOFError:
+            return
+
+        try:
+            connection.send((True, function(*args)))
+        except Exception as error:
+            # Errors that do not pickle are sent as their description
+            try:
+                connection.send((False, error))
+            except Exception:
+                connection.send((False, RuntimeError(repr(error))))
+
+
+class BotWorker:
+    # A worker process for bot turns with a pipe to it. A turn stuck past its timeout is stopped by
+    # terminating its own worker, so turns of other games running in other workers carry on.
+    def __init__(self, word_path: str) -> None:
+        """
+
+        :param word_path: word file
+        """
+        self.connection, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_serve_calls, args=(child, word_path), daemon=True)
+        self.process.start()
+        child.close()
+
+    def call(self, function, *args):
+        """
+        Runs a function in the worker and waits for it, raising what it raised
+
+        :param function: module level function
+        :param args: picklable arguments
+        :return: the functions result
+        """
+        self.connection.send((function, args))
+        succeeded, result = self.connection.recv()
+        if not succeeded:
+            raise result
+        return result
+
+    def stop(self):
+        # A thread waiting on the pipe sees it close once the process is gone, and closes it when done
+        self.process.terminate()
+        self.process.join()
+
+
+class HostedGame:
+    # A game on the server with what sits in each seat and the connections following it
+    def __init__(self, game_id: int, game: Game, seats: List[str]) -> None:
+        """
+
+        :param game_id: int
+        :param game: Game
+        :param seats: HUMAN or a bot name per seat
+        """
+        self.game_id = game_id
+        self.game = game
+        self.seats = seats
+
+        # Connection to the seat it plays, None for spectators
+        self.watchers: Dict[asyncio.StreamWriter, Union[int, None]] = {}
+
+        # Turns are applied one at a time
+        self.lock = asyncio.Lock()
+        self.bot_task: Union[asyncio.Task, None] = None
+
+    def state(self, seat: Union[int, None]) -> Dict:
+        """
+        The game as seen from a seat, other players racks stay hidden
+
+        :param seat: int, None for a spectator
+        :return: dict message
+        """
+        game = self.game
+        board = game.board
+        last = None
+        if game.history:
+            turn = game.history[-1]
+            last = {"player": turn.player, "action": turn.action, "score": turn.score, "letters": turn.letters,
+                    "tiles": turn.move.tiles if turn.move is not None else []}
+
+        return {
+            "type": "state",
+            "game": self.game_id,
+            "seed": game.seed,
+            "seats": self.seats,
+            "seat": seat,
+            "turn": game.turn,
+            "scores": [player.score for player in game.players],
+            "bag": len(game.tile_bag),
+            "tiles": [[pos, chr(board.letters[pos]), bool(board.blanks[pos])] for pos in board.get_tile_positions()],
+            "rack": "".join(game.players[seat].rack_letters()) if seat is not None else "",
+            "last": last,
+            "over": game.is_over(),
+        }
+
+
+class GameServer:
+    # Hosts many games at once over newline delimited JSON on a TCP socket. Bot turns run in worker
+    # processes, so the event loop only routes messages and checks human moves, which take microseconds.
+    def __init__(self, word_path: str, workers: Union[int, None] = None, turn_timeout: float = 10.0,
+                 max_games: int = 1000) -> None:
+        """
+
+        :param word_path: word file
+        :param workers: processes for bot turns, defaults to one per core
+        :param turn_timeout: seconds a bot turn may take once started, a bot that runs over passes
+        :param max_games: most games hosted at once, finished games are removed when their last
+                          connection leaves
+        """
+        # Compile the lexicon once up front so the workers only map it
+        self.lexicon = Lexicon.from_file(word_path)
+        self.workers = workers or os.cpu_count() or 1
+        self.word_path = word_path
+        self.idle = [BotWorker(word_path) for _ in range(self.workers)]
+        self.busy: List[BotWorker] = []
+
+        # Threads waiting on the worker pipes, one per worker so a turn never queues for a thread
+        self.waiters = ThreadPoolExecutor(max_workers=self.workers)
+        self.turn_timeout = turn_timeout
+        self.max_games = max_games
+
+        self.games: Dict[int, HostedGame] = {}
+        self.next_id = 1
+        self.rng = random.Random()
+
+        # Turns wait here for an idle worker, so the timeout only counts time spent working. Made on first
+        # use, inside the event loop it belongs to.
+        self.slots: Union[asyncio.Semaphore, None] = None
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765):
+        """
+        Accepts connections until cancelled
+
+        :param host: str
+        :param port: int
+        :return:
+        """
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_MESSAGE)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Stops the bot turns and shuts down the worker processes
+
+        :return:
+        """
+        for hosted in self.games.values():
+            if hosted.bot_task is not None:
+                hosted.bot_task.cancel()
+        for worker in self.idle + self.busy:
+            worker.stop()
+        self.idle = []
+        self.busy = []
+        self.waiters.shutdown()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Answers the messages of one connection in order, every message gets exactly one reply
+
+        :param reader: asyncio.StreamReader
+        :param writer: asyncio.StreamWriter
+        :return:
+        """
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+                    break
+                if not line:
+                    break
+
+                try:
+                    reply = await self.handle(json.loads(line), writer)
+                except (ValueError, KeyError, TypeError, IndexError) as error:
+                    reply = {"type": "error", "message": str(error)}
+                self.send(writer, reply)
+        finally:
+            for game_id, hosted in list(self.games.items()):
+                hosted.watchers.pop(writer, None)
+                if hosted.game.is_over() and not hosted.watchers:
+                    del self.games[game_id]
+            writer.close()
+
+    async def handle(self, message: Dict, writer: asyncio.StreamWriter) -> Dict:
+        """
+        Handles one client message
+
+        :param message: dict with a "type" of create, join, leave, state, list, move, exchange or pass
+        :param writer: connection the message came from
+        :return: dict reply
+        """
+        kind = message["type"]
+
+        if kind == "create":
+            return self.create(message["seats"], message.get("seed"))
+        if kind == "list":
+            return {"type": "games", "games": [{"game": hosted.game_id, "seats": hosted.seats,
+                                                "over": hosted.game.is_over()} for hosted in self.games.values()]}
+
+        hosted = self.games.get(message["game"])
+        if hosted is None:
+            raise ValueError("No game {}".format(message["game"]))
+
+        if kind == "join":
+            seat = message.get("seat")
+            if seat is not None:
+                if not 0 <= seat < len(hosted.seats):
+                    raise ValueError("No seat {}".format(seat))
+                if hosted.seats[seat] != HUMAN:
+                    raise ValueError("Seat {} is played by a bot".format(seat))
+                if seat in hosted.watchers.values():
+                    raise ValueError("Seat {} is taken".format(seat))
+            hosted.watchers[writer] = seat
+            return hosted.state(seat)
+        if kind == "leave":
+            hosted.watchers.pop(writer, None)
+            return {"type": "left", "game": hosted.game_id}
+        if kind == "state":
+            return hosted.state(hosted.watchers.get(writer))
+        if kind in (MOVE, EXCHANGE, PASS):
+            return await self.human_turn(hosted, writer, message)
+
+        raise ValueError("Unknown message type {}".format(kind))
+
+    def create(self, seats: List[str], seed: Union[int, None] = None) -> Dict:
+        """
+        Starts a game, bots move as soon as it is their turn
+
+        :param seats: HUMAN or a bot name per seat
+        :param seed: seed of the game, a random one by default so every game can be played again
+        :return: dict reply
+        """
+        if len(self.games) >= self.max_games:
+            raise ValueError("The server is full")
+        if not 2 <= len(seats) <= 4:
+            raise ValueError("A game needs 2 to 4 seats")
+        for seat in seats:
+            if seat != HUMAN and seat not in BOTS:
+                raise ValueError("Unknown seat {}, choose {} or one of {}".format(seat, HUMAN, ", ".join(BOTS)))
+            if seat != HUMAN:
+                check_bot_files(seat)
+
+        seed = self.rng.getrandbits(63) if seed is None else seed & SEED_MASK
+        hosted = HostedGame(self.next_id, Game(self.lexicon, len(seats), seed), seats)
+        self.games[hosted.game_id] = hosted
+        self.next_id += 1
+
+        self.schedule_bots(hosted)
+        return {"type": "created", "game": hosted.game_id, "seed": seed}
+
+    async def human_turn(self, hosted: HostedGame, writer: asyncio.StreamWriter, message: Dict) -> Dict:
+        """
+        Applies a move, exchange or pass from the connection playing the current seat
+
+        :param hosted: HostedGame
+        :param writer: connection the turn came from
+        :param message: dict, "tiles" as [position, letter, is blank] for a move, "letters" for an exchange
+        :return: dict reply
+        """
+        async with hosted.lock:
+            game = hosted.game
+            if game.is_over():
+                raise ValueError("The game is over")
+            if hosted.watchers.get(writer) != game.turn or hosted.seats[game.turn] != HUMAN:
+                raise ValueError("It is not your turn")
+
+            kind = message["type"]
+            if kind == MOVE:
+                tiles = [(int(pos), str(letter).lower(), bool(blank)) for pos, letter, blank in message["tiles"]]
+                placement = game.board.check_placement(tiles)
+                if not placement.valid:
+                    raise ValueError(placement.error)
+                game.apply_move(Move(placement.tiles, placement.word, placement.score, placement.across))
+            elif kind == EXCHANGE:
+                game.exchange(list(str(message["letters"]).lower()))
+            else:
+                game.pass_turn()
+
+            self.broadcast(hosted)
+
+        self.schedule_bots(hosted)
+        return {"type": "ok", "game": hosted.game_id}
+
+    def schedule_bots(self, hosted: HostedGame):
+        # One task per game plays bot turns until a human is to move
+        if hosted.bot_task is None or hosted.bot_task.done():
+            if not hosted.game.is_over() and hosted.seats[hosted.game.turn] != HUMAN:
+                hosted.bot_task = asyncio.get_running_loop().create_task(self.play_bots(hosted))
+
+    async def play_bots(self, hosted: HostedGame):
+        """
+        Plays bot turns in the worker processes until a human is to move or the game is over
+
+        :param hosted: HostedGame
+        :return:
+        """
+        game = hosted.game
+        while not game.is_over() and hosted.seats[game.turn] != HUMAN:
+            async with hosted.lock:
+                seat = game.turn
+                seed = derive_seed(game.seed, seat, len(game.history))
+
+                # The copy keeps the history, bots such as the simulation bot infer racks from earlier turns
+                state = game.copy()
+                state.history = list(game.history)
+                failure = None
+                try:
+                    action, move, letters = await self.run_in_worker(bot_turn, hosted.seats[seat], state, seed)
+                    if action == MOVE:
+                        game.apply_move(move)
+                    elif action == EXCHANGE:
+                        game.exchange(list(letters))
+                    else:
+                        game.pass_turn()
+                except asyncio.TimeoutError:
+                    game.pass_turn()
+                except Exception as error:
+                    # A failed bot passes so the game goes on, and the players are told why after the new state
+                    failure = "The bot in seat {} failed and passed: {!r}".format(seat, error)
+                    game.pass_turn()
+
+                self.broadcast(hosted)
+                if failure is not None:
+                    self.broadcast_message(hosted, {"type": "bot_error", "game": hosted.game_id, "message": failure})
+
+            if not hosted.watchers and game.is_over():
+                self.games.pop(hosted.game_id, None)
+
+    async def run_in_worker(self, function, *args):
+        """
+        Runs a function in an idle worker process, waiting for one before the timeout starts. A worker
+        that times out or dies is replaced, and the others are left alone.
+
+        :param function: module level function
+        :param args: picklable arguments
+        :return: the functions result
+        """
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.workers)
+
+        async with self.slots:
+            worker = self.idle.pop()
+            self.busy.append(worker)
+            try:
+                future = asyncio.get_running_loop().run_in_executor(self.waiters, worker.call, function, *args)
+                return await asyncio.wait_for(future, self.turn_timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError, Exception) as error:
+                # A worker still running the turn or no longer running at all is replaced, errors the
+                # function raised leave it as it is
+                stuck = isinstance(error, (asyncio.TimeoutError, asyncio.CancelledError))
+                if stuck or not worker.process.is_alive():
+                    worker.stop()
+                    if worker in self.busy:
+                        self.busy[self.busy.index(worker)] = worker = BotWorker(self.word_path)
+                raise
+            finally:
+                # The server may have closed while the turn ran
+                if worker in self.busy:
+                    self.busy.remove(worker)
+                    self.idle.append(worker)
+
+    def broadcast(self, hosted: HostedGame):
+        # Every connection following the game gets the new state from its own seat
+        for writer, seat in list(hosted.watchers.items()):
+            self.send(writer, hosted.state(seat))
+
+    def broadcast_message(self, hosted: HostedGame, message: Dict):
+        # Messages that are not replies, such as a bot failing, go to every connection following the game
+        for writer in list(hosted.watchers):
+            self.send(writer, message)
+
+    @staticmethod
+    def send(writer: asyncio.StreamWriter, message: Dict):
+        """
+        Queues a message without waiting on the client, a client too far behind is disconnected
+
+        :param writer: asyncio.StreamWriter
+        :param message: dict
+        :return:
+        """
+        if writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > MAX_BACKLOG:
+            writer.close()
+            return
+        writer.write(json.dumps(message).encode() + b"\n")
@@ -0,0 +1,286 @@
+import pickle
+import random
+import struct
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Tuple, Union
+
+import numpy as np
+
+from Modules.Game import Game
+from Modules.Layouts import BoardLayout
+from Modules.Lexicon import Lexicon
+from Modules.Scrabble import RACK_SLOTS, SEED_MASK
+
+# Block layout: header, the pickled lexicon and board layout, the player and square arrays, then a
+# payload of per turn data such as candidate moves. The header holds the magic, layout version,
+# sequence, side squares, players, turn, scoreless turns, finished, has seed, seed, tile count, board
+# version, lexicon and layout bytes and payload bytes.
+STATE_MAGIC = b"GMST"
+STATE_VERSION = 2
+STATE_HEADER = struct.Struct("=4sIQIIIIIIqIIII")
+
+# Offset of the sequence counter, odd while a position is being written
+SEQUENCE_OFFSET = 8
+
+# Room for the payload in a new block
+PAYLOAD_SIZE = 1 << 20
+
+# Blocks a worker process keeps attached, the least recently used is closed first
+MAX_ATTACHED = 16
+
+# Shared blocks attached by this process and their last read position, by block name
+_attached: Dict[str, "SharedGameState"] = {}
+
+# Square arrays of a block as (name, dtype), each one entry per square
+SQUARE_ARRAYS = [
+    ("letters", np.uint8),
+    ("values", np.uint8),
+    ("blanks", np.uint8),
+    ("anchors", np.uint8),
+    ("across_checks", np.uint32),
+    ("down_checks", np.uint32),
+    ("across_cross_scores", np.int32),
+    ("down_cross_scores", np.int32),
+]
+
+
+class SharedGameState:
+    # A game position in a shared memory block. The process running the game publishes each position
+    # and workers attach once by name, then rebuild the position from the arrays when the sequence
+    # counter changes, so a task only has to carry the block name.
+    def __init__(self, memory: SharedMemory, owner: bool) -> None:
+        """
+
+        :param memory: SharedMemory holding the block
+        :param owner: True for the process that created the block and unlinks it
+        """
+        self.memory = memory
+        self.owner = owner
+
+        magic, layout_version, _, side_squares, player_count = STATE_HEADER.unpack_from(memory.buf)[:5]
+        if magic != STATE_MAGIC or layout_version != STATE_VERSION:
+            raise ValueError("{} is not a shared game state block".format(memory.name))
+        self.side_squares = side_squares
+        self.player_count = player_count
+        self.arrays, self.payload_offset = self._map_arrays()
+
+        # Position rebuilt from the block, kept until the sequence changes
+        self.lexicon: Union[Lexicon, None] = None
+        self.layout: Union[BoardLayout, None] = None
+        self.template: Union[Game, None] = None
+        self.sequence = -1
+        self.game: Union[Game, None] = None
+        self.payload = None
+
+    @classmethod
+    def create(cls, game: Game, payload_size: int = PAYLOAD_SIZE) -> "SharedGameState":
+        """
+        Allocates a block shaped for a game and publishes its position
+
+        :param game: Game
+        :param payload_size: most bytes of per turn payload
+        :return: SharedGameState
+        """
+        lexicon = pickle.dumps((game.lexicon, game.board.layout))
+        squares = game.board.side_squares ** 2
+        size = cls.array_offset(len(lexicon)) + sum(squares * np.dtype(dtype).itemsize for _, dtype in SQUARE_ARRAYS)
+        size += RACK_SLOTS + len(game.players) * (RACK_SLOTS + 8) + payload_size
+
+        memory = SharedMemory(create=True, size=size)
+        STATE_HEADER.pack_into(memory.buf, 0, STATE_MAGIC, STATE_VERSION, 0, game.board.side_squares,
+                               len(game.players), 0, 0, 0, 0, 0, 0, 0, len(lexicon), 0)
+        memory.buf[STATE_HEADER.size:STATE_HEADER.size + len(lexicon)] = lexicon
+
+        state = cls(memory, True)
+        state.layout = game.board.layout
+        state.publish(game)
+        return state
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedGameState":
+        """
+        Attaches to a block by name, once per process. Workers should be started after the owner creates
+        its first block, so they share its resource tracker rather than starting one that frees the block.
+
+        :param name: block name
+        :return: SharedGameState
+        """
+        state = _attached.pop(name, None)
+        if state is None:
+            state = cls(SharedMemory(name=name), False)
+            if len(_attached) >= MAX_ATTACHED:
+                _attached.pop(next(iter(_attached))).close()
+        _attached[name] = state
+        return state
+
+    @staticmethod
+    def array_offset(lexicon_size: int) -> int:
+        # Arrays start on an 8 byte boundary after the header and lexicon
+        return (STATE_HEADER.size + lexicon_size + 7) & ~7
+
+    @property
+    def name(self) -> str:
+        return self.memory.name
+
+    def _map_arrays(self) -> Tuple[Dict[str, np.ndarray], int]:
+        """
+        Numpy views of the arrays in the block
+
+        :return: (dict of name to array, offset of the payload)
+        """
+        buffer = self.memory.buf
+        lexicon_size = STATE_HEADER.unpack_from(buffer)[12]
+        squares = self.side_squares ** 2
+        offset = self.array_offset(lexicon_size)
+
+        arrays = {}
+        shapes = [(name, dtype, squares) for name, dtype in SQUARE_ARRAYS]
+        shapes += [("bag", np.uint8, RACK_SLOTS), ("racks", np.uint8, self.player_count * RACK_SLOTS)]
+        # Wider arrays first so they stay aligned
+        shapes.sort(key=lambda shape: -np.dtype(shape[1]).itemsize)
+        shapes.insert(0, ("scores", np.int64, self.player_count))
+        for name, dtype, count in shapes:
+            arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+            offset += count * np.dtype(dtype).itemsize
+        arrays["racks"] = arrays["racks"].reshape(self.player_count, RACK_SLOTS)
+        return arrays, offset
+
+    def publish(self, game: Game, payload: bytes = b"") -> int:
+        """
+        Writes a position into the block
+
+        :param game: Game shaped like the one the block was created for
+        :param payload: per turn bytes for the workers, such as pickled candidate moves
+        :return: int sequence of the new position
+        """
+        buffer = self.memory.buf
+        if self.payload_offset + len(payload) > len(buffer):
+            raise ValueError("A payload of {} bytes does not fit in the shared block".format(len(payload)))
+
+        # An odd sequence tells readers a write is under way
+        sequence = struct.unpack_from("=Q", buffer, SEQUENCE_OFFSET)[0] + 1
+        struct.pack_into("=Q", buffer, SEQUENCE_OFFSET, sequence)
+
+        board = game.board
+        arrays = self.arrays
+        for name, _ in SQUARE_ARRAYS:
+            arrays[name][:] = getattr(board, name)
+        arrays["bag"][:] = game.tile_bag.counts
+        for i, player in enumerate(game.players):
+            arrays["racks"][i] = player.rack
+            arrays["scores"][i] = player.score
+        buffer[self.payload_offset:self.payload_offset + len(payload)] = payload
+
+        # Any int seeds a game, the header keeps it masked to 63 bits like derived seeds
+        seed = 0 if game.seed is None else game.seed & SEED_MASK
+        lexicon_size = STATE_HEADER.unpack_from(buffer)[12]
+        STATE_HEADER.pack_into(buffer, 0, STATE_MAGIC, STATE_VERSION, sequence, self.side_squares, self.player_count,
+                               game.turn, game.scoreless_turns, game.finished, game.seed is not None, seed,
+                               board.tile_count, board.version, lexicon_size, len(payload))
+
+        struct.pack_into("=Q", buffer, SEQUENCE_OFFSET, sequence + 1)
+        return sequence + 1
+
+    def read(self) -> Tuple[Game, object]:
+        """
+        The published position and its unpickled payload, rebuilt only when the sequence has changed.
+        The game is shared between calls and must be copied before it is changed.
+
+        :return: (Game, payload object, None without a payload)
+        """
+        while True:
+            sequence = struct.unpack_from("=Q", self.memory.buf, SEQUENCE_OFFSET)[0]
+            if sequence == self.sequence:
+                return self.game, self.payload
+            if sequence & 1:
+                continue
+
+            game, payload = self._rebuild()
+            if struct.unpack_from("=Q", self.memory.buf, SEQUENCE_OFFSET)[0] == sequence:
+                self.sequence = sequence
+                self.game = game
+                self.payload = payload
+                return game, payload
+
+    def _rebuild(self) -> Tuple[Game, object]:
+        """
+        Game and payload from the block, copying the arrays out of it
+
+        :return: (Game, payload object)
+        """
+        header = STATE_HEADER.unpack_from(self.memory.buf)
+        _, _, _, _, _, turn, scoreless, finished, has_seed, seed, tile_count, board_version, _, payload_size = header
+
+        if self.template is None:
+            self.lexicon, self.layout = pickle.loads(
+                bytes(self.memory.buf[STATE_HEADER.size:STATE_HEADER.size + header[12]]))
+            self.template = Game(self.lexicon, self.player_count, layout=self.layout)
+
+        arrays = self.arrays
+        game = self.template.copy()
+        board = game.board
+        for name in ("letters", "values", "blanks", "anchors"):
+            setattr(board, name, bytearray(arrays[name]))
+        for name in ("across_checks", "down_checks", "across_cross_scores", "down_cross_scores"):
+            setattr(board, name, arrays[name].tolist())
+        board.tile_count = tile_count
+        board.version = board_version
+        board.invalidate_moves()
+
+        game.tile_bag.counts = bytearray(arrays["bag"])
+        game.tile_bag.size = sum(game.tile_bag.counts)
+        game.tile_bag.rng = random.Random()
+        for i, player in enumerate(game.players):
+            player.rack = bytearray(arrays["racks"][i])
+            player.score = int(arrays["scores"][i])
+        game.turn = turn
+        game.scoreless_turns = scoreless
+        game.finished = bool(finished)
+        game.seed = seed if has_seed else None
+
+        payload = None
+        if payload_size:
+            payload = pickle.loads(bytes(self.memory.buf[self.payload_offset:self.payload_offset + payload_size]))
+        return game, payload
+
+    def close(self):
+        """
+        Detaches from the block, the owner also frees it
+
+        :return:
+        """
+        # Views into the buffer have to go before the mapping can close
+        self.arrays = {}
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+def share_state(shared: Union[SharedGameState, None], game: Game, payload) -> SharedGameState:
+    """
+    Publishes a position for worker tasks, in a new block when there is none or it has another shape
+
+    :param shared: block used for earlier positions, None for none
+    :param game: Game
+    :param payload: picklable per turn data for the workers
+    :return: SharedGameState holding the position
+    """
+    if shared is not None and (shared.layout is not game.board.layout or shared.player_count != len(game.players)):
+        shared.close()
+        shared = None
+    if shared is None:
+        shared = SharedGameState.create(game)
+    shared.publish(game, pickle.dumps(payload))
+    return shared
+
+
+def load_state(state: Union[bytes, str]) -> Tuple[Game, object]:
+    """
+    Game and payload handed to a worker task, either pickled or as the name of a shared block
+
+    :param state: pickled (Game, payload) or a SharedGameState name
+    :return: (Game, payload)
+    """
+    if isinstance(state, str):
+        return SharedGameState.attach(state).read()
+    return pickle.loads(state)
@@ -0,0 +1,283 @@
+import csv
+import functools
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Union
+
+from Modules.Bots import EndgameBot, GreedyBot, PreEndgameBot, SimBot
+from Modules.Game import MOVE, RACK_SIZE, Game
+from Modules.Leaves import LeaveTable
+from Modules.Lexicon import Lexicon
+from Modules.Profiler import GameProfile
+from Modules.Records import GameRecord, RecordWriter
+from Modules.Scrabble import derive_seed
+
+# Leave table built by build_leaves.py
+LEAVES_PATH = "./Resources/Leaves.bin"
+
+
+def _equity_bot(lexicon: Lexicon, seed: Union[int, None] = None) -> GreedyBot:
+    check_bot_files("equity")
+    return GreedyBot(lexicon, LeaveTable.load(LEAVES_PATH), seed)
+
+
+# Bots that can be entered into a tournament by name, each is built from a lexicon and a seed
+BOTS = {
+    "greedy": GreedyBot,
+    "equity": _equity_bot,
+    # Endgame searches are cut off by time, so their games only repeat exactly on equally fast machines
+    "endgame": functools.partial(EndgameBot, time_limit=2.0),
+    "preendgame": functools.partial(PreEndgameBot, time_limit=2.0, workers=1),
+    # Games already run one per core, so rollouts stay in process and are capped by count to keep results seeded
+    "simulation": functools.partial(SimBot, time_budget=None, iterations=8, workers=1),
+}
+
+# Files a bot needs that are not checked in, with the script that builds each
+BOT_FILES = {
+    "equity": (LEAVES_PATH, "build_leaves.py"),
+}
+
+# Normal quantile for 95% confidence intervals
+Z_95 = 1.959963984540054
+
+# Lexicon loaded once per worker process, the compiled word graph is a shared read only mapping
+_worker_lexicon: Union[Lexicon, None] = None
+
+
+def check_bot_files(name: str):
+    """
+    Raises a ValueError naming the script to run when a bot needs a file that has not been built
+
+    :param name: bot name
+    :return:
+    """
+    if name in BOT_FILES:
+        path, script = BOT_FILES[name]
+        if not os.path.exists(path):
+            raise ValueError("The {} bot needs {}, build it with {}".format(name, path, script))
+
+
+def _init_worker(word_path: str):
+    global _worker_lexicon
+    _worker_lexicon = Lexicon.from_file(word_path)
+
+
+def play_game(game_index: int, seed: int, bot_names: List[str], record: bool = False,
+              profile_dir: Union[str, None] = None) -> Dict:
+    """
+    Plays one seeded game between the named bots in the current process. The bag is seeded with the
+    game seed and each bot with a seed derived from it and its seat, so a game can be played again on
+    its own from its seed.
+
+    :param game_index: int
+    :param seed: seed of the game
+    :param bot_names: list[str], one bot name per seat
+    :param record: add the GameRecord to the result under "record"
+    :param profile_dir: directory to write a cProfile capture of the game to, as game_<index>.prof
+    :return: dict result
+    """
+    lexicon = _worker_lexicon
+    bots = [BOTS[name](lexicon, seed=derive_seed(seed, seat)) for seat, name in enumerate(bot_names)]
+    game = Game(lexicon, len(bots), seed)
+    think_times: List[List[float]] = [[] for _ in bots]
+    profile_path = os.path.join(profile_dir, "game_{}.prof".format(game_index)) if profile_dir else None
+
+    start = time.perf_counter()
+    with GameProfile(profile_path):
+        while not game.is_over():
+            seat = game.turn
+            turn_start = time.perf_counter()
+            bots[seat].take_turn(game)
+            game.history[-1].time = time.perf_counter() - turn_start
+            think_times[seat].append(game.history[-1].time)
+    duration = time.perf_counter() - start
+
+    moves = [0] * len(bots)
+    bingos = [0] * len(bots)
+    for turn in game.history:
+        if turn.action == MOVE:
+            moves[turn.player] += 1
+            if len(turn.move.tiles) == RACK_SIZE:
+                bingos[turn.player] += 1
+
+    winner = game.winner()
+    result = {
+        "game": game_index,
+        "seed": seed,
+        "bots": bot_names,
+        "scores": [player.score for player in game.players],
+        "winner": None if winner is None else bot_names[winner],
+        "winner_seat": winner,
+        "turns": len(game.history),
+        "moves": moves,
+        "bingos": bingos,
+        "think_times": think_times,
+        "duration": duration,
+    }
+
+    if record:
+        result["record"] = GameRecord.from_game(game, seed, bot_names)
+    return result
+
+
+def _play_task(task):
+    return play_game(*task)
+
+
+class ResultSink:
+    # Streams game results to a JSONL or CSV file, picked by the file extension
+    def __init__(self, path: str) -> None:
+        """
+
+        :param path: output file, .csv for CSV and anything else for JSON lines
+        """
+        self.path = path
+        self.file = open(path, "w", newline="")
+        self.writer = None
+        self.is_csv = path.lower().endswith(".csv")
+
+    def write(self, result: Dict):
+        if not self.is_csv:
+            self.file.write(json.dumps(result) + "\n")
+            return
+
+        # Lists are flattened to one column per seat, think times to a mean per seat
+        row = {"game": result["game"], "seed": result["seed"], "winner": result["winner"],
+               "turns": result["turns"], "duration": result["duration"]}
+        for seat, name in enumerate(result["bots"]):
+            times = result["think_times"][seat]
+            row["bot_{}".format(seat)] = name
+            row["score_{}".format(seat)] = result["scores"][seat]
+            row["moves_{}".format(seat)] = result["moves"][seat]
+            row["bingos_{}".format(seat)] = result["bingos"][seat]
+            row["mean_think_{}".format(seat)] = sum(times) / len(times) if times else 0.0
+
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.file, fieldnames=list(row))
+            self.writer.writeheader()
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+
+class Standings:
+    # Aggregated tournament statistics per bot
+    def __init__(self) -> None:
+        self.games: Dict[str, int] = {}
+        self.wins: Dict[str, float] = {}
+        self.points: Dict[str, int] = {}
+        self.bingos: Dict[str, int] = {}
+        self.moves: Dict[str, int] = {}
+        self.think_time: Dict[str, float] = {}
+
+    def add(self, result: Dict):
+        """
+        Adds a game result, a tie counts as half a win for each bot
+
+        :param result: dict
+        :return:
+        """
+        for seat, name in enumerate(result["bots"]):
+            self.games[name] = self.games.get(name, 0) + 1
+            self.points[name] = self.points.get(name, 0) + result["scores"][seat]
+            self.bingos[name] = self.bingos.get(name, 0) + result["bingos"][seat]
+            self.moves[name] = self.moves.get(name, 0) + len(result["think_times"][seat])
+            self.think_time[name] = self.think_time.get(name, 0.0) + sum(result["think_times"][seat])
+
+            if result["winner_seat"] is None:
+                self.wins[name] = self.wins.get(name, 0.0) + 0.5
+            elif result["winner_seat"] == seat:
+                self.wins[name] = self.wins.get(name, 0.0) + 1.0
+
+    def win_rate(self, name: str):
+        """
+        Win rate of a bot with its 95% Wilson score interval
+
+        :param name: str
+        :return: (float, float, float) rate, low, high
+        """
+        games = self.games.get(name, 0)
+        if games == 0:
+            return 0.0, 0.0, 1.0
+
+        rate = self.wins.get(name, 0.0) / games
+        denominator = 1 + Z_95 ** 2 / games
+        centre = (rate + Z_95 ** 2 / (2 * games)) / denominator
+        spread = Z_95 * math.sqrt(rate * (1 - rate) / games + Z_95 ** 2 / (4 * games ** 2)) / denominator
+        return rate, max(0.0, centre - spread), min(1.0, centre + spread)
+
+    def report(self) -> str:
+        lines = []
+        for name in sorted(self.games):
+            games = self.games[name]
+            rate, low, high = self.win_rate(name)
+            moves = self.moves[name]
+            lines.append("{}: {} games, win rate {:.1%} (95% CI {:.1%} - {:.1%}), mean score {:.1f}, "
+                         "{:.2f} bingos per game, {:.1f} ms per turn".format(
+                             name, games, rate, low, high, self.points[name] / games, self.bingos[name] / games,
+                             1000 * self.think_time[name] / moves if moves else 0.0))
+        return "\n".join(lines)
+
+
+def game_tasks(games: int, bot_names: List[str], seed: int, record: bool = False,
+               profile_dir: Union[str, None] = None) -> Iterator:
+    # Seats rotate every game so no bot keeps the first move advantage
+    for game_index in range(games):
+        shift = game_index % len(bot_names)
+        yield game_index, derive_seed(seed, game_index), bot_names[shift:] + bot_names[:shift], record, profile_dir
+
+
+def run_tournament(games: int, bot_names: List[str], word_path: str, output: Union[str, None] = None,
+                   seed: int = 0, workers: Union[int, None] = None,
+                   record_path: Union[str, None] = None, profile_dir: Union[str, None] = None) -> Standings:
+    """
+    Plays seeded games across a process pool, one worker per core by default, streaming results to
+    the output file as they finish
+
+    :param games: number of games
+    :param bot_names: bot names, one per seat
+    :param word_path: word file
+    :param output: optional JSONL or CSV file
+    :param seed: seed of the tournament, game i uses derive_seed(seed, i) whichever worker plays it
+    :param workers: number of worker processes
+    :param record_path: optional game record file, .gcg for text and anything else for binary
+    :param profile_dir: optional directory for a cProfile capture of every game
+    :return: Standings
+    """
+    for name in bot_names:
+        if name not in BOTS:
+            raise ValueError("Unknown bot {}, choose from {}".format(name, ", ".join(BOTS)))
+        check_bot_files(name)
+
+    # Compile the lexicon once up front so the workers only map it
+    Lexicon.from_file(word_path)
+
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+
+    workers = workers or os.cpu_count() or 1
+    standings = Standings()
+    sink = ResultSink(output) if output else None
+    records = RecordWriter(record_path) if record_path else None
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(word_path,)) as executor:
+            chunk_size = max(1, min(32, games // (workers * 4)))
+            tasks = game_tasks(games, bot_names, seed, records is not None, profile_dir)
+            for result in executor.map(_play_task, tasks, chunksize=chunk_size):
+                if records is not None:
+                    records.write(result.pop("record"))
+                standings.add(result)
+                if sink is not None:
+                    sink.write(result)
+    finally:
+        if sink is not None:
+            sink.close()
+        if records is not None:
+            records.close()
+
+    return standings
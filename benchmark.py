@@ -0,0 +1,229 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Union
+
+from Modules.Bots import GreedyBot
+from Modules.Game import Game
+from Modules.Lexicon import Lexicon
+from Modules.MoveGenerator import MoveGenerator
+from Modules.Scoring import Scorer
+from Modules.Scrabble import BLANK
+
+# Turns played before each fixture is taken, an empty board, an early board and a crowded board
+FIXTURE_TURNS = [0, 6, 16]
+
+
+class Fixture:
+    # Seeded game position with the current player part way through placing a move
+    def __init__(self, lexicon: Lexicon, seed: int, turns: int) -> None:
+        """
+
+        :param lexicon: Lexicon
+        :param seed: int
+        :param turns: greedy turns played before the position is taken
+        """
+        self.game = Game(lexicon, seed=seed)
+        bot = GreedyBot(lexicon)
+        for _ in range(turns):
+            if self.game.is_over():
+                break
+            bot.take_turn(self.game)
+
+        self.board = self.game.board
+        self.player = self.game.current_player
+        self.moves = MoveGenerator(lexicon).generate(self.board, self.player.rack)
+
+        # Puts the first two tiles of the best move on the board the way the interface does
+        best = max(self.moves, key=lambda move: move.score) if self.moves else None
+        for pos, letter, blank in best.tiles[:2] if best else []:
+            tile = next(tile for tile in self.player.tiles
+                        if tile.board_position is None and tile.type == (BLANK if blank else letter))
+            tile.rack_position = None
+            tile.board_position = pos
+
+        self.board.legal_moves = self.board.get_legal_moves(self.player)
+        self.board.has_moves = True
+
+
+class Benchmark:
+    # A timed operation, run number times per measurement
+    def __init__(self, name: str, operation: Callable[[], object], number: int) -> None:
+        """
+
+        :param name: str
+        :param operation: callable timed with no arguments
+        :param number: calls per measurement
+        """
+        self.name = name
+        self.operation = operation
+        self.number = number
+
+    def run(self, repeat: int) -> Dict:
+        """
+        Times the operation, measurements are per call
+
+        :param repeat: number of measurements
+        :return: dict with the min and median seconds per call
+        """
+        # One warm up call so caches are filled the same way for every measurement
+        self.operation()
+
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(self.number):
+                self.operation()
+            times.append((time.perf_counter() - start) / self.number)
+
+        return {"min": min(times), "median": statistics.median(times), "number": self.number, "repeat": repeat}
+
+
+def build_benchmarks(word_path: str, seed: int) -> List[Benchmark]:
+    """
+    Builds every benchmark on seeded fixtures
+
+    :param word_path: word file
+    :param seed: int
+    :return: list[Benchmark]
+    """
+    lexicon = Lexicon.from_file(word_path)
+    fixtures = [Fixture(lexicon, seed, turns) for turns in FIXTURE_TURNS]
+
+    rng = random.Random(seed)
+    words = [rng.choice(lexicon.words_of_length(length)) for length in rng.choices(range(2, 9), k=500)]
+    misses = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(len(word))) for word in words]
+    queries = words + misses
+
+    generator = MoveGenerator(lexicon)
+    bots = [GreedyBot(lexicon), GreedyBot(lexicon)]
+
+    def play_game():
+        Game(lexicon, seed=seed).play(bots)
+
+    benchmarks = [
+        Benchmark("lexicon_load", lambda: Lexicon.from_file(word_path), 5),
+        Benchmark("word_membership_1000", lambda: [word in lexicon for word in queries], 20),
+        Benchmark("complete_game", play_game, 1),
+    ]
+
+    for turns, fixture in zip(FIXTURE_TURNS, fixtures):
+        board = fixture.board
+        player = fixture.player
+        moves = fixture.moves
+        scorer = Scorer(board)
+        suffix = "_turn_{}".format(turns)
+        benchmarks += [
+            Benchmark("get_legal_moves" + suffix, lambda board=board, player=player: board.get_legal_moves(player), 50),
+            Benchmark("get_current_words" + suffix,
+                      lambda board=board, player=player: board.get_current_words(player), 200),
+            Benchmark("get_movable_tiles" + suffix,
+                      lambda board=board, player=player: board.get_movable_tiles(player), 200),
+            Benchmark("generate_moves" + suffix,
+                      lambda board=board, player=player: generator.generate(board, player.rack), 10),
+            Benchmark("score_moves" + suffix, lambda scorer=scorer, moves=moves: scorer.score_moves(moves), 20),
+        ]
+
+    return benchmarks
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float, min_delta: float = 0.0) -> List[str]:
+    """
+    Lists the benchmarks whose median is slower than the baseline by more than the tolerance
+
+    :param results: dict of benchmark results
+    :param baseline: dict of baseline benchmark results
+    :param tolerance: allowed slow down as a fraction
+    :param min_delta: slow downs of fewer seconds than this are timer noise and never flagged
+    :return: list[str] of regressions
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["median"] / baseline[name]["median"]
+        if ratio > 1 + tolerance and result["median"] - baseline[name]["median"] > min_delta:
+            regressions.append("{}: {:.3f} ms, baseline {:.3f} ms ({:+.0%})".format(
+                name, 1000 * result["median"], 1000 * baseline[name]["median"], ratio - 1))
+    return regressions
+
+
+def baseline_mismatches(report: Dict, baseline: Dict) -> List[str]:
+    """
+    Lists how the setup of a run differs from the baseline, timings only compare on a matching setup
+
+    :param report: dict of the run with its python version, machine and seed
+    :param baseline: dict of the baseline in the same form
+    :return: list[str] of differences
+    """
+    return ["{} {} against {}".format(key, report[key], baseline.get(key))
+            for key in ("python", "machine", "seed") if baseline.get(key) != report[key]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Times the hot paths on seeded fixtures and compares with a baseline")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", default="./Resources/BenchmarkBaseline.json", help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed slow down before flagging")
+    parser.add_argument("--min-delta", type=float, default=0.02,
+                        help="milliseconds a benchmark must slow down by before flagging, below this is timer noise")
+    parser.add_argument("--repeat", type=int, default=5, help="measurements per benchmark")
+    parser.add_argument("--filter", default=None, help="only run benchmarks whose name contains this")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the fixtures")
+    parser.add_argument("--words", default="./Resources/ScrabbleWords.txt", help="word list")
+    args = parser.parse_args()
+
+    results = {}
+    for benchmark in build_benchmarks(args.words, args.seed):
+        if args.filter and args.filter not in benchmark.name:
+            continue
+        results[benchmark.name] = benchmark.run(args.repeat)
+        print("{:<32} {:>10.3f} ms".format(benchmark.name, 1000 * results[benchmark.name]["median"]))
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": args.seed,
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+        print("Baseline saved to {}".format(args.baseline))
+        return
+
+    baseline: Union[Dict, None] = None
+    try:
+        with open(args.baseline, "r") as baseline_file:
+            baseline = json.load(baseline_file)
+    except OSError:
+        print("No baseline at {}, run with --save-baseline to store one".format(args.baseline))
+
+    if baseline is not None:
+        mismatches = baseline_mismatches(report, baseline)
+        if mismatches:
+            print("Skipping the comparison, the baseline was taken on another setup: {}".format(", ".join(mismatches)))
+            print("Run with --save-baseline to store one for this setup")
+            return
+
+        regressions = compare(results, baseline["results"], args.tolerance, args.min_delta / 1000)
+        if regressions:
+            print("Regressions against the baseline:")
+            for regression in regressions:
+                print("  " + regression)
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == '__main__':
+    main()
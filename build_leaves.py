@@ -0,0 +1,84 @@
+import argparse
+import time
+from typing import List, Sequence, Tuple, Union
+
+from Modules.Bots import exchange_or_pass
+from Modules.Game import Game
+from Modules.Leaves import TABLE_SIZE, LeaveTable, fit_weights
+from Modules.Lexicon import Lexicon
+from Modules.MoveGenerator import MoveGenerator
+from Modules.Scrabble import BLANK_INDEX, derive_seed
+
+
+def self_play_samples(lexicon: Lexicon, games: int, seed: int,
+                      leaves: Union[LeaveTable, None] = None) -> List[Tuple[Sequence[int], float]]:
+    """
+    Plays bot games and pairs every leave with the points its player scored on their next turn. Leaves
+    that were not refilled to a full rack are skipped.
+
+    :param lexicon: Lexicon
+    :param games: number of games
+    :param seed: int
+    :param leaves: leave table the bots play by, None to play the highest scoring move
+    :return: list of (sorted leave slots, next turn score)
+    """
+    generator = MoveGenerator(lexicon, leaves)
+    samples = []
+
+    for game_number in range(games):
+        game = Game(lexicon, seed=derive_seed(seed, game_number))
+        waiting: List[Union[List[int], None]] = [None] * len(game.players)
+
+        while not game.is_over():
+            seat = game.turn
+            player = game.current_player
+            move = generator.best_move(game.board, player.rack)
+
+            leave = None
+            if move is None:
+                exchange_or_pass(game)
+                score = 0
+            else:
+                leave = [slot for slot, count in enumerate(player.rack) for _ in range(count)]
+                for _, letter, blank in move.tiles:
+                    leave.remove(BLANK_INDEX if blank else ord(letter) - 97)
+                if len(game.tile_bag) < len(move.tiles):
+                    leave = None
+                score = game.apply_move(move)
+
+            if waiting[seat] is not None:
+                samples.append((waiting[seat], score))
+            waiting[seat] = leave
+
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Builds the memory mapped leave value table")
+    parser.add_argument("--output", default="./Resources/Leaves.bin", help="table file to write")
+    parser.add_argument("--source", default=None,
+                        help="text file of leave values to convert instead of running self play")
+    parser.add_argument("--games", type=int, default=500, help="self play games per pass")
+    parser.add_argument("--passes", type=int, default=1,
+                        help="self play passes, each pass after the first plays by the previous table")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first pass")
+    parser.add_argument("--words", default="./Resources/ScrabbleWords.txt", help="word list")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.source is not None:
+        table = LeaveTable.from_text(args.source)
+    else:
+        lexicon = Lexicon.from_file(args.words)
+        table = None
+        for number in range(args.passes):
+            samples = self_play_samples(lexicon, args.games, args.seed + number, table)
+            table = LeaveTable.from_weights(fit_weights(samples))
+            print("Pass {}: {} leaves from {} games".format(number + 1, len(samples), args.games))
+
+    table.save(args.output)
+    print("{} leave values written to {} in {:.1f}s".format(TABLE_SIZE, args.output, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main()
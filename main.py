@@ -1,30 +1,34 @@
+import argparse
 import os
-from typing import Union, List
+from itertools import islice
+from typing import Union, List, Tuple
 
 os.environ["RAYLIB_BIN_PATH"] = "__file__"
 
 from raylibpy import *
-from Modules import Graphics, Scrabble
-
-
-def remove_suffix(input_string, suffix):
-    if suffix and input_string.endswith(suffix):
-        return input_string[:-len(suffix)]
-    return input_string
-
-
-def main():
-    # Scrabble Words
-    words = []
-    with open("./Resources/ScrabbleWords.txt", "r") as word_file:
-        lines = word_file.readlines()
-        for line in lines:
-            words.append(remove_suffix(line, '\n').lower())
-
-    # Dimensions for the board
-    width = 800
-    height = 1000
-
+from Modules import Graphics
+from Modules.Client import Connection, RemoteGame
+from Modules.Game import Game
+from Modules.Layouts import BOARDS_PATH, STANDARD_LAYOUT, get_layout, layout_of_size
+from Modules.Lexicon import Lexicon
+from Modules.Profiler import PROFILER
+from Modules.Records import END, MOVE, GameRecord, read_records
+from Modules.Scrabble import RACK_SIZE, Board, Player, rack_slot, tile_code
+from Modules.Server import HUMAN
+
+# Window size
+WIDTH = 800
+HEIGHT = 1000
+
+
+def layout(width: int, height: int) -> Tuple[Graphics.Dimensions, Graphics.Render]:
+    """
+    Board dimensions and colours for a window
+
+    :param width: int
+    :param height: int
+    :return: (Dimensions, Render)
+    """
     # Need to find dominant width
     board_side_dim = height if (width > height) else width
 
@@ -36,41 +40,132 @@ def main():
     # Graphics
     border_thickness: int = 3
     border_color: Color = BLACK
-    square_colors: List[Color] = [RED, Color(255, 200, 2347, 255), BLUE, GRAY]
+    square_colors: List[Color] = [RED, Color(255, 200, 2347, 255), BLUE, GRAY, MAROON, DARKBLUE]
     render: Graphics.Render = Graphics.Render(border_thickness, border_color, square_colors)
 
-    # Scrabble board special tiles
-    side_squares = 15
-    triple_words = [0, 7, 14, 105, 119,
-                    210, 217, 224]
-    double_words = [16, 32, 48, 64, 28,
-                    42, 56, 70, 196, 182,
-                    168, 154, 208, 192, 176,
-                    160, 112]
-    triple_letters = [20, 24, 76, 136, 200,
-                      204, 88, 148, 80, 84,
-                      140, 144]
-    double_letters = [45, 165, 213, 221, 179,
-                      59, 36, 52, 38, 102,
-                      116, 132, 186, 172, 188,
-                      122, 108, 92, 96, 98,
-                      126, 128]
-
-    # Generating Tile Bag
-    tile_bag = Scrabble.TileBag()
-
-    # Generating Scrabble Board
-    board = Scrabble.Board(side_squares, triple_words, double_words, triple_letters, double_letters)
-
-    # Creating players
-    player_one = Scrabble.Player()
-    player_two = Scrabble.Player()
-
-    turn = 0
-    players = [player_one, player_two]
-
-    for player in players:
-        player.get_tiles(tile_bag)
+    return dimensions, render
+
+
+def replay(record: GameRecord, boards_path: str):
+    """
+    Steps through a recorded game, right arrow for the next turn and left arrow for the previous one
+
+    :param record: GameRecord
+    :param boards_path: boards file, records only keep the board size so its first layout of that size is used
+    :return:
+    """
+    width = WIDTH
+    height = HEIGHT
+    dimensions, render = layout(width, height)
+
+    # The record holds every placed tile, so the board needs no lexicon
+    board = Board(layout_of_size(record.side_squares, boards_path))
+    players = [Player() for _ in record.names]
+    turns = [turn for turn in record.turns if turn.action != END]
+    board_view = Graphics.BoardView(board)
+
+    init_window(width, height, "Scrabble Replay")
+    set_target_fps(60)
+
+    # Number of turns shown on the board
+    shown = 0
+    changed = True
+
+    while not window_should_close():
+        if is_key_pressed(KEY_RIGHT) and shown < len(turns):
+            if turns[shown].action == MOVE:
+                board.place_tiles(turns[shown].tiles)
+            shown += 1
+            changed = True
+        elif is_key_pressed(KEY_LEFT) and shown:
+            shown -= 1
+            if turns[shown].action == MOVE:
+                board.remove_tiles([pos for pos, _, _ in turns[shown].tiles])
+            changed = True
+
+        if changed:
+            # Each rack as it was on its players latest turn so far, and the next turn's rack for its player
+            for player_num, player in enumerate(players):
+                player.score = 0
+                player.rack = bytearray(len(player.rack))
+                for number, turn in enumerate(turns[:shown + 1]):
+                    if turn.player != player_num:
+                        continue
+                    if number < shown:
+                        player.score = turn.total
+                    player.rack = bytearray(len(player.rack))
+                    for letter in turn.rack:
+                        player.rack[rack_slot(tile_code(letter))] += 1
+                player.sync_tiles()
+            changed = False
+
+        begin_drawing()
+        clear_background(RAYWHITE)
+
+        board_view.draw(dimensions, render, players)
+
+        if shown < len(turns):
+            status = "Turn {}/{}, {} to play".format(shown + 1, len(turns), record.names[turns[shown].player])
+        else:
+            status = "Final scores " + ", ".join(
+                "{} {}".format(name, score) for name, score in zip(record.names, record.final_scores))
+        scores = "   ".join("{} {}".format(name, player.score) for name, player in zip(record.names, players))
+        draw_text(status, 50, height - 40, 20, BLACK)
+        draw_text(scores, 50, height - 70, 20, BLACK)
+
+        end_drawing()
+
+    board_view.unload()
+    close_window()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays Scrabble, or replays a recorded game")
+    parser.add_argument("--replay", default=None, help="record file to replay instead of playing")
+    parser.add_argument("--game", type=int, default=0, help="game of the record file to replay")
+    parser.add_argument("--connect", default=None, help="HOST:PORT of a game server to play on")
+    parser.add_argument("--join", type=int, default=None,
+                        help="game id to join on the server, by default a new game against --opponent")
+    parser.add_argument("--seat", type=int, default=0, help="seat to play when joining a game")
+    parser.add_argument("--opponent", default="greedy", help="bot to play against in a new server game")
+    parser.add_argument("--board", default=STANDARD_LAYOUT, help="board layout of a local game")
+    parser.add_argument("--boards", default=BOARDS_PATH, help="board layouts file")
+    parser.add_argument("--debug", action="store_true", help="show the frame rate and the time of each phase")
+    parser.add_argument("--stats", default=None, help="write the phase timers and counters to this JSON file")
+    parser.add_argument("--trace", default=None, help="write every timed call to this Chrome trace file")
+    args = parser.parse_args()
+
+    if args.debug or args.stats or args.trace:
+        PROFILER.enable(tracing=args.trace is not None)
+
+    if args.replay is not None:
+        record = next(islice(read_records(args.replay), args.game, None), None)
+        if record is None:
+            parser.error("{} has no game {}".format(args.replay, args.game))
+        replay(record, args.boards)
+        return
+
+    # Scrabble Words
+    lexicon = Lexicon.from_file("./Resources/ScrabbleWords.txt")
+
+    width = WIDTH
+    height = HEIGHT
+    dimensions, render = layout(width, height)
+
+    # Headless game holding the board, the tile bag and the players, or a game hosted on a server
+    if args.connect is not None:
+        host, port = args.connect.rsplit(":", 1)
+        connection = Connection(host, int(port))
+        game_id = args.join if args.join is not None else connection.create([HUMAN, args.opponent])
+        game = RemoteGame(lexicon, connection, game_id, args.seat)
+    else:
+        game = Game(lexicon, layout=get_layout(args.board, args.boards))
+    board = game.board
+    players = game.players
+
+    # Draws the board and the player racks
+    board_view = Graphics.BoardView(board)
+    overlay = Graphics.DebugOverlay(5, 5) if args.debug else None
 
     # Creating window
     init_window(width, height, "Scrabble Bots")
@@ -88,6 +183,10 @@ def main():
 
     # Main Game Loop
     while not window_should_close():
+        # Takes in the turns played on the server
+        if isinstance(game, RemoteGame):
+            game.poll()
+
         # Player mouse position
         mouse_point = get_mouse_position()
 
@@ -95,22 +194,18 @@ def main():
         begin_drawing()
         clear_background(RAYWHITE)
 
-        # Draw FPS onto Corner
-        # draw_fps(5, 5)
-
-        # Draw Board Aspects
-        board.draw_board(dimensions, render)  # Draws background
-        board.draw_player_pieces(dimensions, players)  # Draws rack pieces
+        # Draw Board Aspects, the board and rack pieces come from a cached texture
+        board_view.draw(dimensions, render, players)
 
         if not board.has_moves:
-            board.legal_moves = board.get_legal_moves(players[turn])
+            board.legal_moves = board.get_legal_moves(players[game.turn])
 
-        board.draw_circles(board.legal_moves, DARKGREEN)  # Draw legal moves onto board
+        board_view.draw_circles(board.legal_moves, DARKGREEN)  # Draw legal moves onto board
 
         if not board.has_movable_tiles:
-            board.movable_tiles = board.get_movable_tiles(players[turn])
+            board.movable_tiles = board.get_movable_tiles(players[game.turn])
 
-        board.draw_circles(board.movable_tiles, RED)
+        board_view.draw_circles(board.movable_tiles, RED)
 
         # Draw Complete Turn Button
         draw_rectangle_rec(complete_turn_button_rect, Color(63, 201, 24, 255))
@@ -119,23 +214,24 @@ def main():
         if is_mouse_button_released(MOUSE_LEFT_BUTTON):
             if selected_tile is not None:
                 # Check if tile is on top of square
-                for square_index, square in enumerate(board.board_squares):
+                for square_index, square in enumerate(board_view.board_squares):
                     if check_collision_point_rec(mouse_point, square):
                         # Seeing if moves have been calculated
                         if not board.has_moves:
-                            board.legal_moves = board.get_legal_moves(players[turn])  # If not, get moves
+                            board.legal_moves = board.get_legal_moves(players[game.turn])  # If not, get moves
 
                         # Checking if there are legal moves
                         if board.legal_moves is not None:
                             # Checking if square is a legal move
                             if square_index in board.legal_moves:
-                                players[turn].tiles[selected_tile].rack_position = None
-                                players[turn].tiles[selected_tile].board_position = square_index
+                                players[game.turn].tiles[selected_tile].rack_position = None
+                                players[game.turn].tiles[selected_tile].board_position = square_index
                                 selected_tile = None
-                                board.current_words = board.get_current_words(players[turn])
+                                board.current_words = board.get_current_words(players[game.turn])
+                                board.invalidate_moves()
 
             if selected_tile is not None:
-                players[turn].tiles[selected_tile].rack_position = held_rack_position
+                players[game.turn].tiles[selected_tile].rack_position = held_rack_position
                 held_rack_position = None
 
                 # Selected tile will always be None after release
@@ -143,73 +239,79 @@ def main():
 
             complete_turn_button_clicked = False
 
-            board.has_moves = False
-            board.movable_tiles = False
-
         # If mouse button is pressed initially
         if is_mouse_button_pressed(MOUSE_LEFT_BUTTON):
             # Check if the complete turn button is pressed
             if check_collision_point_rec(mouse_point, complete_turn_button_rect) and not complete_turn_button_clicked:
-                valid_words = True
-                for word in board.current_words:
-                    if word not in words:
-                        valid_words = False
-
-                if valid_words:
-                    for player_tile in reversed(players[turn].tiles):
-                        # Append all the tiles that are placed by a player onto the board tiles
-                        if player_tile.board_position is not None:
-                            # Remove the tiles from the bag
-                            players[turn].tiles.remove(player_tile)
-                            board.tiles.append(player_tile)
-
-                    for tile in board.tiles:
-                        tile.rack_position = None
+                placed_tiles = [tile for tile in players[game.turn].tiles if tile.board_position is not None]
 
-                    complete_turn_button_clicked = True
+                # The placed tiles must form a legal move, no tiles passes the turn
+                placement = board.check_placement(players[game.turn].placed_tiles())
 
-                    # Fill the players tile bag
-                    players[turn].get_tiles(tile_bag)
+                if (placement.valid or not placed_tiles) and not game.is_over():
+                    # Scores the placed tiles, refills the rack and moves on to the next turn
+                    if placed_tiles:
+                        game.apply_move(game.placement_move(placed_tiles))
+                    else:
+                        game.pass_turn()
 
-                    # Next Turn
-                    turn = (turn + 1) % len(players)
+                    complete_turn_button_clicked = True
 
-                    board.legal_moves = board.get_legal_moves(players[turn])
-                    board.has_moves = True
+                    board.invalidate_moves()
+                    board.current_words = []
             else:
-                tiles = board.get_player_tile_rec(dimensions, turn)
+                tiles = board_view.get_player_tile_rec(dimensions, game.turn)
 
-                for tile_index, tile in enumerate(players[turn].tiles):
+                for tile_index, tile in enumerate(players[game.turn].tiles):
                     # If the tile is not on the board
                     if tile.board_position is None:
                         # If the tile is under the click position
                         if check_collision_point_rec(mouse_point, tiles[tile_index]):
                             # Hold the tile
                             selected_tile = tile_index
-                            held_rack_position = players[turn].tiles[selected_tile].rack_position
-                            players[turn].tiles[selected_tile].rack_position = None
+                            held_rack_position = players[game.turn].tiles[selected_tile].rack_position
+                            players[game.turn].tiles[selected_tile].rack_position = None
                     elif tile.board_position is not None:
-                        if check_collision_point_rec(mouse_point, board.board_squares[tile.board_position]):
+                        if check_collision_point_rec(mouse_point, board_view.board_squares[tile.board_position]):
                             selected_tile = tile_index
-                            empty_rack_pos = [i for i in range(7) if i not in players[turn].get_filled_rack_pos()]
+                            empty_rack_pos = [i for i in range(RACK_SIZE)
+                                              if i not in players[game.turn].get_filled_rack_pos()]
                             held_rack_position = empty_rack_pos[0]
-                            players[turn].tiles[selected_tile].board_position = None
+                            players[game.turn].tiles[selected_tile].board_position = None
+                            board.current_words = board.get_current_words(players[game.turn])
+                            board.invalidate_moves()
 
         # Check if the mouse is down still
         if is_mouse_button_down(MOUSE_LEFT_BUTTON):
             # Draws tile under mouse position
             if selected_tile is not None:
-                side_length = dimensions.side_length / 15
-                players[turn].tiles[selected_tile].draw_tile(
+                side_length = dimensions.side_length / board.side_squares
+                board_view.draw_tile(
+                    players[game.turn].tiles[selected_tile],
                     Rectangle(mouse_point.x - side_length / 2, mouse_point.y - side_length / 2, side_length,
                               side_length), side_length)
 
+        # Frame rate and phase timings of the last frame
+        if overlay is not None:
+            overlay.draw(PROFILER)
+
         # End drawing
-        end_drawing()
+        with PROFILER.span("end_drawing"):
+            end_drawing()
+        PROFILER.end_frame()
 
     # Close window on exit
+    board_view.unload()
     close_window()
 
+    if isinstance(game, RemoteGame):
+        game.close()
+
+    if args.stats:
+        PROFILER.write_summary(args.stats)
+    if args.trace:
+        PROFILER.write_trace(args.trace)
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,41 @@
+import argparse
+import sys
+
+from Modules.Lexicon import Lexicon
+from Modules.Query import ANAGRAMS, HOOKS, PATTERN, SUBANAGRAMS, LexiconQuery
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answers anagram, pattern and hook queries on the word list")
+    parser.add_argument("kind", choices=[ANAGRAMS, SUBANAGRAMS, PATTERN, HOOKS], help="query kind")
+    parser.add_argument("query", nargs="?", default=None,
+                        help="rack for anagrams with ? for blanks, pattern with ? for a letter and * for any "
+                             "letters, or word for hooks. Without it queries are read one per line from stdin.")
+    parser.add_argument("--rack", default=None, help="tiles the open squares of a pattern are filled from")
+    parser.add_argument("--words", default="./Resources/ScrabbleWords.txt", help="word list")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes for large batches read from stdin, defaults to one per core")
+    args = parser.parse_args()
+
+    query = LexiconQuery(Lexicon.from_file(args.words), workers=args.workers)
+    extra = (args.rack,) if args.kind == PATTERN else ()
+
+    if args.query is not None:
+        texts = [args.query]
+    else:
+        texts = [line.strip() for line in sys.stdin if line.strip()]
+
+    try:
+        answers = query.batch([(args.kind, text) + extra for text in texts])
+    finally:
+        query.close()
+
+    for text, answer in zip(texts, answers):
+        if args.kind == HOOKS:
+            print("{} [{}] {}".format(answer[0], text, answer[1]))
+        else:
+            print("{}: {}".format(text, " ".join(answer)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+import argparse
+import asyncio
+
+from Modules.Server import GameServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hosts games for bots and players connecting over TCP")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on")
+    parser.add_argument("--words", default="./Resources/ScrabbleWords.txt", help="word list")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes for bot turns, defaults to one per core")
+    parser.add_argument("--turn-timeout", type=float, default=10.0,
+                        help="seconds a bot turn may take once started, a bot that runs over passes")
+    parser.add_argument("--max-games", type=int, default=1000, help="most games hosted at once")
+    args = parser.parse_args()
+
+    server = GameServer(args.words, args.workers, args.turn_timeout, args.max_games)
+    print("Serving games on {}:{}".format(args.host, args.port))
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import os
+import time
+
+from Modules.Bots import GreedyBot, SimBot
+from Modules.Game import Game
+from Modules.Layouts import BOARDS_PATH, STANDARD_LAYOUT, get_layout
+from Modules.Lexicon import Lexicon
+from Modules.Profiler import PROFILER, GameProfile
+from Modules.Records import MAX_SEED, MIN_SEED, GameRecord, RecordWriter
+from Modules.Scrabble import derive_seed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays bot against bot games without opening a window")
+    parser.add_argument("--games", type=int, default=1, help="number of games to play")
+    parser.add_argument("--words", default="./Resources/ScrabbleWords.txt", help="word list")
+    parser.add_argument("--board", default=STANDARD_LAYOUT, help="board layout")
+    parser.add_argument("--boards", default=BOARDS_PATH, help="board layouts file")
+    parser.add_argument("--bots", nargs="+", default=["greedy", "greedy"], choices=["greedy", "simulation"],
+                        help="bot names, one per seat")
+    parser.add_argument("--budget", type=float, default=2.0, help="seconds per turn for the simulation bot")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="rollout processes for the simulation bot, defaults to one per core")
+    parser.add_argument("--uniform-racks", action="store_true",
+                        help="sample opponent racks evenly in simulations rather than from what their moves show")
+    parser.add_argument("--record", default=None, help="game record file, .gcg for text and anything else for binary")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed of the run, game i is seeded with a seed derived from it and i")
+    parser.add_argument("--game-seed", type=int, default=None,
+                        help="play one game with this game seed, such as the seed of a tournament game")
+    parser.add_argument("--stats", default=None, help="write the phase timers and counters to this JSON file")
+    parser.add_argument("--trace", default=None, help="write every timed call to this Chrome trace file")
+    parser.add_argument("--cprofile", default=None, help="directory to write a cProfile capture of each game to")
+    args = parser.parse_args()
+    if args.record and args.game_seed is not None and not MIN_SEED <= args.game_seed <= MAX_SEED:
+        parser.error("--game-seed must be from {} to {} to be recorded".format(MIN_SEED, MAX_SEED))
+
+    if args.stats or args.trace:
+        PROFILER.enable(tracing=args.trace is not None)
+    if args.cprofile:
+        os.makedirs(args.cprofile, exist_ok=True)
+
+    # Scrabble Words
+    lexicon = Lexicon.from_file(args.words)
+    layout = get_layout(args.board, args.boards)
+
+    if args.game_seed is not None:
+        game_seeds = [args.game_seed]
+    elif args.seed is not None:
+        game_seeds = [derive_seed(args.seed, game_number) for game_number in range(args.games)]
+    else:
+        game_seeds = [None] * args.games
+
+    wins = [0] * len(args.bots)
+    ties = 0
+    records = RecordWriter(args.record) if args.record else None
+
+    for game_number, game_seed in enumerate(game_seeds):
+        # Bots are seeded per seat from the game seed the same way as in a tournament
+        bot_seeds = [None if game_seed is None else derive_seed(game_seed, seat) for seat in range(len(args.bots))]
+        bots = [GreedyBot(lexicon, seed=bot_seed) if name == "greedy" else
+                SimBot(lexicon, time_budget=args.budget, workers=args.workers, infer=not args.uniform_racks,
+                       seed=bot_seed)
+                for name, bot_seed in zip(args.bots, bot_seeds)]
+
+        profile_path = os.path.join(args.cprofile, "game_{}.prof".format(game_number)) if args.cprofile else None
+        start = time.perf_counter()
+        with GameProfile(profile_path):
+            game = Game(lexicon, len(bots), game_seed, layout)
+            game.play(bots)
+        elapsed = time.perf_counter() - start
+
+        for bot in bots:
+            if isinstance(bot, SimBot):
+                bot.close()
+
+        if records is not None:
+            records.write(GameRecord.from_game(game, names=args.bots))
+
+        winner = game.winner()
+        if winner is None:
+            ties += 1
+        else:
+            wins[winner] += 1
+
+        scores = " - ".join(str(player.score) for player in game.players)
+        print("Game {}: {} in {} turns ({:.2f}s)".format(game_number + 1, scores, len(game.history), elapsed))
+
+    print("Wins: {}, ties: {}".format(", ".join(str(win) for win in wins), ties))
+
+    if records is not None:
+        records.close()
+
+    if args.stats:
+        PROFILER.write_summary(args.stats)
+    if args.trace:
+        PROFILER.write_trace(args.trace)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import pytest
+
+from Modules.Game import Game
+from Modules.Lexicon import Lexicon
+from Modules.MoveGenerator import Move
+from Modules.Scrabble import RACK_SLOTS, Board, rack_slot, tile_code
+
+WORDS_PATH = "./Resources/ScrabbleWords.txt"
+
+
+def test_stray_tile_off_the_line_is_rejected():
+    board = Board.standard(Lexicon.from_file(WORDS_PATH))
+
+    placement = board.check_placement([(97, "a", False), (100, "z", False), (112, "t", False)])
+
+    assert not placement.valid
+    assert placement.error == "The tiles are not in one line"
+
+
+def test_stray_tile_is_not_played():
+    game = Game(Lexicon.from_file(WORDS_PATH), seed=1)
+    player = game.current_player
+    player.rack = bytearray(RACK_SLOTS)
+    for letter in "aztesro":
+        player.rack[rack_slot(tile_code(letter))] += 1
+    rack = bytearray(player.rack)
+
+    tiles = [(97, "a", False), (100, "z", False), (112, "t", False)]
+    with pytest.raises(ValueError):
+        game.apply_move(Move(tiles, "at", 0, False))
+
+    assert game.board.tile_count == 0
+    assert player.rack == rack
+
+
+def test_line_placement_is_accepted():
+    board = Board.standard(Lexicon.from_file(WORDS_PATH))
+
+    placement = board.check_placement([(97, "a", False), (112, "t", False)])
+
+    assert placement.valid
+    assert placement.words == [("at", [97, 112])]
+    assert placement.score == 4
@@ -0,0 +1,31 @@
+import pytest
+
+from Modules.Game import Game
+from Modules.Lexicon import Lexicon
+from Modules.Records import GameRecord, RecordWriter, pack_record, read_records, unpack_record
+
+WORDS_PATH = "./Resources/ScrabbleWords.txt"
+
+
+@pytest.mark.parametrize("seed", [None, -7, 0, (1 << 63) - 1, -(1 << 63)])
+def test_seed_round_trips(seed):
+    record = GameRecord.from_game(Game(Lexicon.from_file(WORDS_PATH), seed=seed))
+
+    assert unpack_record(pack_record(record)).seed == seed
+
+
+def test_seed_out_of_range_is_rejected():
+    record = GameRecord.from_game(Game(Lexicon.from_file(WORDS_PATH), seed=(1 << 64) + 3))
+
+    with pytest.raises(ValueError):
+        pack_record(record)
+
+
+def test_record_file_round_trips(tmp_path):
+    path = str(tmp_path / "games.bin")
+    writer = RecordWriter(path)
+    for seed in (-7, None):
+        writer.write(GameRecord.from_game(Game(Lexicon.from_file(WORDS_PATH), seed=seed)))
+    writer.close()
+
+    assert [record.seed for record in read_records(path)] == [-7, None]
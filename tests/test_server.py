@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+import time
+
+import pytest
+
+from Modules import Tournament
+from Modules.Server import HUMAN, GameServer
+
+WORDS_PATH = "./Resources/ScrabbleWords.txt"
+
+
+def sleep_for(seconds: float) -> int:
+    time.sleep(seconds)
+    return os.getpid()
+
+
+def fail():
+    raise ValueError("no move")
+
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, message: dict) -> dict:
+    writer.write(json.dumps(message).encode() + b"\n")
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+async def play_stray_tile() -> tuple:
+    server = GameServer(WORDS_PATH, workers=1)
+    listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        game_id = (await request(reader, writer, {"type": "create", "seats": [HUMAN, HUMAN], "seed": 1}))["game"]
+        rack = (await request(reader, writer, {"type": "join", "game": game_id, "seat": 0}))["rack"]
+
+        letters = [letter for letter in rack if letter != "?"]
+        tiles = [[97, letters[0], False], [100, letters[1], False], [112, letters[2], False]]
+        reply = await request(reader, writer, {"type": "move", "game": game_id, "tiles": tiles})
+        state = await request(reader, writer, {"type": "state", "game": game_id})
+        writer.close()
+        return reply, state
+    finally:
+        listener.close()
+        await listener.wait_closed()
+        server.close()
+
+
+def test_server_rejects_stray_tile():
+    reply, state = asyncio.run(play_stray_tile())
+
+    assert reply["type"] == "error"
+    assert reply["message"] == "The tiles are not in one line"
+    assert state["tiles"] == []
+    assert state["turn"] == 0
+
+
+def test_server_rejects_bot_without_its_files(monkeypatch, tmp_path):
+    monkeypatch.setitem(Tournament.BOT_FILES, "equity", (str(tmp_path / "Leaves.bin"), "build_leaves.py"))
+    server = GameServer(WORDS_PATH, workers=1)
+    try:
+        with pytest.raises(ValueError, match="build_leaves.py"):
+            server.create([HUMAN, "equity"])
+        assert not server.games
+    finally:
+        server.close()
+
+
+async def time_out_one_turn() -> tuple:
+    server = GameServer(WORDS_PATH, workers=2, turn_timeout=0.5)
+    try:
+        async def later_turn() -> int:
+            await asyncio.sleep(0.3)
+            return await server.run_in_worker(sleep_for, 0.4)
+
+        stuck = asyncio.ensure_future(server.run_in_worker(sleep_for, 60))
+        results = await asyncio.gather(stuck, later_turn(), return_exceptions=True)
+        processes = [worker.process.pid for worker in server.idle]
+
+        failure = None
+        try:
+            await server.run_in_worker(fail)
+        except ValueError as error:
+            failure = error
+        return results, processes, [worker.process.pid for worker in server.idle], failure
+    finally:
+        server.close()
+
+
+def test_timed_out_turn_only_stops_its_worker():
+    results, processes, after_failure, failure = asyncio.run(time_out_one_turn())
+
+    # The later turn is still running when the first one times out, and finishes in its own worker
+    assert isinstance(results[0], asyncio.TimeoutError)
+    assert results[1] in processes
+    assert len(processes) == 2
+    assert sorted(after_failure) == sorted(processes)
+    assert str(failure) == "no move"
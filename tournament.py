@@ -0,0 +1,36 @@
+import argparse
+import time
+
+from Modules.Tournament import BOTS, check_bot_files, run_tournament
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays seeded bot games across all cores and reports win rates")
+    parser.add_argument("--games", type=int, default=100, help="number of games to play")
+    parser.add_argument("--bots", nargs="+", default=["greedy", "greedy"], choices=sorted(BOTS),
+                        help="bot names, one per seat")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the tournament, the seed of each game is derived from it")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to one per core")
+    parser.add_argument("--output", default=None, help="results file, .jsonl or .csv")
+    parser.add_argument("--record", default=None, help="game record file, .gcg for text and anything else for binary")
+    parser.add_argument("--cprofile", default=None, help="directory to write a cProfile capture of each game to")
+    parser.add_argument("--words", default="./Resources/ScrabbleWords.txt", help="word list")
+    args = parser.parse_args()
+    for name in args.bots:
+        try:
+            check_bot_files(name)
+        except ValueError as error:
+            parser.error(str(error))
+
+    start = time.perf_counter()
+    standings = run_tournament(args.games, args.bots, args.words, args.output, args.seed, args.workers,
+                               args.record, args.cprofile)
+    elapsed = time.perf_counter() - start
+
+    print(standings.report())
+    print("{} games in {:.1f}s ({:.1f} games per second)".format(args.games, elapsed, args.games / elapsed))
+
+
+if __name__ == '__main__':
+    main()